@@ -0,0 +1,353 @@
+"""
+MIT License
+
+Copyright (c) 2022 0xKate
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import asyncio
+import gc
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+from functools import partial
+from typing import Callable, Dict, List, Tuple
+
+# Project Files
+from Benchmarks.TrafficGenerator import LINKTYPE_ETHERNET, SyntheticTraffic
+from Model.CaptureInterface import CaptureInterface
+from Model.NetworkSniffer import NetworkSniffer
+from Model.SortIndex import SortIndex
+from UI.Widgets.ConnectionColumns import FormatRow
+
+CAPTURE = 'bench0'
+VISIBLE_ROWS = 40  # Rows a grid redraw formats
+
+
+class HotPathBenchmark:
+    """
+    Times the per-packet and per-refresh paths of a NetworkSniffer separately, on SyntheticTraffic. Each
+    measurement is repeated and the best run is reported, the result of a run is what one pass costs.\n
+    Socket scans use a stubbed provider listing the synthetic flows, so nothing depends on the machine it runs on.
+    """
+
+    def __init__(self, traffic: SyntheticTraffic, columnar=False, repeat=3):
+        self.Traffic = traffic
+        self.Columnar = columnar
+        self.Repeat = repeat
+        self.Frames = traffic.Frames()
+        self.Sockets = traffic.SocketEntries(os.getpid())
+        self.Results = {}  # type: Dict[str, Dict[str, float]]
+        self.Allocations = {}  # type: Dict[str, Dict[str, float]]
+
+    def _Record(self, name: str, ops: int, seconds: List[float]):
+        best = min(seconds)
+        self.Results[name] = {'ops': ops, 'seconds': round(best, 6), 'ns_per_op': round(best / max(ops, 1) * 1e9, 1),
+                              **self.Allocations.pop(name, {})}
+
+    def _MeasureAllocations(self, name: str, account: Callable, ops: int, warm=False):
+        """
+        Add the memory tracemalloc saw account() allocate per op to a result, at the peak and still held after.\n
+        :param warm: Call account() under tracemalloc once first, so the objects it replaces (ie. counters) were
+         traced and freeing them is counted too
+        """
+        gc.collect()
+        tracemalloc.start()
+        if warm:
+            account()
+        start, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        account()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.Allocations[name] = {'peak_bytes_per_op': round((peak - start) / max(ops, 1), 2),
+                                  'retained_bytes_per_op': round((current - start) / max(ops, 1), 2)}
+
+    async def _NewSnifferAsync(self) -> NetworkSniffer:
+        sniffer = NetworkSniffer(columnar=self.Columnar, interfaces=[CAPTURE])
+        sniffer.Captures[CAPTURE].LocalIPs = frozenset([self.Traffic.LocalIP])
+        sniffer.ReverseResolver = False
+        sniffer.SetLoadShedding(False)  # Everything is queued up front on purpose
+        sniffer.SocketTable.Provider = lambda: self.Sockets
+        sniffer.PacketQueue.MaxSize = len(self.Frames) + 1
+        sniffer.Consumer.cancel()  # Packets are drained and timed by hand
+        await sniffer.SocketTable.RefreshAsync()
+        return sniffer
+
+    async def _FilledSnifferAsync(self) -> NetworkSniffer:
+        """A sniffer that has accounted every packet once."""
+        sniffer = await self._NewSnifferAsync()
+        capture = sniffer.Captures[CAPTURE]
+        for frame in self.Frames:
+            sniffer._RawPacketCB(capture, frame, LINKTYPE_ETHERNET)
+        sniffer._AccountBatch(sniffer.PacketQueue.GetBatch(len(self.Frames)))
+        await asyncio.sleep(0)
+        return sniffer
+
+    async def DecodeAsync(self):
+        """
+        _RawPacketCB on raw frames (the fast path), also from a replay which applies the capture scope in Python,
+        and _PacketCB on scapy packets with and without it.
+        """
+        sniffer = await self._NewSnifferAsync()
+        replay = CaptureInterface('pcap:bench', sniffer._PacketCB, [self.Traffic.LocalIP], sniffer.Scope, live=False)
+        for name, capture in (('decode_raw', sniffer.Captures[CAPTURE]), ('decode_raw_replay_scope', replay)):
+            decode = partial(_DecodeFrames, sniffer, capture, self.Frames)
+            seconds = []
+            for _ in range(self.Repeat):
+                start = time.perf_counter()
+                decode()
+                seconds.append(time.perf_counter() - start)
+                sniffer.PacketQueue.GetBatch(len(self.Frames))
+            self._MeasureAllocations(name, decode, len(self.Frames))
+            sniffer.PacketQueue.GetBatch(len(self.Frames))
+            self._Record(name, len(self.Frames), seconds)
+        capture = sniffer.Captures[CAPTURE]
+
+        try:
+            from scapy.layers.l2 import Ether
+        except ImportError:
+            return
+        # Dissecting is slow, a sample is enough
+        packets = [Ether(frame) for frame in self.Frames[:20000]]
+        for name, fast_path in (('packet_cb_fast_path', True), ('packet_cb_dissect', False)):
+            sniffer.FastPath = fast_path
+            seconds = []
+            for _ in range(self.Repeat):
+                start = time.perf_counter()
+                for pkt in packets:
+                    sniffer._PacketCB(capture, pkt)
+                seconds.append(time.perf_counter() - start)
+                sniffer.PacketQueue.GetBatch(len(packets))
+            self._Record(name, len(packets), seconds)
+        sniffer.Shutdown()
+
+    async def _QueuedBatchesAsync(self, fill: bool) -> Tuple[NetworkSniffer, List[List[tuple]]]:
+        """A sniffer and every packet decoded and split into batches of BatchSize like the consumer drains them.
+        :param fill: Account every packet once first"""
+        sniffer = await self._NewSnifferAsync()
+        capture = sniffer.Captures[CAPTURE]
+        for frame in self.Frames:
+            sniffer._RawPacketCB(capture, frame, LINKTYPE_ETHERNET)
+        items = sniffer.PacketQueue.GetBatch(len(self.Frames))
+        if fill:
+            sniffer._AccountBatch(items)
+        return sniffer, [items[i:i + sniffer.BatchSize] for i in range(0, len(items), sniffer.BatchSize)]
+
+    async def AccountingAsync(self):
+        """
+        _AccountBatch for every decoded packet, from an empty table and again on a full one. Followed by one more
+        pass under tracemalloc, which slows it down too much to be timed, for what accounting allocates.
+        """
+        for name in ('accounting_new_table', 'accounting_known_flows'):
+            fill = name == 'accounting_known_flows'
+            sniffer, batches = await self._QueuedBatchesAsync(fill)
+            seconds = []
+            for run in range(self.Repeat + 1):
+                if run and not fill:
+                    sniffer, batches = await self._QueuedBatchesAsync(fill)
+                gc.collect()
+                if run == self.Repeat:
+                    self._MeasureAllocations(name, partial(_AccountBatches, sniffer, batches), len(self.Frames),
+                                            warm=fill)
+                    break
+                start = time.perf_counter()
+                _AccountBatches(sniffer, batches)
+                seconds.append(time.perf_counter() - start)
+                await asyncio.sleep(0)
+            self._Record(name, len(self.Frames), seconds)
+
+    async def SocketLookupAsync(self):
+        """A socket scan of the stubbed socket list, and _FindTrafficSocketData for every packet."""
+        sniffer = await self._NewSnifferAsync()
+        scan = sniffer.SocketTable._Scan
+        provider = sniffer.SocketTable.Provider
+        seconds = []
+        for _ in range(self.Repeat):
+            start = time.perf_counter()
+            scan(provider)
+            seconds.append(time.perf_counter() - start)
+        self._Record('socket_scan', len(self.Sockets), seconds)
+
+        signatures = [(remote_ip, remote_port, 0 if tcp else 1)
+                      for remote_ip, remote_port, _local_port, tcp in self.Traffic.Flows]
+        signatures = [signatures[flow] for flow, _incoming, _length in self.Traffic.Packets()]
+        seconds = []
+        for _ in range(self.Repeat):
+            start = time.perf_counter()
+            for conn_signature in signatures:
+                sniffer._FindTrafficSocketData(conn_signature)
+            seconds.append(time.perf_counter() - start)
+        self._Record('socket_lookup', len(signatures), seconds)
+        sniffer.Shutdown()
+
+    async def GridRefreshAsync(self):
+        """What ConnectionsDataGrid.DataGridRefresh does without wx: catch the sort index up with the changes and
+        format the visible rows. Once from scratch, and once after 1% of the packets were accounted again."""
+        sniffer = await self._FilledSnifferAsync()
+        connections = sniffer.GetConnectionsDict()
+        capture = sniffer.Captures[CAPTURE]
+        for name in ('grid_refresh_full', 'grid_refresh_incremental'):
+            seconds = []
+            for _ in range(self.Repeat):
+                index = SortIndex('PacketCount')
+                generation = 0
+                if name == 'grid_refresh_incremental':
+                    index.Rebuild(connections)
+                    generation = sniffer.ChangesSince(sniffer.GetGeneration()).Generation
+                    for frame in self.Frames[:max(len(self.Frames) // 100, 1)]:
+                        sniffer._RawPacketCB(capture, frame, LINKTYPE_ETHERNET)
+                    sniffer._AccountBatch(sniffer.PacketQueue.GetBatch(len(self.Frames)))
+                start = time.perf_counter()
+                changes = sniffer.ChangesSince(generation)
+                if changes.Complete and generation:
+                    index.Update(changes.GetChanged(), connections)
+                else:
+                    index.Rebuild(connections)
+                view = index.GetView(connections)
+                for row in range(min(VISIBLE_ROWS, len(view))):
+                    FormatRow(view[row])
+                seconds.append(time.perf_counter() - start)
+            self._Record(name, len(connections), seconds)
+        sniffer.Shutdown()
+
+    async def SaveAsync(self):
+        """Saving the table in every format the File menu offers."""
+        from Model.FlowExport import ExportFileAsync
+        from Model.SaveFileAsync import SaveFileAsync
+        sniffer = await self._FilledSnifferAsync()
+        count = len(sniffer.GetConnectionsDict())
+        with tempfile.TemporaryDirectory() as directory:
+            for fmt in ('txt', 'ntd', 'csv', 'jsonl'):
+                pathname = os.path.join(directory, f'session.{fmt}')
+                seconds = []
+                for _ in range(self.Repeat):
+                    start = time.perf_counter()
+                    if fmt == 'txt':
+                        with redirect_stdout(io.StringIO()):  # Keep its progress message out of the report
+                            SaveFileAsync(list(sniffer.GetAllConnections()), pathname, fmt).join()
+                    elif fmt == 'ntd':
+                        await sniffer.SaveSnapshotAsync(pathname)
+                    else:
+                        await ExportFileAsync(sniffer, pathname, fmt)
+                    seconds.append(time.perf_counter() - start)
+                self._Record(f'save_{fmt}', count, seconds)
+                self.Results[f'save_{fmt}']['bytes'] = os.path.getsize(pathname)
+        sniffer.Shutdown()
+
+    async def RunAsync(self, only: List[str] = None) -> Dict[str, Dict[str, float]]:
+        for name, benchmark in self.GetBenchmarks().items():
+            if not only or name in only:
+                await benchmark()
+        return self.Results
+
+    def GetBenchmarks(self) -> Dict[str, Callable]:
+        return {'decode': self.DecodeAsync, 'accounting': self.AccountingAsync, 'socket': self.SocketLookupAsync,
+                'grid': self.GridRefreshAsync, 'save': self.SaveAsync}
+
+
+def _DecodeFrames(sniffer: NetworkSniffer, capture: CaptureInterface, frames: List[bytes]):
+    for frame in frames:
+        sniffer._RawPacketCB(capture, frame, LINKTYPE_ETHERNET)
+
+
+def _AccountBatches(sniffer: NetworkSniffer, batches: List[List[tuple]]):
+    for batch in batches:
+        sniffer._AccountBatch(batch)
+
+
+def _GitRevision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ''
+
+
+def Compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            tolerance: float) -> Tuple[List[str], List[str]]:
+    """(a line per benchmark comparing it to the baseline, the benchmarks slower than baseline * (1 + tolerance))"""
+    lines, regressions = [], []
+    for name, result in results.items():
+        old = baseline.get(name)
+        if not old or not old.get('ns_per_op'):
+            continue
+        ratio = result['ns_per_op'] / old['ns_per_op']
+        lines.append(f'{name:28} {old["ns_per_op"]:>12.1f} -> {result["ns_per_op"]:>12.1f} ns/op  x{ratio:.2f}')
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+    return lines, regressions
+
+
+def main(argv=None) -> int:
+    parser = ArgumentParser(description="Benchmark the NetTools hot paths on deterministic synthetic traffic.")
+    parser.add_argument('--flows', type=int, default=10000, help="Distinct remote endpoints (default: 10000)")
+    parser.add_argument('--packets', type=int, default=200000, help="Packets generated (default: 200000)")
+    parser.add_argument('--rate', type=float, default=10000.0, help="Packets per second of a written pcap")
+    parser.add_argument('--tcp-ratio', type=float, default=0.8, help="Share of TCP flows (default: 0.8)")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed (default: 0)")
+    parser.add_argument('--columnar', action='store_true', help="Use the array backed ConnectionStore")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per measurement, the best counts (default: 3)")
+    parser.add_argument('--only', action='append', choices=('decode', 'accounting', 'socket', 'grid', 'save'),
+                        help="Run only this group, repeat for several")
+    parser.add_argument('--output', metavar='JSON', help="Also write the results to this file")
+    parser.add_argument('--write-pcap', metavar='PCAP', help="Also write the traffic as a pcap for --replay")
+    parser.add_argument('--compare', metavar='JSON', help="Compare against the results of an earlier run")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="With --compare, fail if a benchmark got slower by more than this (default: 0.25)")
+    args = parser.parse_args(argv)
+
+    traffic = SyntheticTraffic(args.flows, args.packets, args.rate, args.tcp_ratio, seed=args.seed)
+    if args.write_pcap:
+        traffic.WritePcap(args.write_pcap)
+    benchmark = HotPathBenchmark(traffic, args.columnar, args.repeat)
+    results = asyncio.run(benchmark.RunAsync(args.only))
+    report = {'meta': {'revision': _GitRevision(), 'python': sys.version.split()[0], 'platform': platform.platform(),
+                       'flows': args.flows, 'packets': args.packets, 'tcp_ratio': args.tcp_ratio, 'seed': args.seed,
+                       'columnar': args.columnar, 'repeat': args.repeat},
+              'results': results}
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(text + '\n')
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        if baseline['meta'].get('flows') != args.flows or baseline['meta'].get('packets') != args.packets:
+            print('Warning: the baseline was run with different traffic', file=sys.stderr)
+        lines, regressions = Compare(results, baseline['results'], args.tolerance)
+        print('\n'.join(lines), file=sys.stderr)
+        for name in regressions:
+            print(f'Regression: {name}', file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
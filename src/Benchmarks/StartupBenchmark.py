@@ -0,0 +1,164 @@
+"""
+MIT License
+
+Copyright (c) 2022 0xKate
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from statistics import median
+from typing import Dict, List, Union
+
+# Each probe runs in a fresh interpreter from the src directory, and prints the seconds it measured
+IMPORT_PROBE = '''
+import time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+'''
+
+SNIFFER_PROBE = '''
+import time
+start = time.perf_counter()
+import asyncio
+from Model.NetworkSniffer import NetworkSniffer
+async def main():
+    sniffer = NetworkSniffer()
+    await asyncio.sleep(0)
+    print(time.perf_counter() - start)
+    sniffer.Shutdown()
+asyncio.run(main())
+'''
+
+# Time from the parent launching the process until the main window first paints, interpreter startup included.
+# The session is autosaved to a scratch directory, never to the users own.
+FIRST_PAINT_PROBE = '''
+import asyncio, sys, time
+import wx
+import NetToolsApp
+from NetToolsApp import WxAsyncEngine
+from UI.MainWindow import MainWindow
+
+def OnPaint(event):
+    event.Skip()
+    print(time.time() - {launched})
+    sys.stdout.flush()
+    wx.CallAfter(wx.GetApp()._Exit)
+
+show = MainWindow.Show
+def Show(self, *args):
+    self.Bind(wx.EVT_PAINT, OnPaint)
+    return show(self, *args)
+MainWindow.Show = Show
+NetToolsApp.DEFAULT_AUTOSAVE_DIR = {autosave_dir!r}
+WxAsyncEngine().Start()
+'''
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _RunProbe(code: str, timeout=60.0) -> Union[float, None]:
+    """Run a probe in a fresh interpreter, None if it failed (ie. wx isn't installed or there is no display)."""
+    try:
+        result = subprocess.run([sys.executable, '-c', code], cwd=SRC_DIR, capture_output=True, text=True,
+                                timeout=timeout)
+    except subprocess.TimeoutExpired:
+        print(f'Probe timed out after {timeout}s', file=sys.stderr)
+        return None
+    lines = result.stdout.split()
+    if result.returncode != 0 or not lines:
+        print(f'Probe failed with exit code {result.returncode}:\n{result.stderr[-2000:]}', file=sys.stderr)
+        return None
+    return float(lines[-1])
+
+
+def MeasureStartup(repeat=5, gui=True) -> Dict[str, Union[float, None]]:
+    """
+    Median cold start timings in milliseconds, None for a measurement whose probes all failed. Skipped
+    measurements are left out.\n
+    :param repeat: Fresh processes per measurement
+    :param gui: Also time importing the wx app and the first paint of the main window
+    """
+    probes = {'import_network_sniffer_ms': IMPORT_PROBE.format(module='Model.NetworkSniffer'),
+              'import_headless_ms': IMPORT_PROBE.format(module='Headless'),
+              'sniffer_ready_ms': SNIFFER_PROBE}
+    if gui:
+        probes['import_app_ms'] = IMPORT_PROBE.format(module='NetToolsApp')
+    results = {}
+    for name, code in probes.items():
+        samples = [_RunProbe(code) for _ in range(repeat)]
+        samples = [x for x in samples if x is not None]
+        results[name] = round(median(samples) * 1000, 1) if samples else None
+    if gui:
+        samples = []  # type: List[float]
+        for _ in range(repeat):
+            with tempfile.TemporaryDirectory() as autosave_dir:
+                sample = _RunProbe(FIRST_PAINT_PROBE.format(launched=time.time(), autosave_dir=autosave_dir))
+            if sample is not None:
+                samples.append(sample)
+        results['first_paint_ms'] = round(median(samples) * 1000, 1) if samples else None
+    return results
+
+
+def CheckBudget(results: Dict[str, Union[float, None]], budget: Dict[str, float]) -> List[str]:
+    """Every measurement over its budget or that failed, as messages. Only measurements the run skipped (ie. the
+    GUI ones with --no-gui), which are missing from results, are not failures."""
+    failures = []
+    for name, limit in budget.items():
+        if name not in results:
+            continue
+        if results[name] is None:
+            failures.append(f'{name} could not be measured, its probe failed')
+        elif results[name] > limit:
+            failures.append(f'{name} took {results[name]}ms, budget is {limit}ms')
+    return failures
+
+
+def main(argv=None) -> int:
+    parser = ArgumentParser(description="Measure NetTools cold start: import times, sniffer ready and first paint.")
+    parser.add_argument('--repeat', type=int, default=5, help="Fresh processes per measurement (default: 5)")
+    parser.add_argument('--no-gui', action='store_true', help="Skip the wx measurements")
+    parser.add_argument('--budget', metavar='JSON', help="Fail if any measurement exceeds the budget in this file")
+    parser.add_argument('--output', metavar='JSON', help="Also write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = MeasureStartup(args.repeat, gui=not args.no_gui)
+    report = json.dumps({'python': sys.version.split()[0], 'platform': sys.platform, 'results': results}, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(report + '\n')
+    if args.budget:
+        with open(args.budget) as file:
+            failures = CheckBudget(results, json.load(file))
+        for failure in failures:
+            print(f'Budget check failed: {failure}', file=sys.stderr)
+        return 1 if failures else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
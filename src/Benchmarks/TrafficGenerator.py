@@ -0,0 +1,117 @@
+"""
+MIT License
+
+Copyright (c) 2022 0xKate
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import random
+import socket
+import struct
+from collections import namedtuple
+from typing import Iterator, List, Tuple
+
+# Same fields as psutil.net_connections() entries, for a stubbed SocketTable provider
+SocketEntry = namedtuple('SocketEntry', ['fd', 'family', 'type', 'laddr', 'raddr', 'status', 'pid'])
+
+ETHERNET = struct.Struct('!6s6sH')
+IPV4 = struct.Struct('!BBHHHBBH4s4s')
+TCP_HEADER = struct.Struct('!HHIIBBHHH')
+UDP_HEADER = struct.Struct('!HHHH')
+PCAP_HEADER = struct.Struct('<IHHiIII')
+PCAP_RECORD = struct.Struct('<IIII')
+LINKTYPE_ETHERNET = 1
+
+
+class SyntheticTraffic:
+    """
+    Deterministic traffic between one local address and a set of remote flows, the same seed always gives the same
+    packets. Flow popularity is skewed like real traffic: a few flows carry most of the packets.
+    """
+
+    def __init__(self, flows=1000, packets=100000, rate=10000.0, tcp_ratio=0.8, local_ip='10.0.0.1', seed=0):
+        """
+        :param flows: Number of distinct remote endpoints
+        :param packets: Number of packets generated
+        :param rate: Packets per second, spaces out the timestamps of a written pcap
+        :param tcp_ratio: Share of the flows that are TCP, the rest are UDP
+        :param local_ip: This hosts address, every packet is to or from it
+        :param seed: Seed of the random generator
+        """
+        self.FlowCount = flows
+        self.PacketCount = packets
+        self.Rate = rate
+        self.TCPRatio = tcp_ratio
+        self.LocalIP = local_ip
+        self.Seed = seed
+        rng = random.Random(seed)
+        # (remote ip, remote port, local port, is tcp)
+        self.Flows = [(f'{rng.randrange(1, 224)}.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}',
+                       rng.choice((53, 80, 123, 443, 993, 8080)) if rng.random() < 0.8 else rng.randrange(1024, 65536),
+                       rng.randrange(1024, 65536), rng.random() < tcp_ratio)
+                      for _ in range(flows)]  # type: List[Tuple[str, int, int, bool]]
+        self.Weights = [1.0 / (rank + 1) for rank in range(flows)]
+
+    def Packets(self) -> Iterator[Tuple[int, bool, int]]:
+        """(flow index, incoming, frame length) of every packet in order."""
+        rng = random.Random(self.Seed + 1)
+        picks = rng.choices(range(self.FlowCount), self.Weights, k=self.PacketCount)
+        for flow in picks:
+            yield flow, rng.random() < 0.6, rng.choice((64, 64, 128, 576, 1514))
+
+    def Frames(self) -> List[bytes]:
+        """Every packet as a raw Ethernet frame."""
+        local = socket.inet_aton(self.LocalIP)
+        remotes = [socket.inet_aton(flow[0]) for flow in self.Flows]
+        frames = []
+        for flow, incoming, length in self.Packets():
+            remote_ip, remote_port, local_port, tcp = self.Flows[flow]
+            if incoming:
+                src, sport, dst, dport = remotes[flow], remote_port, local, local_port
+            else:
+                src, sport, dst, dport = local, local_port, remotes[flow], remote_port
+            if tcp:
+                l4 = TCP_HEADER.pack(sport, dport, 0, 0, 5 << 4, 0x10, 65535, 0, 0)
+            else:
+                l4 = UDP_HEADER.pack(sport, dport, max(length - 34, 8), 0)
+            ip = IPV4.pack(0x45, 0, length - ETHERNET.size, 0, 0, 64, 6 if tcp else 17, 0, src, dst)
+            header = ETHERNET.pack(b'\x02\x00\x00\x00\x00\x01', b'\x02\x00\x00\x00\x00\x02', 0x0800) + ip + l4
+            frames.append(header + bytes(max(length - len(header), 0)))
+        return frames
+
+    def WritePcap(self, pathname: str) -> int:
+        """Write the packets as a classic pcap, paced at Rate packets per second. Returns the packets written."""
+        written = 0
+        with open(pathname, 'wb') as file:
+            file.write(PCAP_HEADER.pack(0xa1b2c3d4, 2, 4, 0, 0, 65535, LINKTYPE_ETHERNET))
+            for frame in self.Frames():
+                timestamp = 1600000000.0 + written / self.Rate
+                seconds = int(timestamp)
+                file.write(PCAP_RECORD.pack(seconds, int((timestamp - seconds) * 1000000), len(frame), len(frame)))
+                file.write(frame)
+                written += 1
+        return written
+
+    def SocketEntries(self, pid: int = None) -> List[SocketEntry]:
+        """What psutil.net_connections(kind='inet4') would list for these flows, all owned by pid."""
+        return [SocketEntry(i + 3, socket.AF_INET, socket.SOCK_STREAM if tcp else socket.SOCK_DGRAM,
+                            (self.LocalIP, local_port), (remote_ip, remote_port),
+                            'ESTABLISHED' if tcp else 'NONE', pid)
+                for i, (remote_ip, remote_port, local_port, tcp) in enumerate(self.Flows)]
@@ -1,4 +1,4 @@
-from enum import Enum
+from enum import Enum, IntEnum
 
 
 class EventMsg(Enum):
@@ -6,4 +6,8 @@ class EventMsg(Enum):
 
 class PROTO(Enum):
     TCP = 0
-    UDP = 1
\ No newline at end of file
+    UDP = 1
+
+class DIRECTION(IntEnum):
+    INCOMING = 0
+    OUTGOING = 1
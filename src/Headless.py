@@ -0,0 +1,134 @@
+"""
+MIT License
+
+Copyright (c) 2022 0xKate
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import asyncio
+import logging
+import signal
+import sys
+from argparse import Namespace
+from typing import Union
+
+# Project Files, nothing here may import wx
+from Model.Autosave import SessionAutosave
+from Model.FlowExport import FlowExporter
+from Model.NetworkSniffer import NetworkSniffer
+
+
+class HeadlessEngine:
+    """Runs the NetworkSniffer on a plain asyncio loop without a display, exporting connections periodically
+    until SIGINT or SIGTERM. SIGHUP exports immediately."""
+    def __init__(self, args: Namespace):
+        """:param args: The parsed command line, see main.py"""
+        self.Args = args
+        self.NetToolsData = None  # type: Union[NetworkSniffer, None]
+        self.Exporter = None  # type: Union[FlowExporter, None]
+        self.StopEvent = None  # type: Union[asyncio.Event, None]
+        self.ExportNow = None  # type: Union[asyncio.Event, None]
+        self.Autosave = None  # type: Union[SessionAutosave, None]
+
+    def _InstallSignalHandlers(self, loop: asyncio.AbstractEventLoop):
+        handlers = {signal.SIGINT: self.StopEvent.set, signal.SIGTERM: self.StopEvent.set}
+        if hasattr(signal, 'SIGHUP'):
+            handlers[signal.SIGHUP] = self.ExportNow.set
+        for signum, handler in handlers.items():
+            try:
+                loop.add_signal_handler(signum, handler)
+            except NotImplementedError:
+                # Windows event loops have no add_signal_handler
+                signal.signal(signum, lambda _signum, _frame, _handler=handler: loop.call_soon_threadsafe(_handler))
+
+    async def _ExportAsync(self):
+        if self.Exporter is None:
+            return
+        try:
+            written = await self.Exporter.ExportAsync(self.NetToolsData)
+            logging.info(f'Headless - Exported {written} connections to {self.Args.export}')
+        except OSError as e:
+            logging.error(f'Headless - Export to {self.Args.export} failed: {e}')
+
+    async def _ExportLoopAsync(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.ExportNow.wait(), self.Args.export_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.ExportNow.clear()
+            await self._ExportAsync()
+
+    async def _WaitForReplayAsync(self):
+        """Stop once a replayed file has been read and every packet from it processed."""
+        while self.NetToolsData.GetReplayStatus() or self.NetToolsData.GetQueueDepth():
+            await asyncio.sleep(0.2)
+        self.StopEvent.set()
+
+    async def _StartAsync(self):
+        args = self.Args
+        loop = asyncio.get_running_loop()
+        self.StopEvent = asyncio.Event()
+        self.ExportNow = asyncio.Event()
+        self._InstallSignalHandlers(loop)
+
+        self.NetToolsData = NetworkSniffer(columnar=args.columnar, interfaces=args.interface or None,
+                                           workers=args.workers)
+        self.NetToolsData.ReverseResolver = not args.no_resolve
+        self.NetToolsData.SetMetricsPort(args.metrics_port)
+        self.NetToolsData.SetLoadShedding(not args.no_shedding)
+        if args.idle_timeout or args.max_flows or args.archive:
+            self.NetToolsData.SetFlowLimits(args.idle_timeout, args.max_flows, args.archive)
+        if args.autosave:
+            self.Autosave = SessionAutosave(self.NetToolsData, args.autosave, args.autosave_interval)
+            await self.Autosave.RestoreAsync()
+            self.Autosave.Start()
+        if args.export:
+            self.Exporter = FlowExporter(args.export, args.format, changed_only=args.changed_only,
+                                         append=args.changed_only)
+            if not await self.Exporter.OpenAsync():
+                logging.info(f'Headless - Waiting for a reader on {args.export}')
+        export_task = loop.create_task(self._ExportLoopAsync())
+
+        if args.replay:
+            self.NetToolsData.ReplayStart(args.replay, realtime=args.realtime, local_ip=args.local_ip)
+            loop.create_task(self._WaitForReplayAsync())
+        else:
+            self.NetToolsData.SniffStart()
+            logging.info(f'Headless - Capturing on {", ".join(self.NetToolsData.GetInterfaces())}')
+
+        await self.StopEvent.wait()
+        logging.info('Headless - Shutting down')
+        export_task.cancel()
+        self.NetToolsData.Shutdown()
+        if self.Autosave is not None:
+            self.Autosave.Close()
+        await self._ExportAsync()
+        if self.Exporter is not None:
+            self.Exporter.Close()
+
+    def Start(self) -> int:
+        try:
+            asyncio.run(self._StartAsync())
+        except OSError as e:
+            logging.error(f'Headless - {e}')
+            print(f"Cannot start capture: {e}", file=sys.stderr)
+            return 1
+        return 0
@@ -0,0 +1,369 @@
+"""
+MIT License
+
+Copyright (c) 2022 0xKate
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# Autosave directory layout:
+#   session.ntd  NTD snapshot (see Model.SnapshotFile), rewritten by compaction
+#   session.ntj  Journal of the changes since that snapshot, appended to at every checkpoint:
+#     Header  JOURNAL_HEADER, Created of the snapshot it continues, 0 if there is none
+#     Frames  FRAME, then the zlib compressed payload: u32 strings size, the strings (EncodeStrings), the RECORD of
+#             every connection created or changed since the previous frame, then a REMOVAL per removed connection
+# Frames hold whole records rather than increments, so replaying a frame twice, or over a newer snapshot, is harmless.
+# A frame cut short by a crash fails its length or crc check and is dropped, with everything after it.
+# NTJ1 journals were written with RECORD_V1. A frame's record size follows from its payload, so a journal continued
+# after an upgrade can hold frames of both.
+
+import asyncio
+import logging
+import os
+import struct
+import threading
+import zlib
+from typing import BinaryIO, Dict, List, Tuple, Union
+
+# Project Files
+from Enums import PROTO
+from Model.ConnectionStore import StringTable
+from Model.SnapshotFile import HEADER, RECORD, RECORD_V1, EncodeStrings, GetAvailableCodecs, SnapshotHost, \
+    SnapshotReader, SnapshotStrings
+
+JOURNAL_MAGIC = b'NTJ2'
+JOURNAL_MAGICS = (b'NTJ1', JOURNAL_MAGIC)  # Versions that can be read
+JOURNAL_HEADER = struct.Struct('<4sd')  # magic, Created of the snapshot this journal continues
+FRAME = struct.Struct('<IIII')  # compressed payload size, crc32 of the compressed payload, records, removals
+REMOVAL = struct.Struct('<iHi')  # RemoteIP string id, RemotePort, PROTO value
+
+SNAPSHOT_NAME = 'session.ntd'
+JOURNAL_NAME = 'session.ntj'
+DEFAULT_AUTOSAVE_DIR = os.path.join(os.path.expanduser('~'), '.nettools', 'autosave')
+
+
+def EncodeFrame(records: List[tuple], removals: List[tuple], strings: List[str]) -> bytes:
+    """A journal frame of RECORD and REMOVAL tuples, with the string table their ids refer to."""
+    encoded_strings = EncodeStrings(strings)
+    payload = zlib.compress(b''.join([struct.pack('<I', len(encoded_strings)), encoded_strings,
+                                      b''.join([RECORD.pack(*record) for record in records]),
+                                      b''.join([REMOVAL.pack(*removal) for removal in removals])]), 1)
+    return FRAME.pack(len(payload), zlib.crc32(payload), len(records), len(removals)) + payload
+
+
+def ReadJournal(pathname: str) -> Tuple[float, List[Tuple[List[SnapshotHost], List[Tuple[str, int, int]]]], int]:
+    """
+    Read a journal, stopping at the first incomplete or damaged frame.\n
+    :return: (Created of the snapshot it continues, [(saved connections, removed signatures)] per frame,
+     the offset the valid frames end at)
+    :raises ValueError: If the file is not a journal
+    :raises OSError: If the file can't be read
+    """
+    with open(pathname, 'rb') as file:
+        data = file.read()
+    if len(data) < JOURNAL_HEADER.size:
+        raise ValueError(f'{pathname} is not a session journal')
+    magic, base = JOURNAL_HEADER.unpack_from(data)
+    if magic not in JOURNAL_MAGICS:
+        raise ValueError(f'{pathname} is not a session journal')
+    frames = []
+    offset = JOURNAL_HEADER.size
+    while offset + FRAME.size <= len(data):
+        size, crc, record_count, removal_count = FRAME.unpack_from(data, offset)
+        payload = data[offset + FRAME.size:offset + FRAME.size + size]
+        if len(payload) != size or zlib.crc32(payload) != crc:
+            break
+        payload = zlib.decompress(payload)
+        strings_size, = struct.unpack_from('<I', payload)
+        strings = SnapshotStrings(payload[4:4 + strings_size])
+        position = 4 + strings_size
+        record = RECORD
+        if record_count and len(payload) - position - removal_count * REMOVAL.size == \
+                record_count * RECORD_V1.size:
+            record = RECORD_V1
+        hosts = [SnapshotHost(record.unpack_from(payload, position + i * record.size), strings)
+                 for i in range(record_count)]
+        position += record_count * record.size
+        removals = [(strings.Get(ip), port, proto) for ip, port, proto in
+                    (REMOVAL.unpack_from(payload, position + i * REMOVAL.size) for i in range(removal_count))]
+        frames.append((hosts, removals))
+        offset += FRAME.size + size
+    return base, frames, offset
+
+
+def _Signature(host: SnapshotHost) -> Tuple[str, int, int]:
+    return host.RemoteIP, host.RemotePort, PROTO[host.ProtoType].value
+
+
+def LoadSession(directory: str) -> Tuple[List[SnapshotHost], float, int]:
+    """
+    The connections of the session autosaved in directory: its snapshot with the journal replayed on top.
+    A journal that continues a different snapshot (ie. a crash during compaction) is ignored.\n
+    :return: (saved connections least recently seen first, Created of the snapshot or 0,
+     offset the journal's valid frames end at or 0 if it can't be continued)
+    """
+    snapshot_path = os.path.join(directory, SNAPSHOT_NAME)
+    journal_path = os.path.join(directory, JOURNAL_NAME)
+    hosts = {}  # type: Dict[Tuple[str, int, int], SnapshotHost]
+    created = 0.0
+    if os.path.exists(snapshot_path):
+        try:
+            reader = SnapshotReader(snapshot_path)
+        except (ValueError, OSError) as e:
+            logging.error(f'Autosave - Cannot read {snapshot_path}: {e}')
+        else:
+            created = reader.Created
+            for _row, record in reader.IterRecords():
+                host = SnapshotHost(record, reader.Strings)
+                hosts[_Signature(host)] = host
+            reader.Close()
+    journal_end = 0
+    if os.path.exists(journal_path):
+        try:
+            base, frames, journal_end = ReadJournal(journal_path)
+        except (ValueError, OSError, zlib.error, struct.error) as e:
+            logging.error(f'Autosave - Cannot read {journal_path}: {e}')
+            base, frames, journal_end = None, [], 0
+        if base != created:
+            frames, journal_end = [], 0
+        for saved, removals in frames:
+            # A connection removed and created again within a frame is in both, and alive
+            for conn_signature in removals:
+                hosts.pop(conn_signature, None)
+            for host in saved:
+                hosts[_Signature(host)] = host
+    return sorted(hosts.values(), key=lambda host: host.LastSeen), created, journal_end
+
+
+class SessionAutosave:
+    """
+    Checkpoints the connection table of a NetworkSniffer to a directory every few seconds, so a crash loses at most
+    one interval, and restores it on the next start.\n
+    A checkpoint only copies the connections that changed since the previous one (see NetworkSniffer.ChangesSince)
+    and appends them to the journal, so it costs time in proportion to the changes rather than the session. Once the
+    journal outgrows the snapshot it is compacted: a fresh snapshot is written and the journal starts over.
+    Compressing, writing and syncing all happen on the sniffers thread pool.
+    """
+
+    def __init__(self, sniffer, directory: str = DEFAULT_AUTOSAVE_DIR, interval=5.0, compact_ratio=1.0,
+                 min_compact_size=1 << 20):
+        """
+        :param sniffer: The NetworkSniffer to save
+        :param directory: Where the session is kept, created if needed
+        :param interval: Seconds between checkpoints
+        :param compact_ratio: Compact when the journal is larger than this times the snapshot
+        :param min_compact_size: ... and larger than this many bytes
+        """
+        self.Sniffer = sniffer
+        self.Directory = directory
+        self.SnapshotPath = os.path.join(directory, SNAPSHOT_NAME)
+        self.JournalPath = os.path.join(directory, JOURNAL_NAME)
+        self.Interval = interval
+        self.CompactRatio = compact_ratio
+        self.MinCompactSize = min_compact_size
+        self.Generation = 0
+        self.Journal = None  # type: Union[BinaryIO, None]
+        self.JournalSize = 0
+        self.SnapshotSize = 0
+        self.Busy = asyncio.Lock()
+        self.WriteLock = threading.Lock()  # Held while the journal is written or replaced
+        self.Task = None  # type: Union[asyncio.Task, None]
+        self.Checkpoints = 0
+        self.Compactions = 0
+
+    ## - Restore - ##
+    async def RestoreAsync(self) -> int:
+        """
+        Put the autosaved session back into the sniffer and continue its journal. Reading happens on the thread
+        pool. Call once, before Start().\n
+        :return: Number of connections restored
+        :raises OSError: If the directory can't be created or the journal can't be opened
+        """
+        loop = asyncio.get_running_loop()
+        os.makedirs(self.Directory, exist_ok=True)
+        saved, created, journal_end = await loop.run_in_executor(self.Sniffer.LoopPool, LoadSession, self.Directory)
+        restored = self.Sniffer.RestoreConnections(saved)
+        # What was just restored is already on disk
+        self.Generation = self.Sniffer.ChangesSince(self.Sniffer.GetGeneration()).Generation
+        self.SnapshotSize = os.path.getsize(self.SnapshotPath) if os.path.exists(self.SnapshotPath) else 0
+        await loop.run_in_executor(self.Sniffer.LoopPool, self._OpenJournal, created, journal_end)
+        if restored:
+            logging.info(f'Autosave - Restored {restored} connections from {self.Directory}')
+        return restored
+
+    def _OpenJournal(self, created: float, journal_end: int):
+        """Continue the journal after its last valid frame, or start a new one. (Runs in the executor)"""
+        with self.WriteLock:
+            if journal_end:
+                self.Journal = open(self.JournalPath, 'r+b')
+                self.Journal.truncate(journal_end)  # Drop a frame torn by a crash
+                self.Journal.seek(journal_end)
+                self.JournalSize = journal_end
+            else:
+                self._NewJournal(created)
+
+    def _NewJournal(self, created: float):
+        """Replace the journal with an empty one continuing the snapshot created at created. (Hold WriteLock)"""
+        temp_path = self.JournalPath + '.tmp'
+        with open(temp_path, 'wb') as file:
+            file.write(JOURNAL_HEADER.pack(JOURNAL_MAGIC, created))
+            file.flush()
+            os.fsync(file.fileno())
+        if self.Journal is not None:
+            self.Journal.close()
+        os.replace(temp_path, self.JournalPath)
+        self.Journal = open(self.JournalPath, 'ab')
+        self.JournalSize = JOURNAL_HEADER.size
+
+    ## - Checkpoints - ##
+    def _Changes(self):
+        """The changes since the last checkpoint, raises LookupError if removals were forgotten and only a
+        compaction can catch up."""
+        changes = self.Sniffer.ChangesSince(self.Generation)
+        if not changes.Complete:
+            raise LookupError('Removed connections were forgotten')
+        self.Generation = changes.Generation
+        return changes
+
+    async def _CollectFrameAsync(self, slice_size=5000) -> Union[Tuple[List[tuple], List[tuple], List[str]], None]:
+        """Copy the connections changed since the last checkpoint, slice_size at a time on the event loop. Whatever
+        changes in between is in a newer generation and goes to the next checkpoint. None if nothing changed."""
+        changes = self._Changes()
+        if not len(changes):
+            return None
+        strings = StringTable()
+        records = []
+        saved = set()
+        signatures = changes.New + changes.Updated
+        for i in range(0, len(signatures), slice_size):
+            for conn_signature in signatures[i:i + slice_size]:
+                record = self.Sniffer.SnapshotRecord(conn_signature, strings)
+                if record is not None:
+                    records.append(record)
+                    saved.add(conn_signature)
+            if i + slice_size < len(signatures):
+                await asyncio.sleep(0)
+        return records, self._Removals(changes, saved, strings), strings.Strings
+
+    def _Removals(self, changes, saved: set, strings: StringTable) -> List[tuple]:
+        """REMOVAL tuples for the connections removed and not created again since, in this frame or after it."""
+        connections = self.Sniffer.Connections
+        return [(strings.Intern(conn_signature[0]), conn_signature[1], conn_signature[2])
+                for conn_signature in changes.Removed
+                if conn_signature not in saved and conn_signature not in connections]
+
+    def _WriteFrame(self, records: List[tuple], removals: List[tuple], strings: List[str]) -> int:
+        """Append a frame to the journal and sync it. (Runs in the executor)"""
+        frame = EncodeFrame(records, removals, strings)
+        with self.WriteLock:
+            if self.Journal is None:
+                return 0  # Closed while this was queued
+            self.Journal.write(frame)
+            self.Journal.flush()
+            os.fsync(self.Journal.fileno())
+            self.JournalSize += len(frame)
+        return len(frame)
+
+    async def CheckpointAsync(self) -> int:
+        """
+        Save the connections changed since the previous checkpoint, compacting if the journal got too big.\n
+        :return: Number of connections saved
+        :raises OSError: If the journal or snapshot can't be written
+        """
+        async with self.Busy:
+            try:
+                frame = await self._CollectFrameAsync()
+            except LookupError:
+                return await self._CompactAsync()
+            if frame is None:
+                return 0
+            await asyncio.get_running_loop().run_in_executor(self.Sniffer.LoopPool, self._WriteFrame, *frame)
+            self.Checkpoints += 1
+            if self.JournalSize > max(self.MinCompactSize, self.SnapshotSize * self.CompactRatio):
+                await self._CompactAsync()
+            return len(frame[0]) + len(frame[1])
+
+    async def CompactAsync(self) -> int:
+        """Write a fresh snapshot of the whole table and start an empty journal. Returns the connections saved."""
+        async with self.Busy:
+            return await self._CompactAsync()
+
+    async def _CompactAsync(self) -> int:
+        # Anything changed from here on goes to the new journal, it may also make it into the snapshot but
+        # replaying whole records over a snapshot that already has them changes nothing
+        generation = self.Sniffer.ChangesSince(self.Sniffer.GetGeneration()).Generation
+        temp_path = self.SnapshotPath + '.tmp'
+        written = await self.Sniffer.SaveSnapshotAsync(temp_path, GetAvailableCodecs()[0])
+        await asyncio.get_running_loop().run_in_executor(self.Sniffer.LoopPool, self._ReplaceSnapshot, temp_path)
+        self.Generation = generation
+        self.Compactions += 1
+        return written
+
+    def _ReplaceSnapshot(self, temp_path: str):
+        """Make a freshly written snapshot the session's, then start a journal that continues it. A crash in
+        between leaves the old journal pointing at the old snapshot, so it is ignored. (Runs in the executor)"""
+        with open(temp_path, 'rb') as file:
+            created = HEADER.unpack(file.read(HEADER.size))[4]
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.SnapshotPath)
+        self.SnapshotSize = os.path.getsize(self.SnapshotPath)
+        with self.WriteLock:
+            self._NewJournal(created)
+
+    async def _AutosaveLoopAsync(self):
+        while True:
+            await asyncio.sleep(self.Interval)
+            try:
+                await self.CheckpointAsync()
+            except OSError as e:
+                logging.error(f'Autosave - Checkpoint to {self.Directory} failed: {e}')
+
+    def Start(self):
+        """Checkpoint every Interval seconds from now on."""
+        if self.Task is None:
+            self.Task = asyncio.get_running_loop().create_task(self._AutosaveLoopAsync())
+
+    def Close(self):
+        """Stop checkpointing, then save the last changes before exiting. Blocks, but also works once the event
+        loop is gone (ie. after it crashed)."""
+        if self.Task is not None:
+            self.Task.cancel()
+            self.Task = None
+        if self.Journal is None:
+            return
+        try:
+            changes = self._Changes()
+            strings = StringTable()
+            records = []
+            saved = set()
+            for conn_signature in changes.New + changes.Updated:
+                record = self.Sniffer.SnapshotRecord(conn_signature, strings)
+                if record is not None:
+                    records.append(record)
+                    saved.add(conn_signature)
+            removals = self._Removals(changes, saved, strings)
+            if records or removals:
+                self._WriteFrame(records, removals, strings.Strings)
+        except LookupError:
+            logging.error('Autosave - Too many connections were removed since the last checkpoint to save them')
+        except OSError as e:
+            logging.error(f'Autosave - Final checkpoint to {self.Directory} failed: {e}')
+        with self.WriteLock:
+            self.Journal.close()
+            self.Journal = None
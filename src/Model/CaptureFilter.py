@@ -0,0 +1,104 @@
+"""
+MIT License
+
+Copyright (c) 2022 0xKate
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import ipaddress
+from socket import inet_aton
+from typing import Dict, Iterable, List, Tuple
+
+# Project Files
+from Enums import PROTO
+
+# Addresses whose Matches() result is remembered per scope, the cache starts over when it is full
+ADDRESS_CACHE_SIZE = 65536
+
+
+class CaptureScope:
+    """What the sniffer monitors, compiled into a BPF filter so everything else is dropped by the kernel
+    before it is ever copied to userspace."""
+    __slots__ = ['LocalIPs', 'ExcludedNets', 'ExcludedPorts', 'Protocols', 'ExcludedRanges', 'ExcludedCache']
+
+    def __init__(self, local_ips: Iterable[str] = (), excluded_nets: Iterable[str] = ('127.0.0.0/8',),
+                 excluded_ports: Iterable[int] = (), protocols: Iterable[PROTO] = (PROTO.TCP, PROTO.UDP)):
+        """
+        :param local_ips: Only capture packets to or from these addresses, all addresses if empty
+        :param excluded_nets: Drop packets to or from these subnets (ie. '10.0.0.0/8')
+        :param excluded_ports: Drop packets to or from these ports on either end
+        :param protocols: The PROTO members to capture
+        :raises ValueError: If an address, subnet, port or protocol is invalid
+        """
+        self.LocalIPs = [str(ipaddress.IPv4Address(ip)) for ip in sorted(local_ips)]  # type: List[str]
+        self.ExcludedNets = [ipaddress.IPv4Network(net, strict=False) for net in excluded_nets]
+        self.ExcludedPorts = sorted({int(port) for port in excluded_ports})  # type: List[int]
+        self.Protocols = [PROTO(proto) for proto in protocols]  # type: List[PROTO]
+        # ExcludedNets as integer (network, mask) pairs, and whether an address is in one of them
+        self.ExcludedRanges = [(int(net.network_address), int(net.netmask))
+                               for net in self.ExcludedNets]  # type: List[Tuple[int, int]]
+        self.ExcludedCache = {}  # type: Dict[str, bool]
+        for port in self.ExcludedPorts:
+            if not 0 <= port <= 65535:
+                raise ValueError(f'Invalid port: {port}')
+        if not self.Protocols:
+            raise ValueError('At least one protocol must be captured')
+
+    def WithLocalIPs(self, local_ips: Iterable[str]) -> 'CaptureScope':
+        """A copy of this scope limited to local_ips, unless it already names its own local addresses."""
+        return CaptureScope(self.LocalIPs or local_ips, [net.with_prefixlen for net in self.ExcludedNets],
+                            self.ExcludedPorts, self.Protocols)
+
+    def Build(self) -> str:
+        """Compile the scope into a pcap filter expression."""
+        clauses = ['(' + ' or '.join(proto.name.lower() for proto in self.Protocols) + ')']
+        if self.LocalIPs:
+            clauses.append('(' + ' or '.join(f'host {ip}' for ip in self.LocalIPs) + ')')
+        for net in self.ExcludedNets:
+            clauses.append(f'not net {net.with_prefixlen}')
+        if self.ExcludedPorts:
+            clauses.append('not (' + ' or '.join(f'port {port}' for port in self.ExcludedPorts) + ')')
+        return ' and '.join(clauses)
+
+    def _IsExcluded(self, ip: str) -> bool:
+        """Whether ip is in one of ExcludedNets, remembered so a busy address is only looked at once."""
+        excluded = self.ExcludedCache.get(ip)
+        if excluded is None:
+            address = int.from_bytes(inet_aton(ip), 'big')
+            excluded = any(address & mask == network for network, mask in self.ExcludedRanges)
+            if len(self.ExcludedCache) >= ADDRESS_CACHE_SIZE:
+                self.ExcludedCache.clear()
+            self.ExcludedCache[ip] = excluded
+        return excluded
+
+    def Matches(self, src: str, sport: int, dst: str, dport: int, proto: PROTO) -> bool:
+        """The same test as Build() done in Python, for packets that did not come through a kernel filter
+        (ie. pcap replay). LocalIPs are left out, the sniffer already drops packets that aren't to or from the
+        address it is monitoring. Runs for every packet, so it allocates nothing for addresses seen before."""
+        if proto not in self.Protocols:
+            return False
+        if sport in self.ExcludedPorts or dport in self.ExcludedPorts:
+            return False
+        if self.ExcludedRanges and (self._IsExcluded(src) or self._IsExcluded(dst)):
+            return False
+        return True
+
+    def __str__(self):
+        return self.Build()
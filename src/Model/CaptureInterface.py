@@ -0,0 +1,167 @@
+"""
+MIT License
+
+Copyright (c) 2022 0xKate
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import logging
+from socket import AF_INET, SOCK_DGRAM, socket
+from typing import Callable, Dict, FrozenSet, Iterable, List, Union
+
+# 3rd Party Libraries
+import psutil
+
+# Project Files
+from Model.CaptureFilter import CaptureScope
+
+
+def GetInterfaceAddresses(name: str) -> List[str]:
+    """The IPv4 addresses assigned to an interface (including VLAN sub-interfaces and aliases)."""
+    return [addr.address for addr in psutil.net_if_addrs().get(name, []) if addr.family == AF_INET]
+
+
+def _DefaultRouteAddress() -> Union[str, None]:
+    """The local address traffic to the internet leaves from. Connecting a UDP socket only picks a route, nothing
+    is sent."""
+    with socket(AF_INET, SOCK_DGRAM) as probe:
+        try:
+            probe.connect(('192.0.2.1', 9))  # TEST-NET-1, only reachable through the default route
+            return probe.getsockname()[0]
+        except OSError:
+            return None
+
+
+def GetDefaultInterface() -> str:
+    """The interface of the default route. Read from the kernel routing table where there is one, elsewhere (ie.
+    Windows, macOS) found by the address the default route uses. Never asks scapy, because that means importing it
+    and building its routing tables, which is a large part of startup time."""
+    try:
+        with open('/proc/net/route') as routes:
+            next(routes)
+            for route in routes:
+                fields = route.split()
+                if len(fields) > 1 and fields[1] == '00000000':
+                    return fields[0]
+    except (OSError, StopIteration):
+        pass
+    interfaces = GetAvailableInterfaces()
+    address = _DefaultRouteAddress()
+    for name, addresses in interfaces.items():
+        if address in addresses:
+            return name
+    # No default route, prefer any interface with an address that isn't loopback
+    for name, addresses in interfaces.items():
+        if not all(addr.startswith('127.') for addr in addresses):
+            return name
+    return next(iter(interfaces), 'lo')
+
+
+def GetAvailableInterfaces() -> Dict[str, List[str]]:
+    """Every interface with at least one IPv4 address, mapped to its addresses."""
+    return {name: [addr.address for addr in addrs if addr.family == AF_INET]
+            for name, addrs in psutil.net_if_addrs().items()
+            if any(addr.family == AF_INET for addr in addrs)}
+
+
+class CaptureInterface:
+    """One packet source feeding the NetworkSniffer: a live capture on a single interface, in its own sniffer
+    thread so a slow interface never holds up the others, or a pcap replay (Live=False).
+    Each has its own set of local addresses, used to tell incoming from outgoing, and its own counters."""
+    __slots__ = ['Name', 'LocalIPs', 'Scope', 'Live', 'ScopeInPython', 'Sniffer', 'Callback', 'Sniffing',
+                 'Captured', 'Queued', 'Dropped', 'Shed', 'FilteredInPython', 'InterfaceStart', 'CapturedStart']
+
+    def __init__(self, name: str, callback: Callable, local_ips: Iterable[str] = None, scope: CaptureScope = None,
+                 live=True):
+        """
+        :param name: The interface name (ie. 'eth0', 'eth0.100') or a label for a replay
+        :param callback: Called with (this CaptureInterface, scapy packet) from the sniffer thread
+        :param local_ips: This hosts addresses on the interface, looked up if not given
+        :param scope: What to capture, its LocalIPs default to local_ips
+        :param live: False if packets are not coming from a kernel filtered capture
+        """
+        self.Name = name
+        self.LocalIPs = frozenset(local_ips if local_ips is not None else GetInterfaceAddresses(name))  # type: FrozenSet[str]
+        self.Live = live
+        self.ScopeInPython = not live
+        self.Callback = callback
+        self.Sniffer = None  # type: Union['scapy.sendrecv.AsyncSniffer', None]
+        self.Sniffing = False
+        self.Captured = 0
+        self.Queued = 0
+        self.Dropped = 0
+        self.Shed = 0
+        self.FilteredInPython = 0
+        self.InterfaceStart = 0
+        self.CapturedStart = 0
+        self.Scope = None  # type: Union[CaptureScope, None]
+        self.SetScope(scope or CaptureScope())
+
+    def _CapturedPacketCB(self, pkt):
+        """Callback for packets that made it through the kernel filter of the live capture."""
+        self.Captured += 1
+        self.Callback(self, pkt)
+
+    def _CreateSniffer(self):
+        # Imported on first use, loading scapy takes longer than the rest of startup together
+        from scapy.sendrecv import AsyncSniffer
+        return AsyncSniffer(iface=self.Name, prn=self._CapturedPacketCB, store=0, filter=self.Scope.Build())
+
+    def GetInterfacePackets(self) -> int:
+        """Packets sent and received by the interface according to the OS, filtered or not."""
+        counters = psutil.net_io_counters(pernic=True).get(self.Name)
+        return counters.packets_sent + counters.packets_recv if counters else 0
+
+    def SetScope(self, scope: CaptureScope):
+        """Change what is captured, the kernel filter is swapped by restarting the sniffer if it is running."""
+        self.Scope = scope.WithLocalIPs(self.LocalIPs)
+        if self.Sniffing:
+            self.Stop()
+            self.Start()
+
+    def Start(self):
+        if self.Live and not self.Sniffing:
+            self.InterfaceStart = self.GetInterfacePackets()
+            self.CapturedStart = self.Captured
+            self.Sniffer = self._CreateSniffer()
+            self.Sniffer.start()
+            self.Sniffing = True
+
+    def Stop(self):
+        if self.Sniffing:
+            try:
+                self.Sniffer.stop()
+            except Exception as e:
+                # The sniffer thread died (ie. the filter could not be set), stop() re-raises why
+                logging.error(f'CaptureInterface - Sniffer on {self.Name} failed: {e}')
+            self.Sniffing = False
+            # An AsyncSniffer can't be started twice, Start() makes a new one
+            self.Sniffer = None
+
+    def GetStats(self) -> Dict[str, int]:
+        """
+        Per interface counters. FilteredInKernel is an estimate, the packets the OS counted on the interface since
+        the sniffer started minus the packets that made it through the BPF filter to the sniffer.
+        """
+        interface_packets = self.GetInterfacePackets() - self.InterfaceStart if self.Sniffing else 0
+        captured = self.Captured - self.CapturedStart
+        return {'InterfacePackets': interface_packets, 'Captured': captured, 'Queued': self.Queued,
+                'Dropped': self.Dropped, 'Shed': self.Shed, 'FilteredInKernel': max(interface_packets - captured, 0),
+                'FilteredInPython': self.FilteredInPython}
@@ -0,0 +1,207 @@
+"""
+MIT License
+
+Copyright (c) 2022 0xKate
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import logging
+import multiprocessing
+import threading
+import time
+from multiprocessing.connection import Connection
+from typing import Callable, Dict, FrozenSet, Iterable, List, Tuple
+
+# Project Files
+from Model.PacketDecoder import DecodeFrame
+
+# A flows counters since the last flush, sent from a worker to the UI/model process:
+# (signature, interface, local_ip, local_port, proto_name, in_pkts, out_pkts, in_bytes, out_bytes, first, last)
+FlowDelta = Tuple[Tuple[str, int, int], str, str, int, str, int, int, int, int, float, float]
+
+
+def ShardFilter(base_filter: str, shard: int, shards: int) -> str:
+    """
+    Extend a BPF filter so the kernel only delivers one shard of the flows to a worker.\n
+    The flow hash is the sum of both addresses and both ports, which is the same in either direction, so every
+    packet of a flow goes to the same worker.\n
+    :param base_filter: The capture filter of the interface (ie. from CaptureScope.Build())
+    :param shard: This workers shard, 0 <= shard < shards
+    :param shards: Number of workers
+    """
+    if shards <= 1:
+        return base_filter
+    flow_hash = '(ip[12:4] + ip[16:4] + {0}[0:2] + {0}[2:2]) % {1} = {2}'
+    return f'({base_filter}) and ((tcp and {flow_hash.format("tcp", shards, shard)}) or ' \
+           f'(udp and {flow_hash.format("udp", shards, shard)}))'
+
+
+class _ShardAccumulator:
+    """Worker side: counts packets per flow until the next flush. (Lives in the worker process)"""
+    __slots__ = ['Lock', 'Flows', 'Captured', 'Decoded']
+
+    def __init__(self):
+        self.Lock = threading.Lock()
+        self.Flows = {}  # type: Dict[Tuple[str, int, int], list]
+        self.Captured = 0
+        self.Decoded = 0
+
+    def Add(self, interface: str, local_ips: FrozenSet[str], frame: bytes, linktype: int):
+        self.Captured += 1
+        decoded = DecodeFrame(frame, linktype)
+        if decoded is None:
+            return
+        src, sport, dst, dport, proto = decoded
+        if dst in local_ips:
+            incoming, remote_ip, remote_port, local_ip, local_port = True, src, sport, dst, dport
+        elif src in local_ips:
+            incoming, remote_ip, remote_port, local_ip, local_port = False, dst, dport, src, sport
+        else:
+            return
+        self.Decoded += 1
+        size = len(frame)
+        now = time.time()
+        signature = (remote_ip, remote_port, proto.value)
+        with self.Lock:
+            flow = self.Flows.get(signature)
+            if flow is None:
+                flow = self.Flows[signature] = [signature, interface, local_ip, local_port, proto.name,
+                                                0, 0, 0, 0, now, now]
+            if incoming:
+                flow[5] += 1
+                flow[7] += size
+            else:
+                flow[6] += 1
+                flow[8] += size
+            flow[10] = now
+
+    def Flush(self) -> List[FlowDelta]:
+        with self.Lock:
+            flows = self.Flows
+            self.Flows = {}
+        return [tuple(flow) for flow in flows.values()]
+
+
+def _WorkerMain(shard: int, shards: int, interfaces: Dict[str, Tuple[FrozenSet[str], str]], conn: Connection,
+                interval: float):
+    """Entry point of a worker process: capture one shard of the flows on every interface, decode the headers and
+    send the accumulated counters back every interval seconds until told to stop."""
+    from scapy.config import conf
+    from scapy.sendrecv import AsyncSniffer
+
+    accumulator = _ShardAccumulator()
+    sniffers = []
+    for name, (local_ips, base_filter) in interfaces.items():
+        def _PacketCB(pkt, _name=name, _local_ips=local_ips):
+            linktype = conf.l2types.layer2num.get(pkt.__class__)
+            if linktype is not None:
+                accumulator.Add(_name, _local_ips, pkt.original or bytes(pkt), linktype)
+        sniffer = AsyncSniffer(iface=name, prn=_PacketCB, store=0, filter=ShardFilter(base_filter, shard, shards))
+        sniffer.start()
+        sniffers.append(sniffer)
+    try:
+        while not conn.poll(interval):
+            conn.send((shard, accumulator.Flush(), {'Captured': accumulator.Captured,
+                                                    'Decoded': accumulator.Decoded}))
+    except (EOFError, OSError, KeyboardInterrupt):
+        pass
+    for sniffer in sniffers:
+        sniffer.stop()
+    try:
+        conn.send((shard, accumulator.Flush(), {'Captured': accumulator.Captured, 'Decoded': accumulator.Decoded}))
+        conn.close()
+    except (OSError, BrokenPipeError):
+        pass
+
+
+class CaptureWorkerPool:
+    """Runs capture and header decoding in N worker processes, each owning a shard of the flows chosen by a flow
+    hash in its kernel filter. Workers send compact per flow counter deltas over a pipe, which a reader thread in
+    this process hands to callback(shard, deltas) on the event loop."""
+    __slots__ = ['Loop', 'Callback', 'Workers', 'Interval', 'Processes', 'Pipes', 'Readers', 'Stats']
+
+    def __init__(self, loop, callback: Callable[[int, List[FlowDelta]], None], workers: int, interval=0.5):
+        """
+        :param loop: The event loop callback is run on
+        :param callback: Applies a batch of FlowDelta to the model (ie. NetworkSniffer._ApplyFlowDeltas)
+        :param workers: Number of worker processes
+        :param interval: Seconds between flushes from each worker
+        """
+        self.Loop = loop
+        self.Callback = callback
+        self.Workers = workers
+        self.Interval = interval
+        self.Processes = []  # type: List[multiprocessing.Process]
+        self.Pipes = []  # type: List[Connection]
+        self.Readers = []  # type: List[threading.Thread]
+        self.Stats = {}  # type: Dict[int, Dict[str, int]]
+
+    def _ReadWorker(self, conn: Connection):
+        """Forward deltas from one worker to the event loop until its pipe closes. (Runs on a reader thread)"""
+        while True:
+            try:
+                shard, deltas, stats = conn.recv()
+            except (EOFError, OSError):
+                return
+            self.Stats[shard] = stats
+            if deltas:
+                self.Loop.call_soon_threadsafe(self.Callback, shard, deltas)
+
+    def Start(self, interfaces: Dict[str, Tuple[Iterable[str], str]]):
+        """
+        :param interfaces: {name: (local addresses, base capture filter)} of every interface to capture on
+        """
+        context = multiprocessing.get_context('spawn')
+        interfaces = {name: (frozenset(local_ips), base_filter) for name, (local_ips, base_filter) in
+                      interfaces.items()}
+        for shard in range(self.Workers):
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(target=_WorkerMain, name=f'CaptureWorker-{shard}', daemon=True,
+                                      args=(shard, self.Workers, interfaces, child_conn, self.Interval))
+            process.start()
+            child_conn.close()
+            reader = threading.Thread(target=self._ReadWorker, args=(parent_conn,), daemon=True,
+                                      name=f'CaptureWorkerReader-{shard}')
+            reader.start()
+            self.Processes.append(process)
+            self.Pipes.append(parent_conn)
+            self.Readers.append(reader)
+        logging.info(f'CaptureWorkerPool - Started {self.Workers} capture workers on {", ".join(interfaces)}')
+
+    def Stop(self, timeout=5.0):
+        """Ask every worker to flush and exit, killing any that don't."""
+        for conn in self.Pipes:
+            try:
+                conn.send(None)
+            except (OSError, BrokenPipeError):
+                pass
+        for process in self.Processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        for reader in self.Readers:
+            reader.join(timeout)
+        self.Processes, self.Pipes, self.Readers = [], [], []
+
+    def IsRunning(self):
+        return any(process.is_alive() for process in self.Processes)
+
+    def GetStats(self) -> Dict[int, Dict[str, int]]:
+        return dict(self.Stats)
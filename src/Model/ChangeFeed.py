@@ -0,0 +1,107 @@
+"""
+MIT License
+
+Copyright (c) 2022 0xKate
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from collections import OrderedDict, deque
+from typing import Dict, Iterator, List, Tuple
+
+Signature = Tuple[str, int, int]
+
+
+class Changes:
+    """What happened to the connections between two generations, returned by ChangeFeed.ChangesSince()"""
+    __slots__ = ['New', 'Updated', 'Removed', 'Generation', 'Complete']
+
+    def __init__(self, new: List[Signature], updated: List[Signature], removed: List[Signature], generation: int,
+                 complete: bool):
+        self.New = new
+        self.Updated = updated
+        self.Removed = removed
+        self.Generation = generation  # Pass this to the next ChangesSince() call
+        self.Complete = complete  # False if removals were forgotten, the consumer should rescan everything
+
+    def __len__(self):
+        return len(self.New) + len(self.Updated) + len(self.Removed)
+
+    def GetChanged(self) -> List[Signature]:
+        return self.New + self.Updated + self.Removed
+
+
+class ChangeFeed:
+    """Generation counter per connection. Every connection remembers the generation it was created and last
+    modified in, kept in the order they were last touched so ChangesSince() only walks the connections that changed
+    and flow aging can start from the least recently seen."""
+    __slots__ = ['Generation', 'Log', 'Removed', 'ForgottenGeneration']
+
+    def __init__(self, max_removed=100000):
+        """:param max_removed: Number of removals remembered for consumers that have not caught up yet"""
+        self.Generation = 1
+        self.Log = OrderedDict()  # type: Dict[Signature, Tuple[int, int]]
+        self.Removed = deque(maxlen=max_removed)  # type: deque
+        self.ForgottenGeneration = 0
+
+    def Touch(self, signature: Signature):
+        """Mark a connection as created or modified in the current generation, and as the most recently touched."""
+        generation = self.Generation
+        entry = self.Log.get(signature)
+        if entry is None:
+            self.Log[signature] = (generation, generation)
+        else:
+            if entry[1] != generation:
+                self.Log[signature] = (entry[0], generation)
+            # Also within a generation, which only advances when something calls ChangesSince()
+            self.Log.move_to_end(signature)
+
+    def Remove(self, signature: Signature):
+        """Mark a connection as removed in the current generation."""
+        if self.Log.pop(signature, None) is not None:
+            if len(self.Removed) == self.Removed.maxlen:
+                self.ForgottenGeneration = self.Removed[0][0]
+            self.Removed.append((self.Generation, signature))
+
+    def Oldest(self) -> Iterator[Signature]:
+        """Live connections from least to most recently touched. Don't Touch() or Remove() while iterating."""
+        return iter(self.Log)
+
+    def ChangesSince(self, generation: int) -> Changes:
+        """
+        ChangesSince(generation) -> Changes\n
+        :param generation: The Generation of the previous Changes, or 0 for everything
+        :return: The connections created, modified and removed after that generation
+        """
+        new, updated, removed = [], [], []
+        for signature, (created, modified) in reversed(self.Log.items()):
+            if modified <= generation:
+                break
+            if created > generation:
+                new.append(signature)
+            else:
+                updated.append(signature)
+        for removed_generation, signature in reversed(self.Removed):
+            if removed_generation <= generation:
+                break
+            removed.append(signature)
+        current = self.Generation
+        # Close the current generation, anything touched from now on is newer than what was returned
+        self.Generation += 1
+        return Changes(new, updated, removed, current, generation >= self.ForgottenGeneration)
@@ -0,0 +1,377 @@
+"""
+MIT License
+
+Copyright (c) 2022 0xKate
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import math
+import time
+from array import array
+from datetime import datetime
+from typing import Dict, Iterator, List, Tuple, Union
+
+from Enums import DIRECTION
+from Model.RateMeter import RATE_NAMES, RATE_WINDOWS, Decay, Now, SortKey
+
+# Typed columns of the store, (name, array typecode)
+INT_COLUMNS = ['PacketCount', 'IncomingCount', 'OutgoingCount', 'BandwidthUsage', 'UploadUsage', 'DownloadUsage',
+               'LocalPort', 'RemotePort', 'PID', 'FD', 'ProcessPID', 'Estimated', 'SocketCheck']
+BYTE_RATE_COLUMNS = [f'ByteRate{name}' for name in RATE_NAMES]
+PACKET_RATE_COLUMNS = [f'PacketRate{name}' for name in RATE_NAMES]
+FLOAT_COLUMNS = ['FirstSeen', 'LastSeen', 'ProcessCreateTime', 'RateTime'] + BYTE_RATE_COLUMNS + PACKET_RATE_COLUMNS
+# (window, byte rate column, packet rate column) for each of RATE_WINDOWS
+RATE_COLUMNS = tuple(zip(RATE_WINDOWS, BYTE_RATE_COLUMNS, PACKET_RATE_COLUMNS))
+STRING_COLUMNS = ['ProtoType', 'LocalIP', 'RemoteIP', 'RemoteHostname', 'Status', 'ProcessName', 'Interface']
+NO_STRING = -1
+
+
+class StringTable:
+    """Interns strings so every host, address and process name is stored once and referenced by an int id."""
+    __slots__ = ['Strings', 'Ids']
+
+    def __init__(self):
+        self.Strings = []  # type: List[str]
+        self.Ids = {}  # type: Dict[str, int]
+
+    def Intern(self, value: Union[str, None]) -> int:
+        if value is None:
+            return NO_STRING
+        string_id = self.Ids.get(value)
+        if string_id is None:
+            string_id = self.Ids[value] = len(self.Strings)
+            self.Strings.append(value)
+        return string_id
+
+    def Get(self, string_id: int) -> Union[str, None]:
+        return self.Strings[string_id] if string_id != NO_STRING else None
+
+    def __len__(self):
+        return len(self.Strings)
+
+
+def _IntColumn(name):
+    return property(lambda self: self.Store.Columns[name][self.Slot])
+
+
+def _StringColumn(name):
+    return property(lambda self: self.Store.Strings.Get(self.Store.Columns[name][self.Slot]))
+
+
+def _TimeColumn(name):
+    return property(lambda self: datetime.fromtimestamp(self.Store.Columns[name][self.Slot]))
+
+
+def _RateKeyColumn(name, window):
+    return property(lambda self: SortKey(self.Store.Columns[name][self.Slot],
+                                         self.Store.Columns['RateTime'][self.Slot], window))
+
+
+class ConnectionView:
+    """Lightweight row view of one connection in a ConnectionStore, with the same interface as HostData."""
+    __slots__ = ['Store', 'Slot']
+
+    def __init__(self, store, slot: int):
+        self.Store = store
+        self.Slot = slot
+
+    FirstSeen = _TimeColumn('FirstSeen')
+    LastSeen = _TimeColumn('LastSeen')
+    LastSeenTime = _IntColumn('LastSeen')
+    ProtoType = _StringColumn('ProtoType')
+    PacketCount = _IntColumn('PacketCount')
+    IncomingCount = _IntColumn('IncomingCount')
+    OutgoingCount = _IntColumn('OutgoingCount')
+    BandwidthUsage = _IntColumn('BandwidthUsage')
+    UploadUsage = _IntColumn('UploadUsage')
+    DownloadUsage = _IntColumn('DownloadUsage')
+    LocalPort = _IntColumn('LocalPort')
+    LocalIP = _StringColumn('LocalIP')
+    RemotePort = _IntColumn('RemotePort')
+    RemoteIP = _StringColumn('RemoteIP')
+    RemoteHostname = _StringColumn('RemoteHostname')
+    ProcessName = _StringColumn('ProcessName')
+    Interface = _StringColumn('Interface')
+    ByteRateKey1s = _RateKeyColumn('ByteRate1s', RATE_WINDOWS[0])
+    ByteRateKey10s = _RateKeyColumn('ByteRate10s', RATE_WINDOWS[1])
+    ByteRateKey60s = _RateKeyColumn('ByteRate60s', RATE_WINDOWS[2])
+    PacketRateKey10s = _RateKeyColumn('PacketRate10s', RATE_WINDOWS[1])
+
+    @property
+    def Estimated(self) -> bool:
+        return bool(self.Store.Columns['Estimated'][self.Slot])
+
+    @property
+    def SocketData(self) -> Union[Tuple[int, str, int], None]:
+        columns = self.Store.Columns
+        status = columns['Status'][self.Slot]
+        if status == NO_STRING:
+            return None
+        pid = columns['PID'][self.Slot]
+        return pid if pid >= 0 else None, self.Store.Strings.Get(status), columns['FD'][self.Slot]
+
+    @property
+    def SocketCheck(self) -> int:
+        return self.Store.Columns['SocketCheck'][self.Slot]
+
+    @SocketCheck.setter
+    def SocketCheck(self, refreshes: int):
+        self.Store.Columns['SocketCheck'][self.Slot] = refreshes
+
+    @property
+    def ProcessKey(self) -> Union[Tuple[int, float], None]:
+        pid = self.Store.Columns['ProcessPID'][self.Slot]
+        return (pid, self.Store.Columns['ProcessCreateTime'][self.Slot]) if pid >= 0 else None
+
+    def IncrementCount(self, conn_direction: DIRECTION, pkt_size, weight=1, now: float = None,
+                       wall: float = None):
+        """Same as HostData.IncrementCount()"""
+        self.Store.IncrementCount(self.Slot, conn_direction, pkt_size, weight, now, wall)
+
+    def AddCounts(self, in_pkts, out_pkts, in_bytes, out_bytes):
+        columns = self.Store.Columns
+        slot = self.Slot
+        columns['PacketCount'][slot] += in_pkts + out_pkts
+        columns['IncomingCount'][slot] += in_pkts
+        columns['OutgoingCount'][slot] += out_pkts
+        columns['BandwidthUsage'][slot] += in_bytes + out_bytes
+        columns['DownloadUsage'][slot] += in_bytes
+        columns['UploadUsage'][slot] += out_bytes
+        self.Store.AddRates(slot, in_pkts + out_pkts, in_bytes + out_bytes)
+
+    def Restore(self, saved):
+        """Same as HostData.Restore()"""
+        columns = self.Store.Columns
+        slot = self.Slot
+        columns['FirstSeen'][slot] = saved.FirstSeen.timestamp()
+        columns['LastSeen'][slot] = saved.LastSeen.timestamp()
+        for name in ('PacketCount', 'IncomingCount', 'OutgoingCount', 'BandwidthUsage', 'DownloadUsage',
+                     'UploadUsage'):
+            columns[name][slot] = getattr(saved, name)
+        columns['ProcessName'][slot] = self.Store.Strings.Intern(saved.ProcessName)
+        columns['Estimated'][slot] = 1 if saved.Estimated else 0
+
+    def GetByteRate(self, window: int) -> float:
+        columns = self.Store.Columns
+        return Decay(columns[BYTE_RATE_COLUMNS[window]][self.Slot], columns['RateTime'][self.Slot], Now(),
+                     RATE_WINDOWS[window])
+
+    def GetPacketRate(self, window: int) -> float:
+        columns = self.Store.Columns
+        return Decay(columns[PACKET_RATE_COLUMNS[window]][self.Slot], columns['RateTime'][self.Slot], Now(),
+                     RATE_WINDOWS[window])
+
+    def __str__(self):
+        return f'RemoteHost: {self.RemoteHostname}:{self.RemotePort} - ' \
+               f'PacketCount: {self.PacketCount} Incoming: {self.IncomingCount} Outgoing: {self.OutgoingCount}'
+
+    def GetProcName(self):
+        return self.ProcessName
+
+    def SetProcess(self, process_info):
+        self.Store.Columns['ProcessPID'][self.Slot] = process_info.PID
+        self.Store.Columns['ProcessCreateTime'][self.Slot] = process_info.CreateTime
+        self.Store.Columns['ProcessName'][self.Slot] = self.Store.Strings.Intern(process_info.Name)
+
+    def SetRemoteHostname(self, NewRemoteHostname):
+        self.Store.Columns['RemoteHostname'][self.Slot] = self.Store.Strings.Intern(NewRemoteHostname)
+
+    def GetRemoteEndPoint(self):
+        return f'{self.RemoteHostname}:{self.RemotePort}'
+
+    def GetPID(self):
+        return max(self.Store.Columns['PID'][self.Slot], 0)
+
+    def SetFirstSeen(self, timestamp: float):
+        self.Store.Columns['FirstSeen'][self.Slot] = timestamp
+
+    def SetLastSeen(self, timestamp: float):
+        self.Store.Columns['LastSeen'][self.Slot] = timestamp
+
+    def SetSocketData(self, socket_data):
+        self.Store.SetSocketData(self.Slot, socket_data)
+
+
+class ConnectionStore:
+    """Struct-of-arrays alternative to a Dict[signature, HostData].
+    Every connection gets an integer slot, its counters and timestamps live in typed arrays and its strings in a
+    shared StringTable. Supports the dict operations NetworkSniffer uses, values are ConnectionView objects."""
+    __slots__ = ['Columns', 'Strings', 'Slots', 'Signatures', 'FreeSlots', 'CompactedStrings']
+
+    def __init__(self):
+        self.Columns = {}  # type: Dict[str, array]
+        for name in INT_COLUMNS:
+            self.Columns[name] = array('q')
+        for name in FLOAT_COLUMNS:
+            self.Columns[name] = array('d')
+        for name in STRING_COLUMNS:
+            self.Columns[name] = array('i')
+        self.Strings = StringTable()
+        self.Slots = {}  # type: Dict[Tuple[str, int, int], int]
+        self.Signatures = []  # type: List[Union[Tuple[str, int, int], None]]
+        self.FreeSlots = []  # type: List[int]
+        self.CompactedStrings = 0
+
+    def Add(self, signature, LocalIP, LocalPort, RemoteIP, RemotePort, RemoteHostname, ProtoType,
+            socket_data, Interface=None) -> ConnectionView:
+        """Add a new connection, takes the same arguments as HostData after the signature."""
+        now = time.time()
+        values = {'LocalPort': LocalPort, 'RemotePort': RemotePort, 'PID': -1, 'FD': -1, 'ProcessPID': -1,
+                  'SocketCheck': -1,
+                  'FirstSeen': now, 'LastSeen': now, 'RateTime': Now(),
+                  'LocalIP': self.Strings.Intern(LocalIP), 'RemoteIP': self.Strings.Intern(RemoteIP),
+                  'RemoteHostname': self.Strings.Intern(RemoteHostname), 'ProtoType': self.Strings.Intern(ProtoType),
+                  'Interface': self.Strings.Intern(Interface)}
+        if self.FreeSlots:
+            slot = self.FreeSlots.pop()
+            for name, column in self.Columns.items():
+                column[slot] = values.get(name, 0 if name not in STRING_COLUMNS else NO_STRING)
+            self.Signatures[slot] = signature
+        else:
+            slot = len(self.Signatures)
+            for name, column in self.Columns.items():
+                column.append(values.get(name, 0 if name not in STRING_COLUMNS else NO_STRING))
+            self.Signatures.append(signature)
+        self.Slots[signature] = slot
+        self.SetSocketData(slot, socket_data)
+        return ConnectionView(self, slot)
+
+    def SetSocketData(self, slot: int, socket_data):
+        if socket_data:
+            pid, status, fd = socket_data
+            self.Columns['PID'][slot] = pid if pid is not None else -1
+            self.Columns['Status'][slot] = self.Strings.Intern(status)
+            self.Columns['FD'][slot] = fd if fd is not None else -1
+        else:
+            self.Columns['PID'][slot] = -1
+            self.Columns['Status'][slot] = NO_STRING
+            self.Columns['FD'][slot] = -1
+
+    def IncrementCount(self, slot: int, conn_direction: DIRECTION, pkt_size, weight=1, now: float = None,
+                       wall: float = None):
+        """HostData.IncrementCount() on a slot, the packet accounting path uses it without making a ConnectionView"""
+        columns = self.Columns
+        if weight != 1:
+            pkt_size *= weight
+            columns['Estimated'][slot] = 1
+        columns['PacketCount'][slot] += weight
+        columns['BandwidthUsage'][slot] += pkt_size
+        if conn_direction == DIRECTION.INCOMING:
+            columns['IncomingCount'][slot] += weight
+            columns['DownloadUsage'][slot] += pkt_size
+        else:
+            columns['OutgoingCount'][slot] += weight
+            columns['UploadUsage'][slot] += pkt_size
+        if now is None:
+            now = Now()
+        self.AddRates(slot, weight, pkt_size, now)
+        columns['LastSeen'][slot] = wall if wall is not None else time.time()
+
+    def AddRates(self, slot: int, packets, size, now: float = None):
+        """Same as Model.RateMeter.RateMeter.Add() on a slots rate columns"""
+        columns = self.Columns
+        if now is None:
+            now = Now()
+        elapsed = now - columns['RateTime'][slot]
+        if elapsed > 0.0:
+            columns['RateTime'][slot] = now
+        for window, byte_column, packet_column in RATE_COLUMNS:
+            decay = math.exp(-elapsed / window) if elapsed > 0.0 else 1.0
+            columns[byte_column][slot] = columns[byte_column][slot] * decay + size / window
+            columns[packet_column][slot] = columns[packet_column][slot] * decay + packets / window
+
+    ## - Dict interface - ##
+    def __contains__(self, signature):
+        return signature in self.Slots
+
+    def __getitem__(self, signature) -> ConnectionView:
+        return ConnectionView(self, self.Slots[signature])
+
+    def get(self, signature, default=None):
+        slot = self.Slots.get(signature)
+        return ConnectionView(self, slot) if slot is not None else default
+
+    def __delitem__(self, signature):
+        slot = self.Slots.pop(signature)
+        self.Signatures[slot] = None
+        self.FreeSlots.append(slot)
+
+    def pop(self, signature, *default):
+        if signature not in self.Slots and default:
+            return default[0]
+        view = self[signature]
+        del self[signature]
+        return view
+
+    def __len__(self):
+        return len(self.Slots)
+
+    def __iter__(self) -> Iterator[Tuple[str, int, int]]:
+        return iter(self.Slots)
+
+    def keys(self):
+        return self.Slots.keys()
+
+    def values(self) -> Iterator[ConnectionView]:
+        return (ConnectionView(self, slot) for slot in self.Slots.values())
+
+    def items(self) -> Iterator[Tuple[Tuple[str, int, int], ConnectionView]]:
+        return ((signature, ConnectionView(self, slot)) for signature, slot in self.Slots.items())
+
+    ## - Bulk operations - ##
+    def SortedSlots(self, column: str, descending=True) -> List[int]:
+        """Slots of all live connections ordered by one column, in a single pass over its array."""
+        values = self.Columns[column]
+        return sorted(self.Slots.values(), key=values.__getitem__, reverse=descending)
+
+    def Sorted(self, column: str, descending=True) -> List[ConnectionView]:
+        return [ConnectionView(self, slot) for slot in self.SortedSlots(column, descending)]
+
+    def Sum(self, column: str):
+        """Total of one column over all live connections."""
+        values = self.Columns[column]
+        if not self.FreeSlots:
+            return sum(values)
+        return sum(values[slot] for slot in self.Slots.values())
+
+    def CompactStrings(self, growth=2) -> bool:
+        """
+        Drop strings no live connection refers to any more, once the StringTable has grown to growth times its
+        size after the last compaction. Keeps memory flat while old connections are removed and new ones added.\n
+        :return: True if the table was compacted
+        """
+        if len(self.Strings) < max(self.CompactedStrings * growth, 1024):
+            return False
+        strings = StringTable()
+        slots = list(self.Slots.values())
+        for name in STRING_COLUMNS:
+            column = self.Columns[name]
+            for slot in slots:
+                column[slot] = strings.Intern(self.Strings.Get(column[slot]))
+        for slot in self.FreeSlots:
+            for name in STRING_COLUMNS:
+                self.Columns[name][slot] = NO_STRING
+        self.Strings = strings
+        self.CompactedStrings = len(strings)
+        return True
+
+    def GetMemoryUsage(self) -> int:
+        """Approximate bytes used by the column arrays."""
+        return sum(column.buffer_info()[1] * column.itemsize for column in self.Columns.values())
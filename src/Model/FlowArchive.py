@@ -0,0 +1,98 @@
+"""
+MIT License
+
+Copyright (c) 2022 0xKate
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import gzip
+import json
+import logging
+import queue
+import threading
+from typing import Dict, Iterator, List, Union
+
+from Model.HostData import HostData
+
+
+def FlowRecord(host: HostData) -> Dict[str, Union[str, int, None]]:
+    """A plain copy of a connection that no longer references the live table."""
+    return {'RemoteIP': host.RemoteIP, 'RemotePort': host.RemotePort, 'RemoteHostname': host.RemoteHostname,
+            'LocalIP': host.LocalIP, 'LocalPort': host.LocalPort, 'ProtoType': host.ProtoType,
+            'Interface': host.Interface, 'PacketCount': host.PacketCount, 'IncomingCount': host.IncomingCount,
+            'OutgoingCount': host.OutgoingCount, 'BandwidthUsage': host.BandwidthUsage,
+            'DownloadUsage': host.DownloadUsage, 'UploadUsage': host.UploadUsage, 'PID': host.GetPID(),
+            'ProcessName': host.GetProcName(), 'FirstSeen': host.FirstSeen.isoformat(),
+            'LastSeen': host.LastSeen.isoformat(), 'Estimated': host.Estimated}
+
+
+class FlowArchive(threading.Thread):
+    """Appends evicted connections to a gzip compressed JSON lines file from a background thread.
+    Each batch is written as its own gzip member, so a crash can only lose the batch being written."""
+
+    def __init__(self, pathname: str):
+        """Creating an instance of this class starts the writer thread immediately.
+        :param pathname: Path of the archive, appended to if it exists
+        """
+        threading.Thread.__init__(self, name='FlowArchiveThread', daemon=True)
+        self.FilePath = pathname
+        self.Batches = queue.Queue()  # type: queue.Queue
+        self.Archived = 0
+        self.start()
+
+    def Write(self, records: List[Dict]):
+        """Queue a batch of FlowRecord() for writing, returns immediately."""
+        if records:
+            self.Batches.put(records)
+
+    def Close(self):
+        """Write whatever is queued and stop the writer thread."""
+        self.Batches.put(None)
+        self.join()
+
+    def run(self) -> None:
+        while True:
+            records = self.Batches.get()
+            if records is None:
+                return
+            # Drain whatever queued up behind this batch into the same gzip member
+            while True:
+                try:
+                    more = self.Batches.get_nowait()
+                except queue.Empty:
+                    break
+                if more is None:
+                    self.Batches.put(None)
+                    break
+                records.extend(more)
+            try:
+                with gzip.open(self.FilePath, 'at', encoding='utf-8') as file:
+                    file.writelines(json.dumps(record) + '\n' for record in records)
+                self.Archived += len(records)
+            except OSError as e:
+                logging.error(f'FlowArchive - Lost {len(records)} flows, cannot write {self.FilePath}: {e}')
+
+
+def ReadFlowArchive(pathname: str) -> Iterator[Dict]:
+    """Every FlowRecord() in an archive, oldest first."""
+    with gzip.open(pathname, 'rt', encoding='utf-8') as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
@@ -0,0 +1,188 @@
+"""
+MIT License
+
+Copyright (c) 2022 0xKate
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import asyncio
+import csv
+import errno
+import io
+import json
+import os
+import stat
+import sys
+from typing import List, TextIO, Tuple, Union
+
+# Project Files
+from Model.FlowArchive import FlowRecord
+
+EXPORT_FORMATS = ('csv', 'jsonl')
+EXPORT_FIELDS = ['RemoteIP', 'RemotePort', 'RemoteHostname', 'LocalIP', 'LocalPort', 'ProtoType', 'Interface',
+                 'PacketCount', 'IncomingCount', 'OutgoingCount', 'BandwidthUsage', 'DownloadUsage', 'UploadUsage',
+                 'PID', 'ProcessName', 'FirstSeen', 'LastSeen', 'Estimated']
+
+
+class FlowExporter:
+    """
+    Streams connections as CSV or newline delimited JSON to a file, stdout ('-') or a named pipe.\n
+    The stream stays open between exports, so with changed_only each ExportAsync() appends just the connections
+    created or updated since the previous one, which makes it suitable for feeding a log pipeline continuously.
+    Writes go through a buffered file on the thread pool, so a slow reader on a pipe never blocks the event loop.
+    Opening never waits either: a named pipe without a reader is skipped, and opened by the first export after one
+    attaches.
+    """
+    __slots__ = ['Target', 'Format', 'ChangedOnly', 'Append', 'Stream', 'Generation', 'WroteHeader', 'Exported',
+                 'Owned']
+
+    def __init__(self, target: str, fmt: str = 'csv', changed_only=False, append=False):
+        """
+        Nothing is opened until OpenAsync() or the first ExportAsync().\n
+        :param target: A file path, the path of a FIFO, or '-' for stdout
+        :param fmt: One of EXPORT_FORMATS
+        :param changed_only: Only export connections changed since this exporters previous ExportAsync()
+        :param append: Append to an existing file instead of replacing it
+        :raises ValueError: If the format is unknown
+        """
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f'Unknown export format {fmt}, expected one of {", ".join(EXPORT_FORMATS)}')
+        self.Target = target
+        self.Format = fmt
+        self.ChangedOnly = changed_only
+        self.Append = append
+        self.Generation = 0
+        self.Exported = 0
+        self.WroteHeader = False
+        self.Owned = target != '-'
+        self.Stream = None if self.Owned else sys.stdout  # type: Union[TextIO, None]
+
+    def _IsFifo(self) -> bool:
+        try:
+            return stat.S_ISFIFO(os.stat(self.Target).st_mode)
+        except OSError:
+            return False
+
+    def _Open(self) -> bool:
+        """Open the target, False if it is a named pipe nobody reads yet. (Runs in the executor)"""
+        if self._IsFifo():
+            try:
+                # Without O_NONBLOCK opening a FIFO for writing waits until a reader opens it
+                fd = os.open(self.Target, os.O_WRONLY | getattr(os, 'O_NONBLOCK', 0))
+            except OSError as e:
+                if e.errno == errno.ENXIO:
+                    return False
+                raise
+            os.set_blocking(fd, True)
+            self.Stream = open(fd, 'w', buffering=1 << 16, newline='', encoding='utf-8')
+            self.WroteHeader = False  # Every reader of a pipe gets a header
+            return True
+        # Don't repeat the CSV header when appending to a file that already has one
+        self.WroteHeader = self.Append and os.path.isfile(self.Target) and os.path.getsize(self.Target) > 0
+        self.Stream = open(self.Target, 'a' if self.Append else 'w', buffering=1 << 16, newline='', encoding='utf-8')
+        return True
+
+    async def OpenAsync(self) -> bool:
+        """
+        Open the target on the thread pool if it isn't yet.\n
+        :return: False if the target is a named pipe without a reader, the next call tries again
+        :raises OSError: If the target can't be opened
+        """
+        if self.Stream is not None:
+            return True
+        return await asyncio.get_running_loop().run_in_executor(None, self._Open)
+
+    def _FormatLines(self, records: List[dict]) -> str:
+        if self.Format == 'jsonl':
+            return ''.join(json.dumps(record) + '\n' for record in records)
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, EXPORT_FIELDS, extrasaction='ignore', lineterminator='\n')
+        if not self.WroteHeader:
+            writer.writeheader()
+            self.WroteHeader = True
+        writer.writerows(records)
+        return buffer.getvalue()
+
+    def _Write(self, text: str):
+        try:
+            self.Stream.write(text)
+            self.Stream.flush()
+        except OSError:
+            if self.Owned and self._IsFifo():
+                # The reader went away, open the pipe again once another one attaches
+                stream, self.Stream = self.Stream, None
+                try:
+                    stream.close()
+                except OSError:
+                    pass
+            raise
+
+    def _Signatures(self, sniffer) -> List[Tuple[str, int, int]]:
+        if not self.ChangedOnly:
+            return list(sniffer.GetConnectionsDict().keys())
+        # Anything that changes after this is in a newer generation, so it is picked up by the next export
+        changes = sniffer.ChangesSince(self.Generation)
+        self.Generation = changes.Generation
+        return changes.New + changes.Updated
+
+    async def ExportAsync(self, sniffer, slice_size=5000) -> int:
+        """
+        Write every connection, or with ChangedOnly those changed since the last export.\n
+        :param sniffer: The NetworkSniffer to export from
+        :return: Number of connections written, 0 while a named pipe has no reader
+        :raises OSError: If the target can't be opened or written (ie. the reader of a pipe went away)
+        """
+        if not await self.OpenAsync():
+            return 0
+        loop = asyncio.get_running_loop()
+        connections = sniffer.GetConnectionsDict()
+        signatures = self._Signatures(sniffer)
+        written = 0
+        for i in range(0, len(signatures), slice_size):
+            records = []
+            for conn_signature in signatures[i:i + slice_size]:
+                host = connections.get(conn_signature)
+                if host is not None:
+                    records.append(FlowRecord(host))
+            if records:
+                await loop.run_in_executor(None, self._Write, self._FormatLines(records))
+                written += len(records)
+        self.Exported += written
+        return written
+
+    def Close(self):
+        if self.Stream is None:
+            return
+        if self.Owned:
+            self.Stream.close()
+            self.Stream = None
+        else:
+            self.Stream.flush()
+
+
+async def ExportFileAsync(sniffer, pathname: str, fmt: str) -> int:
+    """One off export of every connection to a file."""
+    exporter = FlowExporter(pathname, fmt)
+    try:
+        if not await exporter.OpenAsync():
+            raise OSError(errno.ENXIO, 'Nothing is reading the named pipe', pathname)
+        return await exporter.ExportAsync(sniffer)
+    finally:
+        exporter.Close()
@@ -22,19 +22,23 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
+import time
 from datetime import datetime
 
-import psutil
+from Enums import DIRECTION
+from Model.RateMeter import RateMeter
 
 
 class HostData:
-    __slots__ = ['FirstSeen','LastSeen','ProtoType','PacketCount','IncomingCount','OutgoingCount',
+    __slots__ = ['FirstSeen','LastSeenTime','ProtoType','PacketCount','IncomingCount','OutgoingCount',
                  'BandwidthUsage','UploadUsage','DownloadUsage','LocalPort','LocalIP','RemotePort',
-                 'RemoteIP','RemoteHostname','SocketData', 'ProcessName']
+                 'RemoteIP','RemoteHostname','SocketData', 'ProcessName', 'ProcessKey',
+                 'Interface', 'Rates', 'Estimated', 'SocketCheck']
 
-    def __init__(self, LocalIP, LocalPort, RemoteIP, RemotePort, RemoteHostname, ProtoType, socket_data):
-        self.FirstSeen = datetime.now()
-        self.LastSeen = datetime.now()
+    def __init__(self, LocalIP, LocalPort, RemoteIP, RemotePort, RemoteHostname, ProtoType, socket_data,
+                 Interface=None):
+        self.LastSeenTime = time.time()  # type: float
+        self.FirstSeen = datetime.fromtimestamp(self.LastSeenTime)
         self.ProtoType = ProtoType
         self.PacketCount = 0
         self.IncomingCount = 0
@@ -49,27 +53,87 @@ class HostData:
         self.RemoteHostname = RemoteHostname
         self.SocketData = socket_data
         self.ProcessName = None
-
-    def IncrementCount(self, conn_direction, pkt_size):
-        self.PacketCount += 1
+        self.ProcessKey = None
+        self.Interface = Interface
+        self.Rates = RateMeter()
+        self.Estimated = False  # Counted from sampled packets, see Model.LoadShedder
+        self.SocketCheck = -1  # SocketTable.Refreshes when the owner was last looked up
+
+    def IncrementCount(self, conn_direction: DIRECTION, pkt_size, weight=1, now: float = None,
+                       wall: float = None):
+        """
+        Count one packet and mark the connection as seen.\n
+        :param weight: Number of packets this one stands for when sampling, the counts become estimates
+        :param now: Model.RateMeter.Now() for the rates, read once for a whole batch of packets by the caller
+        :param wall: time.time() for LastSeen, read along with now
+        """
+        if weight != 1:
+            pkt_size *= weight
+            self.Estimated = True
+        self.PacketCount += weight
         self.BandwidthUsage += pkt_size
-        if conn_direction == 'Incoming':
-            self.IncomingCount += 1
+        if conn_direction == DIRECTION.INCOMING:
+            self.IncomingCount += weight
             self.DownloadUsage += pkt_size
-        elif conn_direction == 'Outgoing':
-            self.OutgoingCount += 1
+        else:
+            self.OutgoingCount += weight
             self.UploadUsage += pkt_size
+        self.Rates.Add(weight, pkt_size, now)
+        self.LastSeenTime = wall if wall is not None else time.time()
+
+    def AddCounts(self, in_pkts, out_pkts, in_bytes, out_bytes):
+        """Add counters accumulated elsewhere (ie. by a capture worker process) in one go."""
+        self.PacketCount += in_pkts + out_pkts
+        self.IncomingCount += in_pkts
+        self.OutgoingCount += out_pkts
+        self.BandwidthUsage += in_bytes + out_bytes
+        self.DownloadUsage += in_bytes
+        self.UploadUsage += out_bytes
+        self.Rates.Add(in_pkts + out_pkts, in_bytes + out_bytes)
+
+    def Restore(self, saved):
+        """Take the counters, times and process name of a connection saved by an earlier session
+        (ie. a Model.SnapshotFile.SnapshotHost). The owning socket is looked up again when it next sees traffic."""
+        self.FirstSeen = saved.FirstSeen
+        self.LastSeenTime = saved.LastSeen.timestamp()
+        self.PacketCount = saved.PacketCount
+        self.IncomingCount = saved.IncomingCount
+        self.OutgoingCount = saved.OutgoingCount
+        self.BandwidthUsage = saved.BandwidthUsage
+        self.DownloadUsage = saved.DownloadUsage
+        self.UploadUsage = saved.UploadUsage
+        self.ProcessName = saved.ProcessName
+        self.Estimated = saved.Estimated
+
+    def GetByteRate(self, window: int) -> float:
+        """Current bytes/sec over Model.RateMeter.RATE_WINDOWS[window]"""
+        return self.Rates.GetByteRate(window)
+
+    def GetPacketRate(self, window: int) -> float:
+        """Current packets/sec over Model.RateMeter.RATE_WINDOWS[window]"""
+        return self.Rates.GetPacketRate(window)
+
+    @property
+    def LastSeen(self) -> datetime:
+        return datetime.fromtimestamp(self.LastSeenTime)
+
+    # Sort keys that order connections by their current rates, see Model.RateMeter.SortKey
+    ByteRateKey1s = property(lambda self: self.Rates.GetByteRateKey(0))
+    ByteRateKey10s = property(lambda self: self.Rates.GetByteRateKey(1))
+    ByteRateKey60s = property(lambda self: self.Rates.GetByteRateKey(2))
+    PacketRateKey10s = property(lambda self: self.Rates.GetPacketRateKey(1))
 
     def __str__(self):
         return f'RemoteHost: {self.RemoteHostname}:{self.RemotePort} - ' \
                f'PacketCount: {self.PacketCount} Incoming: {self.IncomingCount} Outgoing: {self.OutgoingCount}'
 
     def GetProcName(self):
-        pid = self.SocketData[0]
-        if pid and psutil.pid_exists(pid):
-            return psutil.Process(pid).name()
-        else:
-            return None
+        return self.ProcessName
+
+    def SetProcess(self, process_info):
+        """Credit this connection to a process, process_info is a Model.ProcessCache.ProcessInfo"""
+        self.ProcessKey = process_info.GetKey()
+        self.ProcessName = process_info.Name
 
     def SetRemoteHostname(self, NewRemoteHostname):
         self.RemoteHostname = NewRemoteHostname
@@ -82,8 +146,12 @@ class HostData:
             return self.SocketData[0]
         return 0
 
-    def SetLastSeen(self, param):
-        self.LastSeen = param
+    def SetFirstSeen(self, timestamp: float):
+        self.FirstSeen = datetime.fromtimestamp(timestamp)
+
+    def SetLastSeen(self, timestamp: float):
+        """:param timestamp: Unix time, ie. from time.time()"""
+        self.LastSeenTime = timestamp
 
     def SetSocketData(self, socket_data):
         self.SocketData = socket_data
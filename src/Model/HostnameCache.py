@@ -0,0 +1,127 @@
+"""
+MIT License
+
+Copyright (c) 2022 0xKate
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import asyncio
+import concurrent.futures
+import socket
+import time
+from collections import OrderedDict
+from typing import Dict, Tuple, Union
+
+from Model.Metrics import Histogram
+
+
+class HostnameCache:
+    """Reverse DNS resolver with a bounded LRU cache of both answers and failures.
+    Every IP has at most one lookup in flight, anyone else asking for the same IP awaits the same future."""
+    __slots__ = ['Cache', 'InFlight', 'Loop', 'Executor', 'MaxSize', 'PositiveTTL', 'NegativeTTL',
+                 'Hits', 'Misses', 'Joined', 'Failures', 'Evictions', 'Latency']
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_size=10000, positive_ttl=3600.0, negative_ttl=300.0,
+                 max_workers=8):
+        """
+        :param loop: The event loop lookups are made from
+        :param max_size: Number of IPs to remember, the least recently used are evicted first
+        :param positive_ttl: Seconds a resolved hostname is reused for
+        :param negative_ttl: Seconds a failed lookup is remembered for
+        :param max_workers: Maximum number of blocking gethostbyaddr calls running at once
+        """
+        self.Cache = OrderedDict()  # type: Dict[str, Tuple[float, Union[Tuple[str, list, list], None]]]
+        self.InFlight = {}  # type: Dict[str, asyncio.Future]
+        self.Loop = loop
+        self.Executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers,
+                                                              thread_name_prefix='HostnameCache')
+        self.MaxSize = max_size
+        self.PositiveTTL = positive_ttl
+        self.NegativeTTL = negative_ttl
+        self.Hits = 0
+        self.Misses = 0
+        self.Joined = 0
+        self.Failures = 0
+        self.Evictions = 0
+        self.Latency = Histogram('nettools_dns_lookup_seconds',
+                                 'Duration of reverse DNS lookups that missed the cache')
+
+    @staticmethod
+    def _TryGetHostFromAddr(ip):
+        try:
+            return socket.gethostbyaddr(ip)
+        except (socket.herror, socket.gaierror, OSError):
+            return None
+
+    def _Store(self, ip, result):
+        ttl = self.PositiveTTL if result is not None else self.NegativeTTL
+        self.Cache[ip] = (time.monotonic() + ttl, result)
+        self.Cache.move_to_end(ip)
+        while len(self.Cache) > self.MaxSize:
+            self.Cache.popitem(last=False)
+            self.Evictions += 1
+
+    async def _ResolveAsync(self, ip):
+        try:
+            start = time.perf_counter()
+            result = await self.Loop.run_in_executor(self.Executor, self._TryGetHostFromAddr, ip)
+            self.Latency.Observe(time.perf_counter() - start)
+            if result is None:
+                self.Failures += 1
+            self._Store(ip, result)
+            return result
+        finally:
+            del self.InFlight[ip]
+
+    async def GetHostFromAddrAsync(self, ip, default=None):
+        """
+        GetHostFromAddrAsync(ip) -> (hostname, aliaslist, ipaddrlist)\n
+        :param ip: The hosts ip address ie. 192.168.1.1
+        :param default: Returned if the address has no hostname or the lookup failed.
+        :return: The result of socket.gethostbyaddr(ip), from the cache if it has not expired.
+        """
+        entry = self.Cache.get(ip)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self.Hits += 1
+                self.Cache.move_to_end(ip)
+                return entry[1] if entry[1] is not None else default
+            del self.Cache[ip]
+        future = self.InFlight.get(ip)
+        if future is None:
+            self.Misses += 1
+            future = self.InFlight[ip] = asyncio.ensure_future(self._ResolveAsync(ip))
+        else:
+            self.Joined += 1
+        result = await asyncio.shield(future)
+        return result if result is not None else default
+
+    def GetHitRate(self):
+        """Fraction of lookups answered without a new DNS query (cache hits and joined in-flight lookups)."""
+        total = self.Hits + self.Joined + self.Misses
+        return (self.Hits + self.Joined) / total if total else 0.0
+
+    def GetStats(self) -> Dict[str, Union[int, float]]:
+        return {'Size': len(self.Cache), 'InFlight': len(self.InFlight), 'Hits': self.Hits, 'Misses': self.Misses,
+                'Joined': self.Joined, 'Failures': self.Failures, 'Evictions': self.Evictions,
+                'HitRate': self.GetHitRate()}
+
+    def Shutdown(self):
+        self.Executor.shutdown(wait=False)
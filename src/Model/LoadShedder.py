@@ -0,0 +1,129 @@
+"""
+MIT License
+
+Copyright (c) 2022 0xKate
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import asyncio
+import logging
+import struct
+import zlib
+from socket import inet_aton
+from typing import Tuple, Union
+
+# Project Files
+from Model.PacketQueue import PacketQueue
+
+_FLOW_KEY = struct.Struct('!4sHB')  # Remote address, port and PROTO value of a signature, hashed to pick flows
+
+
+def FlowHash(signature: Tuple[str, int, int]) -> int:
+    """A hash of a connection signature that is the same in every process and run, unlike hash() of a str, so the
+    same flows are sampled every time."""
+    return zlib.crc32(_FLOW_KEY.pack(inet_aton(signature[0]), signature[1], signature[2]))
+
+
+class LoadShedder:
+    """
+    Keeps the packet pipeline from falling behind by sampling 1 in N flows when packets arrive faster than they can
+    be accounted. Whole flows are kept or skipped by a hash of their signature (FlowHash), and N only moves in
+    powers of two, so a flow sampled at 2N is also sampled at N: the flows that are shown stay consistent while N
+    changes.\n
+    A packet that is kept counts as N packets. Each flow was sampled with probability 1/N, so scaling its counts
+    by N keeps them unbiased estimates of the real counts (Horvitz-Thompson), and totals over the table stay
+    right too. Connections counted this way are flagged Estimated.\n
+    N doubles while the packet queue is over HighWater full, and halves once it stayed under LowWater for
+    CalmPeriod seconds.
+    """
+    __slots__ = ['Queue', 'Rate', 'MaxRate', 'HighWater', 'LowWater', 'Interval', 'CalmPeriod', 'Calm', 'Enabled',
+                 'Task', 'Changes']
+
+    def __init__(self, packet_queue: PacketQueue, max_rate=1024, high_water=0.5, low_water=0.05, interval=0.25,
+                 calm_period=2.0):
+        """
+        :param packet_queue: The queue whose backlog is watched
+        :param max_rate: Largest N, sampling never gets sparser than 1 in this many flows
+        :param high_water: Double N while the queue is fuller than this fraction of its size
+        :param low_water: Halve N once the queue stayed emptier than this fraction of its size for calm_period
+        :param interval: Seconds between backlog checks
+        :param calm_period: Seconds the backlog has to stay low before sampling is relaxed
+        """
+        self.Queue = packet_queue
+        self.Rate = 1
+        self.MaxRate = max_rate
+        self.HighWater = high_water
+        self.LowWater = low_water
+        self.Interval = interval
+        self.CalmPeriod = calm_period
+        self.Calm = 0.0
+        self.Enabled = True
+        self.Task = None  # type: Union[asyncio.Task, None]
+        self.Changes = 0
+
+    def Admit(self, signature: Tuple[str, int, int]) -> int:
+        """
+        The weight to count a packet of this flow with: 1 when not sampling, N if the flow is sampled and 0 if the
+        packet should be skipped. (Runs on capture threads)
+        """
+        rate = self.Rate
+        if rate == 1:
+            return 1
+        return 0 if FlowHash(signature) % rate else rate
+
+    def Update(self):
+        """Move N according to the current backlog."""
+        if not self.Enabled:
+            self._SetRate(1)
+            return
+        fill = self.Queue.GetDepth() / self.Queue.MaxSize
+        if fill > self.HighWater:
+            self.Calm = 0.0
+            self._SetRate(min(self.Rate * 2, self.MaxRate))
+        elif fill < self.LowWater:
+            self.Calm += self.Interval
+            if self.Calm >= self.CalmPeriod and self.Rate > 1:
+                self.Calm = 0.0
+                self._SetRate(self.Rate // 2)
+        else:
+            self.Calm = 0.0
+
+    def _SetRate(self, rate: int):
+        if rate != self.Rate:
+            logging.info(f'LoadShedder - Sampling 1 in {rate} flows, {self.Queue.GetDepth()} packets queued')
+            self.Rate = rate
+            self.Changes += 1
+
+    def GetRate(self) -> int:
+        return self.Rate
+
+    async def _ControlLoopAsync(self):
+        while True:
+            await asyncio.sleep(self.Interval)
+            self.Update()
+
+    def Start(self):
+        if self.Task is None:
+            self.Task = asyncio.get_running_loop().create_task(self._ControlLoopAsync())
+
+    def Stop(self):
+        if self.Task is not None:
+            self.Task.cancel()
+            self.Task = None
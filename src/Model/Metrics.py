@@ -0,0 +1,166 @@
+"""
+MIT License
+
+Copyright (c) 2022 0xKate
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import asyncio
+import logging
+import math
+from bisect import bisect_left
+from typing import Callable, Dict, List, Tuple, Union
+
+# Upper bounds in seconds, from sub millisecond lookups to multi second scans
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Distribution of durations in seconds, in cumulative buckets the way Prometheus expects them.
+    Observe() only from the event loop thread."""
+    __slots__ = ['Name', 'Help', 'Buckets', 'Counts', 'Sum', 'Count', 'Last']
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.Name = name
+        self.Help = help_text
+        self.Buckets = tuple(buckets)
+        self.Counts = [0] * (len(self.Buckets) + 1)  # The last one is +Inf
+        self.Sum = 0.0
+        self.Count = 0
+        self.Last = 0.0
+
+    def Observe(self, value: float):
+        self.Counts[bisect_left(self.Buckets, value)] += 1
+        self.Sum += value
+        self.Count += 1
+        self.Last = value
+
+    def GetMean(self) -> float:
+        return self.Sum / self.Count if self.Count else 0.0
+
+    def Render(self) -> List[str]:
+        lines = [f'# HELP {self.Name} {self.Help}', f'# TYPE {self.Name} histogram']
+        cumulative = 0
+        for bound, count in zip(self.Buckets, self.Counts):
+            cumulative += count
+            lines.append(f'{self.Name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{self.Name}_bucket{{le="+Inf"}} {self.Count}')
+        lines.append(f'{self.Name}_sum {self.Sum}')
+        lines.append(f'{self.Name}_count {self.Count}')
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Named internal metrics of the engine. Counters and gauges are callbacks that read numbers already kept
+    elsewhere (ie. CaptureInterface.Queued) when the registry is collected, so the packet path pays nothing for
+    them. Durations are Histograms, observed where they are measured.
+    """
+    __slots__ = ['Values', 'Histograms']
+
+    def __init__(self):
+        self.Values = {}  # type: Dict[str, Tuple[str, str, Callable[[], Union[int, float]]]]
+        self.Histograms = {}  # type: Dict[str, Histogram]
+
+    def Counter(self, name: str, help_text: str, func: Callable[[], Union[int, float]]):
+        """Register an ever increasing count, read from func."""
+        self.Values[name] = ('counter', help_text, func)
+
+    def Gauge(self, name: str, help_text: str, func: Callable[[], Union[int, float]]):
+        """Register a value that goes up and down, read from func."""
+        self.Values[name] = ('gauge', help_text, func)
+
+    def Histogram(self, name: str, help_text: str = '', buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        """The histogram called name, created if it doesn't exist yet."""
+        histogram = self.Histograms.get(name)
+        if histogram is None:
+            histogram = self.Histograms[name] = Histogram(name, help_text, buckets)
+        return histogram
+
+    def AddHistogram(self, histogram: Histogram):
+        """Register a histogram owned by another object (ie. HostnameCache.Latency)."""
+        self.Histograms[histogram.Name] = histogram
+
+    def Collect(self) -> Dict[str, float]:
+        """Current value of every counter and gauge, and the count, sum and last value of every histogram."""
+        values = {}
+        for name, (_kind, _help_text, func) in self.Values.items():
+            try:
+                values[name] = func()
+            except Exception as e:
+                logging.error(f'MetricsRegistry - Cannot read {name}: {e}')
+                values[name] = math.nan
+        for name, histogram in self.Histograms.items():
+            values[f'{name}_count'] = histogram.Count
+            values[f'{name}_sum'] = histogram.Sum
+            values[f'{name}_last'] = histogram.Last
+        return values
+
+    def Render(self) -> str:
+        """Every metric in the Prometheus text exposition format."""
+        lines = []
+        values = self.Collect()
+        for name, (kind, help_text, _func) in self.Values.items():
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}', f'{name} {values[name]}']
+        for histogram in self.Histograms.values():
+            lines += histogram.Render()
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsServer:
+    """Serves a MetricsRegistry at http://127.0.0.1:<port>/metrics from the event loop, for Prometheus to scrape.
+    Only listens on localhost, the numbers describe this machine's traffic."""
+
+    def __init__(self, registry: MetricsRegistry, port: int, host='127.0.0.1'):
+        self.Registry = registry
+        self.Host = host
+        self.Port = port
+        self.Server = None  # type: Union[asyncio.AbstractServer, None]
+
+    async def _HandleAsync(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await asyncio.wait_for(reader.readline(), 5)
+            # Skip the headers, nothing in them matters here
+            while (await asyncio.wait_for(reader.readline(), 5)).strip():
+                pass
+            parts = request.decode('latin-1').split()
+            if len(parts) >= 2 and parts[0] in ('GET', 'HEAD') and parts[1].split('?')[0] in ('/', '/metrics'):
+                status, body = '200 OK', self.Registry.Render().encode('utf-8')
+            else:
+                status, body = '404 Not Found', b'Not Found\n'
+            writer.write(f'HTTP/1.0 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n'
+                         f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n'.encode('latin-1'))
+            if parts and parts[0] != 'HEAD':
+                writer.write(body)
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def StartAsync(self):
+        """:raises OSError: If the port can't be listened on"""
+        self.Server = await asyncio.start_server(self._HandleAsync, self.Host, self.Port)
+        logging.info(f'MetricsServer - Serving metrics on http://{self.Host}:{self.Port}/metrics')
+
+    def Close(self):
+        if self.Server is not None:
+            self.Server.close()
+            self.Server = None
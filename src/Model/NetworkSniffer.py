@@ -25,31 +25,36 @@ SOFTWARE.
 import asyncio
 import concurrent.futures
 # Included with Python
-import socket
-from datetime import datetime
-from socket import AF_INET6, AF_INET, SOCK_DGRAM, SOCK_STREAM
-from typing import Dict, Tuple, Union
-
-# 3rd Party Libraries
-import psutil
-from scapy.arch import get_if_addr
-from scapy.config import conf
-from scapy.layers.inet import TCP, UDP, IP
-from scapy.sendrecv import AsyncSniffer
+import logging
+import os
+import threading
+import time
+from functools import partial
+from operator import attrgetter, methodcaller
+from typing import Dict, Iterable, List, Set, Tuple, Union
 
 # Project Files
-from Enums import PROTO
+from Enums import DIRECTION, PROTO
+from Model.CaptureFilter import CaptureScope
+from Model.CaptureInterface import CaptureInterface, GetDefaultInterface
+from Model.CaptureWorkers import CaptureWorkerPool, FlowDelta
+from Model.FlowArchive import FlowArchive, FlowRecord
+from Model.SnapshotFile import CODEC_NAMES, GetCompressor, HostRecord, StoreRecord, WriteSnapshot
+from Model.ChangeFeed import ChangeFeed, Changes
+from Model.ConnectionStore import NO_STRING, ConnectionStore, ConnectionView, StringTable
 from Model.HostData import HostData
+from Model.HostnameCache import HostnameCache
+from Model.LoadShedder import LoadShedder
+from Model.Metrics import MetricsRegistry, MetricsServer
+from Model.PacketDecoder import DecodeFrame
+from Model.PacketQueue import PacketQueue
+from Model.PcapReplay import PcapReplay
+from Model.ProcessCache import ProcessCache
+from Model.RateMeter import Now
+from Model.SocketTable import SocketTable
 
-PROTO_MAP = {
-    (AF_INET, SOCK_STREAM): PROTO.TCP.value,
-    (AF_INET, SOCK_DGRAM): PROTO.UDP.value,
-}
-PROTO_MAP6 = {
-    (AF_INET6, SOCK_STREAM): 'TCP6',
-    (AF_INET6, SOCK_DGRAM): 'UDP6',
-}
-
+# Look up the owner of a connection again when it sees traffic after this many seconds of silence
+SOCKET_RECHECK = 3600
 
 class AppData:
     Connections = {}
@@ -71,50 +76,89 @@ class AppData:
 
 class NetworkSniffer:
     """ Main DataModel of the application"""
-    __slots__ = ["Sniffer", "Sniffing", "BackgroundThreads", "ReverseResolver",
-                 "Connections", "SnifferEvent", "LocalIP", "Loop", "LoopPool", "ListAllSockets"]
+    __slots__ = ["Captures", "Sniffing", "BackgroundThreads", "ReverseResolver",
+                 "Connections", "SnifferEvent", "Loop", "LoopPool", "SocketTable", "HostnameCache",
+                 "ProcessCache", "Replay", "ReplayCapture", "FastPath", "PacketQueue", "BatchSize", "Consumer",
+                 "Changes", "Scope", "Workers", "WorkerPool", "IdleTimeout", "MaxFlows", "Archive", "Evicted",
+                 "Ager", "Accounted", "Metrics", "MetricsServer", "Shedder", "RetiredStats"]
 
-    def __init__(self):
-        self.Sniffer = AsyncSniffer(iface=conf.iface, prn=self._PacketCB, store=0,
-                                    filter="tcp or udp and not host 127.0.0.1")
+    def __init__(self, columnar=False, interfaces: Iterable[str] = None, workers=0):
+        """
+        :param columnar: True to keep connections in an array backed ConnectionStore instead of a dict of HostData,
+         which uses a fraction of the memory with hundreds of thousands of connections.
+        :param interfaces: Names of the interfaces to capture on, defaults to the interface of the default route
+        :param workers: Capture and decode in this many worker processes sharded by flow, 0 to capture in-process
+        """
         self.Sniffing = False
+        self.Workers = workers
+        self.WorkerPool = None  # type: Union[CaptureWorkerPool, None]
+        self.Scope = CaptureScope()
+        self.Captures = {}  # type: Dict[str, CaptureInterface]
+        self.SetInterfaces(interfaces or [GetDefaultInterface()])
         self.BackgroundThreads = 0
         self.ReverseResolver = True
-        self.Connections = {}  # type: Dict[Tuple[str, int, int], HostData]
-        self.LocalIP = get_if_addr(conf.iface)
+        self.Connections = ConnectionStore() if columnar else {}  # type: Dict[Tuple[str, int, int], HostData]
+        AppData.SetConnectionsDict(self.Connections)
+        self.Changes = ChangeFeed()
         self.Loop = asyncio.get_running_loop()
         self.LoopPool = concurrent.futures.ThreadPoolExecutor()
-        self.ListAllSockets = psutil.net_connections(kind='inet4')
+        self.SocketTable = SocketTable(self.Loop, self.LoopPool)
+        self.SocketTable.Start()
+        self.HostnameCache = HostnameCache(self.Loop)
+        self.ProcessCache = ProcessCache(self.Loop, self.LoopPool)
+        self.ProcessCache.Start()
+        self.Replay = None  # type: Union[PcapReplay, None]
+        self.ReplayCapture = None  # type: Union[CaptureInterface, None]
+        self.FastPath = True
+        self.PacketQueue = PacketQueue(self.Loop)
+        self.BatchSize = 512
+        self.Consumer = self.Loop.create_task(self._ConsumePacketsAsync())
+        self.Shedder = LoadShedder(self.PacketQueue)
+        self.Shedder.Start()
+        self.IdleTimeout = None  # type: Union[float, None]
+        self.MaxFlows = None  # type: Union[int, None]
+        self.Archive = None  # type: Union[FlowArchive, None]
+        self.Evicted = 0
+        self.Ager = self.Loop.create_task(self._AgeFlowsLoopAsync())
+        self.Accounted = 0
+        # Pipeline counts of captures, replays and worker pools that are gone, so the totals never go down
+        self.RetiredStats = {'Received': 0, 'Parsed': 0, 'Filtered': 0, 'Shed': 0}  # type: Dict[str, int]
+        self.Metrics = MetricsRegistry()
+        self.MetricsServer = None  # type: Union[MetricsServer, None]
+        self._RegisterMetrics()
 
     ## - Helper Functions - ##
-    def _FindTrafficSocketData(self, signature: Tuple[str, int, int], update=False) -> Union[
-        Tuple[int, str, int], None]:
+    def _FindTrafficSocketData(self, signature: Tuple[str, int, int]) -> Union[Tuple[int, str, int], None]:
         """
         _FindTrafficSocketData(signature) -> ()\n
         :param signature: The connection signature of (str(IP), int(port), int(ENUM(PROTO)))
-        :param update: True if you want to skip checking the cache first.
-        :return: A tuple of (PID, CONN_STATUS, FILE_DESCRIPTOR)
-        """
-        if update:
-            self.ListAllSockets = psutil.net_connections(kind='inet4')
-            # psutil.net_io_counters()
-        _dict = {(x.raddr[0], x.raddr[1], PROTO_MAP[(x.family, x.type)]): (x.pid, x.status, x.fd)
-                 for x in self.ListAllSockets if len(x.raddr) == 2}
-        if signature not in _dict:
-            if update is False:
-                return self._FindTrafficSocketData(signature, update=True)
-            else:
-                return None
-        else:
-            return _dict[signature]
+        :return: A tuple of (PID, CONN_STATUS, FILE_DESCRIPTOR) from the last socket scan, or None
+        """
+        return self.SocketTable.Get(signature)
 
-    @staticmethod
-    def __TryGetHostFromAddr(ip, default):
-        try:
-            return socket.gethostbyaddr(ip)
-        except socket.herror as err:
-            # print(f'__GetHostFromAddrAsync - ERROR: [{type(err)}] {err}')
-            return default
+    async def _ResolveSocketDataAsync(self, conn_signature: Tuple[str, int, int]):
+        """Wait for a socket scan to find the owner of a connection and store it on its HostData."""
+        socket_data = await self.SocketTable.LookupAsync(conn_signature)
+        if socket_data and conn_signature in self.Connections:
+            self._SetSocketData(conn_signature, self.Connections[conn_signature], socket_data)
+
+    async def _ResolveProcessAsync(self, conn_signature: Tuple[str, int, int], pid):
+        """Look up the process owning a connection in the background and store it on its HostData."""
+        process_info = await self.ProcessCache.LookupAsync(pid)
+        if process_info and conn_signature in self.Connections:
+            host = self.Connections[conn_signature]
+            if host.GetPID() == pid:
+                host.SetProcess(process_info)
+                self.Changes.Touch(conn_signature)
+
+    def _SetSocketData(self, conn_signature: Tuple[str, int, int], host: HostData, socket_data):
+        """Store the owner of a connection, and look up its process if the PID is new or the process has exited."""
+        host.SetSocketData(socket_data)
+        self.Changes.Touch(conn_signature)
+        pid = host.GetPID()
+        if pid and (host.ProcessKey is None or host.ProcessKey[0] != pid
+                    or not self.ProcessCache.IsAlive(host.ProcessKey)):
+            self.Loop.create_task(self._ResolveProcessAsync(conn_signature, pid))
 
     async def GetHostFromAddrAsync(self, ip, default=None):
         """
@@ -123,74 +167,296 @@ class NetworkSniffer:
         :parameter default: The default return value if no hostname, error, or timeout.
         :return: Return the fqdn (a string of the form 'sub.example.com') for a host.
         """
-        return await self.Loop.run_in_executor(self.LoopPool, self.__TryGetHostFromAddr, ip, default)
-
-    async def _UpdateConnectionDataAsync(self, conn_signature: Tuple[str, int, int],
-                                         remote_host, local_host,
-                                         conn_type, conn_direction, pkt_size):
-        if conn_signature in self.Connections:
-            self.Connections[conn_signature].IncrementCount(conn_direction, pkt_size)
-            time_delta = datetime.now() - self.Connections[conn_signature].LastSeen
-            if time_delta.total_seconds() / 60 > 60:
-                socket_data = self._FindTrafficSocketData(conn_signature)
-                self.Connections[conn_signature].SetSocketData(socket_data)
-            self.Connections[conn_signature].SetLastSeen(datetime.now())
+        return await self.HostnameCache.GetHostFromAddrAsync(ip, default)
+
+    async def _ResolveHostnameAsync(self, conn_signature: Tuple[str, int, int]):
+        """Look up the hostname of a new connection in the background and store it on its HostData."""
+        hostname = await self.GetHostFromAddrAsync(conn_signature[0])
+        if hostname and conn_signature in self.Connections:
+            self.Connections[conn_signature].SetRemoteHostname(hostname[0])
+            self.Changes.Touch(conn_signature)
+
+    def _AddConnection(self, conn_signature: Tuple[str, int, int], remote_host, local_host, conn_type,
+                       interface) -> HostData:
+        """Start tracking a new connection and look up its owner and hostname in the background."""
+        if self.MaxFlows and len(self.Connections) >= self.MaxFlows:
+            # Make room in batches so a flood of new flows doesn't evict (and archive) one flow per packet
+            self.EvictFlows(self._OldestFlows(len(self.Connections) - self.MaxFlows + max(self.MaxFlows // 100, 1)))
+        socket_data = self._FindTrafficSocketData(conn_signature)
+        if isinstance(self.Connections, ConnectionStore):
+            host = self.Connections.Add(conn_signature, *local_host, *remote_host, remote_host[0], conn_type, None,
+                                        interface)
+        else:
+            host = self.Connections[conn_signature] = HostData(*local_host, *remote_host, remote_host[0],
+                                                               conn_type, None, interface)
+        host.SocketCheck = self.SocketTable.Refreshes
+        self._SetSocketData(conn_signature, host, socket_data)
+        if socket_data is None:
+            self.Loop.create_task(self._ResolveSocketDataAsync(conn_signature))
+        if self.ReverseResolver:
+            self.Loop.create_task(self._ResolveHostnameAsync(conn_signature))
+        return host
+
+    def _AccountBatch(self, batch: List[tuple]):
+        """
+        Count a batch of queued packets (see _HandlePacket for the items). The clock is read once for the whole
+        batch, and a packet of a known connection costs one table lookup and a few integer additions. A connection
+        without a known owner is only looked up again once the SocketTable was rescanned since its last lookup.
+        """
+        now = Now()  # Monotonic, for the rates
+        wall = time.time()  # For LastSeen, which is shown and saved
+        recheck = wall - SOCKET_RECHECK
+        refreshes = self.SocketTable.Refreshes
+        touch = self.Changes.Touch
+        connections = self.Connections
+        if isinstance(connections, ConnectionStore):
+            slots = connections.Slots
+            last_seen = connections.Columns['LastSeen']
+            status = connections.Columns['Status']
+            socket_check = connections.Columns['SocketCheck']
+            increment = connections.IncrementCount
+            for conn_signature, local_ip, local_port, direction, pkt_size, interface, weight in batch:
+                touch(conn_signature)
+                slot = slots.get(conn_signature)
+                if slot is None:
+                    slot = self._AddConnection(conn_signature, conn_signature[:2], (local_ip, local_port),
+                                               PROTO(conn_signature[2]).name, interface).Slot
+                elif last_seen[slot] < recheck or (status[slot] == NO_STRING and socket_check[slot] != refreshes):
+                    socket_check[slot] = refreshes
+                    self._SetSocketData(conn_signature, ConnectionView(connections, slot),
+                                        self._FindTrafficSocketData(conn_signature))
+                increment(slot, direction, pkt_size, weight, now, wall)
+        else:
+            for conn_signature, local_ip, local_port, direction, pkt_size, interface, weight in batch:
+                touch(conn_signature)
+                host = connections.get(conn_signature)
+                if host is None:
+                    host = self._AddConnection(conn_signature, conn_signature[:2], (local_ip, local_port),
+                                               PROTO(conn_signature[2]).name, interface)
+                elif host.LastSeenTime < recheck or (host.SocketData is None and host.SocketCheck != refreshes):
+                    host.SocketCheck = refreshes
+                    self._SetSocketData(conn_signature, host, self._FindTrafficSocketData(conn_signature))
+                host.IncrementCount(direction, pkt_size, weight, now, wall)
+
+    def _ApplyFlowDeltas(self, _shard: int, deltas: List[FlowDelta]):
+        """
+        Merge the counters a capture worker accumulated since its last flush into the connection table. The first
+        and last seen times come from the worker's time.time(), the same clock _AccountBatch uses for LastSeen.
+        """
+        refreshes = self.SocketTable.Refreshes
+        for conn_signature, interface, local_ip, local_port, conn_type, in_pkts, out_pkts, in_bytes, out_bytes, \
+                first, last in deltas:
+            host = self.Connections.get(conn_signature)
+            if host is None:
+                host = self._AddConnection(conn_signature, conn_signature[:2], (local_ip, local_port), conn_type,
+                                           interface)
+                host.SetFirstSeen(first)
+            elif host.SocketData is None and host.SocketCheck != refreshes:
+                host.SocketCheck = refreshes
+                self._SetSocketData(conn_signature, host, self._FindTrafficSocketData(conn_signature))
+            host.AddCounts(in_pkts, out_pkts, in_bytes, out_bytes)
+            host.SetLastSeen(last)
+            self.Changes.Touch(conn_signature)
+
+    async def _ConsumePacketsAsync(self):
+        """ Packet Coroutine: Drains the PacketQueue in batches, yielding to the event loop between batches."""
+        while True:
+            await self.PacketQueue.WaitAsync()
+            batch = self.PacketQueue.GetBatch(self.BatchSize)
+            while batch:
+                self._AccountBatch(batch)
+                self.Accounted += len(batch)
+                await asyncio.sleep(0)
+                batch = self.PacketQueue.GetBatch(self.BatchSize)
+
+    def _HandlePacket(self, capture: CaptureInterface, src, sport, dst, dport, proto: PROTO, pkt_size):
+        """
+        Work out the direction of a decoded packet relative to the capture's local addresses and queue it for
+        accounting as (signature, local ip, local port, DIRECTION, size, interface name, weight).
+        (Runs on the capture thread)
+        """
+        if capture.ScopeInPython and not capture.Scope.Matches(src, sport, dst, dport, proto):
+            capture.FilteredInPython += 1
+            return
+        if dst in capture.LocalIPs:
+            direction = DIRECTION.INCOMING
+            conn_signature = (src, sport, proto.value)
+            local_ip, local_port = dst, dport
+        elif src in capture.LocalIPs:
+            direction = DIRECTION.OUTGOING
+            conn_signature = (dst, dport, proto.value)
+            local_ip, local_port = src, sport
+        else:
+            capture.FilteredInPython += 1
+            return
+        weight = self.Shedder.Admit(conn_signature)
+        if not weight:
+            capture.Shed += 1
+            return
+        if self.PacketQueue.Put((conn_signature, local_ip, local_port, direction, pkt_size, capture.Name, weight)):
+            capture.Queued += 1
         else:
-            socket_data = self._FindTrafficSocketData(conn_signature)
-            data = HostData(*local_host, *remote_host, remote_host[0], conn_type, socket_data)
-            self.Connections[conn_signature] = data
-            self.Connections[conn_signature].IncrementCount(conn_direction, pkt_size)
-            if self.ReverseResolver:
-                hostname = await self.GetHostFromAddrAsync(conn_signature[0])
-                if hostname:
-                    self.Connections[conn_signature].SetRemoteHostname(hostname[0])
-
-        AppData.Connections[conn_signature] = self.Connections[conn_signature]
-
-    def _PacketCB(self, pkt: IP):
-        proto = None
-        direction = None
-        remote_socket = None
-        local_socket = None
+            capture.Dropped += 1
+
+    def _DecodeRaw(self, capture: CaptureInterface, frame: bytes, linktype) -> bool:
+        """Fast path: decode the headers straight from the raw frame. Returns False if the frame needs scapy."""
+        decoded = DecodeFrame(frame, linktype)
+        if decoded is None:
+            return False
+        self._HandlePacket(capture, *decoded, len(frame))
+        return True
+
+    def _RawPacketCB(self, capture: CaptureInterface, frame: bytes, linktype):
+        """Callback for raw (undissected) frames, falls back to scapy for frames the fast path can't handle."""
+        if not self._DecodeRaw(capture, frame, linktype):
+            from scapy.config import conf
+            self._DissectedPacketCB(capture, conf.l2types.num2layer.get(linktype, conf.raw_layer)(frame))
+
+    def _DissectedPacketCB(self, capture: CaptureInterface, pkt):
+        """Slow path: pull addresses and ports out of scapy's dissected layers."""
+        # Imported on first use so loading scapy never delays startup
+        from scapy.layers.inet import TCP, UDP, IP
         if IP in pkt:
+            ip = pkt[IP]
             if TCP in pkt:
-                proto = PROTO.TCP
-                if pkt[IP].dst == self.LocalIP:
-                    direction = 'Incoming'
-                    remote_socket = (pkt[IP].src, int(pkt[TCP].sport))
-                    local_socket = (self.LocalIP, int(pkt[TCP].dport))
-                elif pkt[IP].src == self.LocalIP:
-                    direction = 'Outgoing'
-                    remote_socket = (pkt[IP].dst, int(pkt[TCP].dport))
-                    local_socket = (self.LocalIP, int(pkt[TCP].sport))
+                self._HandlePacket(capture, ip.src, int(pkt[TCP].sport), ip.dst, int(pkt[TCP].dport), PROTO.TCP,
+                                   len(pkt))
             elif UDP in pkt:
-                proto = PROTO.UDP
-                if pkt[IP].dst == self.LocalIP:
-                    direction = 'Incoming'
-                    remote_socket = (pkt[IP].src, int(pkt[UDP].sport))
-                    local_socket = (self.LocalIP, int(pkt[UDP].dport))
-                elif pkt[IP].src == self.LocalIP:
-                    direction = 'Outgoing'
-                    remote_socket = (pkt[IP].dst, int(pkt[UDP].dport))
-                    local_socket = (self.LocalIP, int(pkt[UDP].sport))
-            if proto is not None \
-                    and direction is not None \
-                    and remote_socket is not None \
-                    and local_socket is not None:
-                conn_signature = (str(remote_socket[0]), int(remote_socket[1]), int(proto.value))
-                self.Loop.create_task(self._UpdateConnectionDataAsync(conn_signature, remote_socket, local_socket,
-                                                                      proto.name, direction, len(pkt)))
+                self._HandlePacket(capture, ip.src, int(pkt[UDP].sport), ip.dst, int(pkt[UDP].dport), PROTO.UDP,
+                                   len(pkt))
+
+    def _PacketCB(self, capture: CaptureInterface, pkt):
+        if self.FastPath and pkt.original:
+            from scapy.config import conf
+            linktype = conf.l2types.layer2num.get(pkt.__class__)
+            if linktype is not None and self._DecodeRaw(capture, pkt.original, linktype):
+                return
+        self._DissectedPacketCB(capture, pkt)
 
     def SniffStart(self):
-        self.Sniffer.start()
+        if self.Workers > 0:
+            self.WorkerPool = CaptureWorkerPool(self.Loop, self._ApplyFlowDeltas, self.Workers)
+            self.WorkerPool.Start({name: (capture.LocalIPs, capture.Scope.Build())
+                                   for name, capture in self.Captures.items()})
+        else:
+            for capture in self.Captures.values():
+                capture.Start()
         self.Sniffing = True
 
     def SniffStop(self):
-        self.Sniffer.stop()
+        if self.WorkerPool is not None:
+            self.WorkerPool.Stop()
+            for stats in self.WorkerPool.GetStats().values():
+                self.RetiredStats['Received'] += stats['Captured']
+                self.RetiredStats['Parsed'] += stats['Decoded']
+            self.WorkerPool = None
+        for capture in self.Captures.values():
+            capture.Stop()
         self.Sniffing = False
 
+    def Shutdown(self):
+        """Stop capturing and flush everything that is written in the background. (Call once before exiting)"""
+        self.Shedder.Stop()
+        self.ReplayStop()
+        if self.Sniffing:
+            self.SniffStop()
+        if self.Archive is not None:
+            self.Archive.Close()
+            self.Archive = None
+        self.HostnameCache.Shutdown()
+        self.SetMetricsPort(None)
+
+    def SetWorkers(self, workers: int):
+        """Number of capture worker processes used from the next SniffStart(), 0 to capture in this process."""
+        self.Workers = max(int(workers), 0)
+
+    def GetWorkerStats(self) -> Dict[int, Dict[str, int]]:
+        return self.WorkerPool.GetStats() if self.WorkerPool is not None else {}
+
+    def SetInterfaces(self, names: Iterable[str], local_ips: Dict[str, Iterable[str]] = None):
+        """
+        Choose the interfaces to capture on, all of them feed the same connection table.\n
+        :param names: Interface names (ie. ['eth0', 'eth1', 'eth0.100'])
+        :param local_ips: Optional {name: [addresses]} of this hosts addresses on an interface, looked up if missing
+        """
+        local_ips = local_ips or {}
+        for name in list(self.Captures):
+            if name not in names:
+                capture = self.Captures.pop(name)
+                capture.Stop()
+                self._RetireCapture(capture)
+        for name in names:
+            if name not in self.Captures:
+                capture = CaptureInterface(name, self._PacketCB, local_ips.get(name), self.Scope)
+                self.Captures[name] = capture
+                if self.Sniffing and self.WorkerPool is None:
+                    capture.Start()
+
+    def GetInterfaces(self) -> List[str]:
+        return list(self.Captures)
+
+    def GetLocalIPs(self) -> Set[str]:
+        """Every local address across the captured interfaces."""
+        return set().union(*(capture.LocalIPs for capture in self.Captures.values()))
+
+    def ReplayStart(self, pathname, realtime=False, local_ip=None):
+        """
+        Feed the packets of a pcap/pcapng file through the same path as live captured packets.\n
+        :param pathname: Path to the capture file
+        :param realtime: True to pace packets to their original timestamps, False to replay as fast as possible
+        :param local_ip: The address of the host the capture was taken on, defaults to this hosts addresses
+        """
+        if self.GetReplayStatus():
+            return
+        if self.ReplayCapture is not None:
+            self._RetireCapture(self.ReplayCapture)
+            self.RetiredStats['Received'] += self.Replay.PacketCount if self.Replay is not None else 0
+        # Nothing filters a capture file in the kernel, the capture applies the scope in Python
+        self.ReplayCapture = CaptureInterface(f'pcap:{os.path.basename(pathname)}', self._PacketCB,
+                                              [local_ip] if local_ip else self.GetLocalIPs(), self.Scope, live=False)
+        if self.FastPath:
+            self.Replay = PcapReplay(pathname, partial(self._RawPacketCB, self.ReplayCapture),
+                                     realtime=realtime, raw=True)
+        else:
+            self.Replay = PcapReplay(pathname, partial(self._PacketCB, self.ReplayCapture), realtime=realtime)
+        self.Replay.start()
+
+    def ReplayStop(self):
+        if self.Replay is not None:
+            self.Replay.stop()
+            self.Replay.join()
+
+    def GetReplayStatus(self):
+        return self.Replay is not None and self.Replay.is_alive()
+
+    def SetCaptureScope(self, scope: CaptureScope):
+        """Change what is captured on every interface, the kernel filters are swapped by restarting the sniffers
+        that are running. Scopes without LocalIPs are limited to each interface's own addresses."""
+        self.Scope = scope
+        for capture in self.Captures.values():
+            capture.SetScope(scope)
+
+    def GetCaptureFilter(self) -> Dict[str, str]:
+        return {name: capture.Scope.Build() for name, capture in self.Captures.items()}
+
+    def GetInterfaceStats(self) -> Dict[str, Dict[str, int]]:
+        """Packet, drop and filter counters per interface, see CaptureInterface.GetStats()"""
+        stats = {name: capture.GetStats() for name, capture in self.Captures.items()}
+        if self.ReplayCapture is not None:
+            stats[self.ReplayCapture.Name] = self.ReplayCapture.GetStats()
+        return stats
+
+    def GetFilterStats(self) -> Dict[str, int]:
+        """How much traffic was filtered where, summed over every interface. FilteredInKernel is an estimate."""
+        totals = {}  # type: Dict[str, int]
+        for stats in self.GetInterfaceStats().values():
+            for key, value in stats.items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
     def SetConnectionsDict(self, new_dict):
         self.Connections = new_dict
+        AppData.SetConnectionsDict(new_dict)
 
     def GetConnectionsDict(self):
         return self.Connections
@@ -198,8 +464,297 @@ class NetworkSniffer:
     def GetAllConnections(self):
         return self.Connections.values()
 
+    def GetSortedConnections(self, attr: str, descending=True) -> List[HostData]:
+        """
+        All connections sorted by one HostData attribute or getter (ie. 'PacketCount' or 'GetPID').\n
+        A ConnectionStore sorts straight off its column arrays, a dict sorts by attribute access per HostData.
+        """
+        if isinstance(self.Connections, ConnectionStore):
+            column = {'GetPID': 'PID', 'LastSeenTime': 'LastSeen'}.get(attr, attr)
+            if column in self.Connections.Columns:
+                return self.Connections.Sorted(column, descending)
+        if attr.startswith('Get'):
+            key = methodcaller(attr)
+        else:
+            key = attrgetter(attr)
+        return sorted(self.Connections.values(), key=key, reverse=descending)
+
+    def ChangesSince(self, generation: int) -> Changes:
+        """
+        ChangesSince(generation) -> Changes\n
+        :param generation: The Generation of the Changes a consumer last saw, or 0 for everything
+        :return: The signatures of connections created, updated and removed since then, and the new generation
+        """
+        return self.Changes.ChangesSince(generation)
+
+    def GetGeneration(self):
+        return self.Changes.Generation
+
+    def RemoveConnection(self, conn_signature: Tuple[str, int, int]):
+        """Forget a connection, consumers of ChangesSince() see it as removed."""
+        host = self.Connections.pop(conn_signature, None)
+        if host is not None:
+            self.Changes.Remove(conn_signature)
+        return host
+
+    ## - Snapshots - ##
+    def SnapshotRecord(self, conn_signature: Tuple[str, int, int], strings: StringTable) -> Union[tuple, None]:
+        """A connection as a Model.SnapshotFile.RECORD tuple with its strings interned in strings, None if it is
+        not in the table."""
+        if isinstance(self.Connections, ConnectionStore):
+            slot = self.Connections.Slots.get(conn_signature)
+            return StoreRecord(self.Connections, slot, strings) if slot is not None else None
+        host = self.Connections.get(conn_signature)
+        return HostRecord(host, strings) if host is not None else None
+
+    async def SaveSnapshotAsync(self, pathname: str, codec: str = 'zlib', slice_size=5000) -> int:
+        """
+        Save every connection to an NTD snapshot (see Model.SnapshotFile) without holding up capture.\n
+        Connections are copied on the event loop slice_size at a time, letting queued packets in between. The ones
+        that changed while copying are then copied again in one go, so the file holds the table exactly as it was
+        at that moment. Compressing and writing happen on the thread pool.\n
+        :param codec: One of Model.SnapshotFile.GetAvailableCodecs()
+        :return: Number of connections written
+        :raises ValueError: If the codec is not available
+        :raises OSError: If the file can't be written
+        """
+        codec_id = CODEC_NAMES[codec]
+        GetCompressor(codec_id)  # Fail before copying anything
+        start = self.Changes.ChangesSince(self.Changes.Generation).Generation
+        strings = StringTable()
+        records = {}  # type: Dict[Tuple[str, int, int], tuple]
+        signatures = list(self.Connections.keys())
+        for i in range(0, len(signatures), slice_size):
+            for conn_signature in signatures[i:i + slice_size]:
+                record = self.SnapshotRecord(conn_signature, strings)
+                if record is not None:
+                    records[conn_signature] = record
+            await asyncio.sleep(0)
+        changes = self.Changes.ChangesSince(start)
+        # Removals first, a connection removed and created again while copying is in both and alive
+        for conn_signature in changes.Removed:
+            records.pop(conn_signature, None)
+        for conn_signature in changes.New + changes.Updated:
+            record = self.SnapshotRecord(conn_signature, strings)
+            if record is not None:
+                records[conn_signature] = record
+        if not changes.Complete:
+            records = {conn_signature: record for conn_signature, record in records.items()
+                       if conn_signature in self.Connections}
+        written = await self.Loop.run_in_executor(self.LoopPool, WriteSnapshot, pathname, list(records.values()),
+                                                  strings.Strings, codec_id)
+        logging.info(f'NetworkSniffer - Saved {written} connections to {pathname}')
+        return written
+
+    def RestoreConnections(self, saved: Iterable):
+        """
+        Put back the connections of an earlier session (ie. Model.SnapshotFile.SnapshotHost from an autosave).
+        Connections already in the table are left alone. Restored connections count as new for ChangesSince().\n
+        :return: Number of connections restored
+        """
+        restored = 0
+        for host in saved:
+            conn_signature = (host.RemoteIP, host.RemotePort, PROTO[host.ProtoType].value)
+            if conn_signature in self.Connections:
+                continue
+            if isinstance(self.Connections, ConnectionStore):
+                new_host = self.Connections.Add(conn_signature, host.LocalIP, host.LocalPort, host.RemoteIP,
+                                                host.RemotePort, host.RemoteHostname, host.ProtoType, None,
+                                                host.Interface)
+            else:
+                new_host = self.Connections[conn_signature] = HostData(host.LocalIP, host.LocalPort, host.RemoteIP,
+                                                                       host.RemotePort, host.RemoteHostname,
+                                                                       host.ProtoType, None, host.Interface)
+            new_host.Restore(host)
+            self.Changes.Touch(conn_signature)
+            restored += 1
+        return restored
+
+    ## - Flow aging - ##
+    def SetFlowLimits(self, idle_timeout: float = None, max_flows: int = None, archive_path: str = None):
+        """
+        Bound the connection table. Connections are evicted least recently seen first, and appended to the archive
+        if there is one.\n
+        :param idle_timeout: Evict connections not seen for this many seconds, None to keep idle connections
+        :param max_flows: Evict the least recently seen connections beyond this many, None for no limit
+        :param archive_path: Append evicted connections to this file (see Model.FlowArchive), None to drop them
+        """
+        self.IdleTimeout = idle_timeout or None
+        self.MaxFlows = max(int(max_flows), 1) if max_flows else None
+        if self.Archive is not None and self.Archive.FilePath != archive_path:
+            self.Archive.Close()
+            self.Archive = None
+        if archive_path and self.Archive is None:
+            self.Archive = FlowArchive(archive_path)
+        self.AgeFlows()
+
+    def GetFlowLimits(self) -> Tuple[Union[float, None], Union[int, None], Union[str, None]]:
+        return self.IdleTimeout, self.MaxFlows, self.Archive.FilePath if self.Archive is not None else None
+
+    def _OldestFlows(self, count: int) -> List[Tuple[str, int, int]]:
+        """The count least recently seen connections."""
+        oldest = []
+        for conn_signature in self.Changes.Oldest():
+            if len(oldest) >= count:
+                break
+            if conn_signature in self.Connections:
+                oldest.append(conn_signature)
+        return oldest
+
+    def _IdleFlows(self) -> List[Tuple[str, int, int]]:
+        """Connections not seen within IdleTimeout. The change feed keeps connections in the order they were last
+        touched (every packet touches), so this stops at the first connection that is still active instead of
+        checking every one."""
+        cutoff = time.time() - self.IdleTimeout
+        idle = []
+        for conn_signature in self.Changes.Oldest():
+            host = self.Connections.get(conn_signature)
+            if host is None:
+                continue
+            if host.LastSeenTime >= cutoff:
+                break
+            idle.append(conn_signature)
+        return idle
+
+    def EvictFlows(self, signatures: Iterable[Tuple[str, int, int]]):
+        """Remove connections from the table, writing them to the archive in one batch."""
+        records = []
+        for conn_signature in signatures:
+            host = self.RemoveConnection(conn_signature)
+            if host is None:
+                continue
+            if self.Archive is not None:
+                records.append(FlowRecord(host))
+            self.Evicted += 1
+        if self.Archive is not None:
+            self.Archive.Write(records)
+
+    def AgeFlows(self):
+        """Evict idle connections, then the least recently seen ones beyond MaxFlows."""
+        if self.IdleTimeout:
+            self.EvictFlows(self._IdleFlows())
+        if self.MaxFlows and len(self.Connections) > self.MaxFlows:
+            self.EvictFlows(self._OldestFlows(len(self.Connections) - self.MaxFlows))
+        if isinstance(self.Connections, ConnectionStore):
+            self.Connections.CompactStrings()
+
+    async def _AgeFlowsLoopAsync(self, interval=5):
+        while True:
+            await asyncio.sleep(interval)
+            self.AgeFlows()
+
+    def GetEvictedFlows(self) -> int:
+        return self.Evicted
+
+    ## - Metrics - ##
+    def _RegisterMetrics(self):
+        metrics = self.Metrics
+        pipeline = self.GetPipelineStats
+        metrics.Counter('nettools_packets_received_total', 'Packets delivered by the captures, replays and workers',
+                        lambda: pipeline()['Received'])
+        metrics.Counter('nettools_packets_parsed_total', 'Packets decoded into a connection',
+                        lambda: pipeline()['Parsed'])
+        metrics.Counter('nettools_packets_filtered_total', 'Packets outside the capture scope, dropped after decoding',
+                        lambda: pipeline()['Filtered'])
+        metrics.Counter('nettools_packets_shed_total', 'Packets of flows skipped by load shedding',
+                        lambda: pipeline()['Shed'])
+        metrics.Gauge('nettools_sampling_rate', 'Load shedding keeps 1 in this many flows', self.Shedder.GetRate)
+        metrics.Counter('nettools_packets_dropped_total', 'Packets dropped because the packet queue was full',
+                        self.PacketQueue.GetDropped)
+        metrics.Counter('nettools_packets_accounted_total', 'Packets added to the connection table',
+                        lambda: self.Accounted)
+        metrics.Gauge('nettools_queue_depth', 'Packets waiting to be accounted', self.PacketQueue.GetDepth)
+        metrics.Gauge('nettools_queue_high_water', 'Deepest the packet queue has been', self.PacketQueue.GetHighWater)
+        metrics.Gauge('nettools_pending_tasks', 'Tasks scheduled on the event loop',
+                      lambda: len(asyncio.all_tasks(self.Loop)))
+        metrics.Gauge('nettools_background_threads', 'Threads besides the main thread', self.GetNumBGThreads)
+        metrics.Gauge('nettools_connections', 'Connections in the table', lambda: len(self.Connections))
+        metrics.Counter('nettools_flows_evicted_total', 'Connections evicted by flow aging', self.GetEvictedFlows)
+        metrics.Gauge('nettools_dns_cache_hit_ratio', 'Share of hostname lookups answered without a DNS query',
+                      self.HostnameCache.GetHitRate)
+        metrics.Gauge('nettools_dns_cache_entries', 'Addresses in the hostname cache',
+                      lambda: len(self.HostnameCache.Cache))
+        metrics.Gauge('nettools_dns_lookups_in_flight', 'Reverse DNS lookups running',
+                      lambda: len(self.HostnameCache.InFlight))
+        metrics.AddHistogram(self.HostnameCache.Latency)
+        metrics.AddHistogram(self.SocketTable.ScanTime)
+
+    def _RetireCapture(self, capture: CaptureInterface):
+        """Keep the counts of a capture that is about to be dropped in the pipeline totals."""
+        self.RetiredStats['Received'] += capture.Captured
+        self.RetiredStats['Parsed'] += capture.Queued + capture.Dropped + capture.Shed
+        self.RetiredStats['Filtered'] += capture.FilteredInPython
+        self.RetiredStats['Shed'] += capture.Shed
+
+    def GetPipelineStats(self) -> Dict[str, int]:
+        """Packets Received from every source, Parsed into a connection, Filtered out of scope, Shed by sampling,
+        Dropped by a full queue and Accounted in the table, since the sniffer was created. Stopped worker pools and
+        replaced captures and replays still count, so none of these ever go down."""
+        retired = self.RetiredStats
+        received, parsed, filtered, shed = retired['Received'], retired['Parsed'], retired['Filtered'], retired['Shed']
+        captures = list(self.Captures.values())
+        if self.ReplayCapture is not None:
+            captures.append(self.ReplayCapture)
+            received += self.Replay.PacketCount if self.Replay is not None else 0
+        for capture in captures:
+            received += capture.Captured
+            parsed += capture.Queued + capture.Dropped + capture.Shed
+            filtered += capture.FilteredInPython
+            shed += capture.Shed
+        for stats in self.GetWorkerStats().values():
+            received += stats['Captured']
+            parsed += stats['Decoded']
+        return {'Received': received, 'Parsed': parsed, 'Filtered': filtered, 'Shed': shed,
+                'Dropped': self.PacketQueue.GetDropped(), 'Accounted': self.Accounted}
+
+    def SetLoadShedding(self, enabled: bool):
+        """Allow switching to flow sampling when packets arrive faster than they are accounted (the default), see
+        Model.LoadShedder. Without it packets beyond the queue size are dropped instead."""
+        self.Shedder.Enabled = enabled
+        self.Shedder.Update()
+
+    def GetLoadShedding(self) -> bool:
+        return self.Shedder.Enabled
+
+    def GetSamplingRate(self) -> int:
+        """N while 1 in N flows are being sampled, 1 when every packet is counted."""
+        return self.Shedder.GetRate()
+
+    def SetMetricsPort(self, port: Union[int, None]):
+        """Serve the metrics in Prometheus format on http://127.0.0.1:port/metrics, None or 0 to stop serving."""
+        if self.MetricsServer is not None:
+            if self.MetricsServer.Port == port:
+                return
+            self.MetricsServer.Close()
+            self.MetricsServer = None
+        if port:
+            self.MetricsServer = MetricsServer(self.Metrics, port)
+            self.Loop.create_task(self._StartMetricsServerAsync(self.MetricsServer))
+
+    async def _StartMetricsServerAsync(self, server: MetricsServer):
+        try:
+            await server.StartAsync()
+        except OSError as e:
+            logging.error(f'NetworkSniffer - Cannot serve metrics on port {server.Port}: {e}')
+            if self.MetricsServer is server:
+                self.MetricsServer = None
+
+    def GetMetricsPort(self) -> Union[int, None]:
+        return self.MetricsServer.Port if self.MetricsServer is not None else None
+
     def GetNumBGThreads(self):
+        """Threads running besides the main thread: captures, replays, thread pools and file writers."""
+        self.BackgroundThreads = threading.active_count() - 1
         return self.BackgroundThreads
 
+    def GetQueueDepth(self):
+        return self.PacketQueue.GetDepth()
+
+    def GetDroppedPackets(self):
+        return self.PacketQueue.GetDropped()
+
+    def GetResolverStats(self):
+        return self.HostnameCache.GetStats()
+
     def GetSnifferStatus(self):
         return self.Sniffing
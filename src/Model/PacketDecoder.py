@@ -0,0 +1,103 @@
+"""
+MIT License
+
+Copyright (c) 2022 0xKate
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# Included with Python
+import struct
+from socket import inet_ntoa
+from typing import Tuple, Union
+
+# Project Files
+from Enums import PROTO
+
+# Link layer header types (https://www.tcpdump.org/linktypes.html)
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LOOP = 108
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_IPV4 = 228
+
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_VLAN = (0x8100, 0x88a8)
+
+IPPROTO_TCP = 6
+IPPROTO_UDP = 17
+
+_ETHERTYPE = struct.Struct('!H')
+_IPV4_HEADER = struct.Struct('!B5xHxB')  # version/ihl, flags/fragment offset, protocol
+_PORTS = struct.Struct('!HH')
+
+
+def _GetIPv4Offset(frame: memoryview, linktype: int) -> Union[int, None]:
+    """Return the offset of the IPv4 header inside a link layer frame, or None if the frame does not carry IPv4."""
+    if linktype == LINKTYPE_ETHERNET:
+        offset = 12
+        ether_type = _ETHERTYPE.unpack_from(frame, offset)[0]
+        while ether_type in ETHERTYPE_VLAN:
+            offset += 4
+            ether_type = _ETHERTYPE.unpack_from(frame, offset)[0]
+        return offset + 2 if ether_type == ETHERTYPE_IPV4 else None
+    elif linktype == LINKTYPE_LINUX_SLL:
+        return 16 if _ETHERTYPE.unpack_from(frame, 14)[0] == ETHERTYPE_IPV4 else None
+    elif linktype in (LINKTYPE_NULL, LINKTYPE_LOOP):
+        # The 4 byte address family is in host byte order for NULL and network byte order for LOOP
+        return 4 if frame[0] == 2 or frame[3] == 2 else None
+    elif linktype in (LINKTYPE_RAW, LINKTYPE_IPV4):
+        return 0 if frame[0] >> 4 == 4 else None
+    return None
+
+
+def DecodeFrame(frame: bytes, linktype: int) -> Union[Tuple[str, int, str, int, PROTO], None]:
+    """
+    DecodeFrame(frame, linktype) -> (src, sport, dst, dport, PROTO)\n
+    Decode the IPv4 and TCP/UDP headers of a raw link layer frame with fixed offset unpacking, without building any
+    scapy layers.\n
+    :param frame: The raw bytes of the frame as it was captured
+    :param linktype: The pcap link layer header type of the frame (ie. 1 for ethernet)
+    :return: A tuple of (str(src IP), int(src port), str(dst IP), int(dst port), PROTO) or None if the frame is not
+     a complete, unfragmented IPv4 TCP/UDP packet. The caller should fall back to scapy for those.
+    """
+    view = memoryview(frame)
+    try:
+        offset = _GetIPv4Offset(view, linktype)
+        if offset is None:
+            return None
+        version_ihl, fragment, ip_proto = _IPV4_HEADER.unpack_from(view, offset)
+        header_length = (version_ihl & 0x0F) * 4
+        if version_ihl >> 4 != 4 or fragment & 0x1FFF:
+            return None
+        if header_length < 20 or offset + header_length > len(view):
+            # Malformed IHL, the ports would be read from inside the IP header or past the frame
+            return None
+        if ip_proto == IPPROTO_TCP:
+            proto = PROTO.TCP
+        elif ip_proto == IPPROTO_UDP:
+            proto = PROTO.UDP
+        else:
+            return None
+        sport, dport = _PORTS.unpack_from(view, offset + header_length)
+        return inet_ntoa(view[offset + 12:offset + 16]), sport, inet_ntoa(view[offset + 16:offset + 20]), dport, proto
+    except (struct.error, IndexError, OSError):
+        # Truncated frame
+        return None
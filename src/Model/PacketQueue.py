@@ -0,0 +1,93 @@
+"""
+MIT License
+
+Copyright (c) 2022 0xKate
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import asyncio
+import threading
+from collections import deque
+from typing import List
+
+
+class PacketQueue:
+    """Bounded hand-off from capture threads to the asyncio event loop.
+    Producers call Put() from any thread, a single consumer coroutine drains it in batches with GetBatch().
+    The loop is only woken once per batch, not once per packet."""
+    __slots__ = ['Buffer', 'MaxSize', 'Lock', 'Loop', 'Ready', 'WakePending', 'Enqueued', 'Dropped', 'HighWater']
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, maxsize=65536):
+        """
+        :param loop: The event loop the consumer coroutine runs on
+        :param maxsize: Packets beyond this many waiting to be processed are dropped and counted
+        """
+        self.Buffer = deque()
+        self.MaxSize = maxsize
+        self.Lock = threading.Lock()
+        self.Loop = loop
+        self.Ready = asyncio.Event()
+        self.WakePending = False
+        self.Enqueued = 0
+        self.Dropped = 0
+        self.HighWater = 0
+
+    def Put(self, item) -> bool:
+        """Add an item from any thread. Returns False if the queue was full and the item was dropped."""
+        with self.Lock:
+            depth = len(self.Buffer)
+            if depth >= self.MaxSize:
+                self.Dropped += 1
+                return False
+            self.Buffer.append(item)
+            self.Enqueued += 1
+            if depth >= self.HighWater:
+                self.HighWater = depth + 1
+            if self.WakePending:
+                return True
+            self.WakePending = True
+        self.Loop.call_soon_threadsafe(self.Ready.set)
+        return True
+
+    def GetBatch(self, max_items: int) -> List:
+        """Take up to max_items from the front of the queue. (Event loop thread only)"""
+        with self.Lock:
+            buffer = self.Buffer
+            count = min(max_items, len(buffer))
+            if count == 0:
+                # Drained, the next Put() has to wake the consumer again
+                self.WakePending = False
+                return []
+            popleft = buffer.popleft
+            return [popleft() for _ in range(count)]
+
+    async def WaitAsync(self):
+        """Wait until a producer has put something in the queue."""
+        await self.Ready.wait()
+        self.Ready.clear()
+
+    def GetDepth(self):
+        return len(self.Buffer)
+
+    def GetDropped(self):
+        return self.Dropped
+
+    def GetHighWater(self):
+        return self.HighWater
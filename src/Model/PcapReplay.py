@@ -0,0 +1,118 @@
+"""
+MIT License
+
+Copyright (c) 2022 0xKate
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import logging
+import threading
+import time
+from typing import Callable
+
+
+class PcapReplay(threading.Thread):
+    """Stream packets from a pcap/pcapng file to a callback in a background thread, the same way AsyncSniffer does
+    for a live interface. Packets are read one at a time so the file is never loaded into memory as a whole."""
+    def __init__(self, pathname, callback: Callable, realtime=False, speed=1.0, raw=False):
+        """
+        :param pathname: Path to a .pcap or .pcapng file
+        :param callback: Called with each scapy packet read from the file (ie. NetworkSniffer._PacketCB)
+        :param realtime: True to pace packets to their original capture timestamps, False to replay as fast as possible
+        :param speed: Multiplier applied to the original pacing when realtime is True (2.0 = twice as fast)
+        :param raw: True to skip scapy dissection and call callback(frame_bytes, linktype) instead
+        """
+        threading.Thread.__init__(self)  # Must be invoked first when subclassing a Thread
+        self.setName('PcapReplayThread')
+        self.daemon = True
+        self.FilePath = pathname
+        self.Callback = callback
+        self.Realtime = realtime
+        self.Speed = speed
+        self.Raw = raw
+        self.PacketCount = 0
+        self.StartTime = None
+        self.StopTime = None
+        self.StopEvent = threading.Event()
+
+    def _WaitForTimestamp(self, first_pkt_time, first_wall_time, pkt_time):
+        """Sleep until the packets original offset from the first packet has elapsed. Returns False if stopped."""
+        delay = (float(pkt_time - first_pkt_time) / self.Speed) - (time.perf_counter() - first_wall_time)
+        if delay > 0:
+            return not self.StopEvent.wait(delay)
+        return not self.StopEvent.is_set()
+
+    @staticmethod
+    def _GetRawTimestamp(metadata, nano=False):
+        """
+        Capture time in seconds of a packet read by RawPcapReader (pcap) or RawPcapNgReader (pcapng).\n
+        :param nano: The reader's nano flag, nanosecond pcaps (magic a1b23c4d) keep nanoseconds in usec
+        """
+        if hasattr(metadata, 'tsresol'):
+            return ((metadata.tshigh << 32) + metadata.tslow) / metadata.tsresol
+        return metadata.sec + metadata.usec / (1000000000 if nano else 1000000)
+
+    def _ReadPackets(self):
+        """Yield (callback args, capture timestamp) for each packet in the file, lazily."""
+        # Imported here, on the replay thread, so loading scapy never delays startup
+        from scapy.utils import PcapReader, RawPcapReader
+        if self.Raw:
+            with RawPcapReader(self.FilePath) as reader:
+                linktype = getattr(reader, 'linktype', None)
+                nano = getattr(reader, 'nano', False)
+                for frame, metadata in reader:
+                    yield (frame, getattr(metadata, 'linktype', linktype)), self._GetRawTimestamp(metadata, nano)
+        else:
+            with PcapReader(self.FilePath) as reader:
+                for pkt in reader:
+                    yield (pkt,), pkt.time
+
+    def run(self) -> None:
+        """Start background thread. (Is called by start())"""
+        self.StartTime = time.perf_counter()
+        first_pkt_time = None
+        try:
+            for args, pkt_time in self._ReadPackets():
+                if self.Realtime:
+                    if first_pkt_time is None:
+                        first_pkt_time = pkt_time
+                    if not self._WaitForTimestamp(first_pkt_time, self.StartTime, pkt_time):
+                        break
+                elif self.StopEvent.is_set():
+                    break
+                self.Callback(*args)
+                self.PacketCount += 1
+        except (IOError, EOFError) as err:
+            logging.error(f'PcapReplay - Cannot read {self.FilePath}: {err}')
+        self.StopTime = time.perf_counter()
+        logging.info(f'PcapReplay - Replayed {self.PacketCount} packets from {self.FilePath} '
+                     f'at {self.GetPacketsPerSecond():.0f} packets/sec')
+        return None
+
+    def stop(self):
+        """Ask the replay thread to stop after the current packet."""
+        self.StopEvent.set()
+
+    def GetPacketsPerSecond(self):
+        """The average rate packets have been fed to the callback since the replay started."""
+        if self.StartTime is None:
+            return 0.0
+        elapsed = (self.StopTime or time.perf_counter()) - self.StartTime
+        return self.PacketCount / elapsed if elapsed > 0 else 0.0
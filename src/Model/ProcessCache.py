@@ -0,0 +1,152 @@
+"""
+MIT License
+
+Copyright (c) 2022 0xKate
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import asyncio
+import concurrent.futures
+from typing import Dict, List, Tuple, Union
+
+# 3rd Party Libraries
+import psutil
+
+
+class ProcessInfo:
+    """Metadata of a single process, identified by (PID, CreateTime) so a recycled PID is a different process."""
+    __slots__ = ['PID', 'CreateTime', 'Name', 'Exe', 'Cmdline', 'User']
+
+    def __init__(self, pid, create_time, name, exe, cmdline, user):
+        self.PID = pid
+        self.CreateTime = create_time
+        self.Name = name
+        self.Exe = exe
+        self.Cmdline = cmdline
+        self.User = user
+
+    def GetKey(self) -> Tuple[int, float]:
+        return self.PID, self.CreateTime
+
+    def __str__(self):
+        return f'{self.Name} ({self.PID})'
+
+
+class ProcessCache:
+    """Shared cache of ProcessInfo keyed by (PID, CreateTime). Entries are filled lazily off the event loop,
+    and a periodic sweep drops the entries of processes that have exited."""
+    __slots__ = ['Cache', 'Pids', 'InFlight', 'Loop', 'Executor', 'SweepInterval', 'SweepTask']
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, executor: concurrent.futures.Executor, sweep_interval=5.0):
+        """
+        :param loop: The event loop lookups are made from
+        :param executor: Where the blocking psutil calls are run
+        :param sweep_interval: Seconds between checks for exited processes
+        """
+        self.Cache = {}  # type: Dict[Tuple[int, float], ProcessInfo]
+        self.Pids = {}  # type: Dict[int, Tuple[int, float]]
+        self.InFlight = {}  # type: Dict[int, asyncio.Future]
+        self.Loop = loop
+        self.Executor = executor
+        self.SweepInterval = sweep_interval
+        self.SweepTask = None  # type: Union[asyncio.Task, None]
+
+    @staticmethod
+    def _Fetch(pid) -> Union[ProcessInfo, None]:
+        """Read a process's metadata with psutil. (Runs in the executor)"""
+        try:
+            proc = psutil.Process(pid)
+            with proc.oneshot():
+                create_time = proc.create_time()
+                name = proc.name()
+                try:
+                    exe = proc.exe()
+                    cmdline = ' '.join(proc.cmdline())
+                    user = proc.username()
+                except (psutil.AccessDenied, psutil.ZombieProcess):
+                    exe, cmdline, user = None, None, None
+            return ProcessInfo(pid, create_time, name, exe, cmdline, user)
+        except (psutil.NoSuchProcess, psutil.AccessDenied, ValueError):
+            return None
+
+    @staticmethod
+    def _FindExited(keys: List[Tuple[int, float]]) -> List[Tuple[int, float]]:
+        """Return the keys whose process no longer exists, or whose PID now belongs to another process.
+        (Runs in the executor)"""
+        exited = []
+        for key in keys:
+            try:
+                if psutil.Process(key[0]).create_time() != key[1]:
+                    exited.append(key)
+            except (psutil.NoSuchProcess, ValueError):
+                exited.append(key)
+            except psutil.AccessDenied:
+                pass
+        return exited
+
+    async def _LookupAsync(self, pid) -> Union[ProcessInfo, None]:
+        try:
+            info = await self.Loop.run_in_executor(self.Executor, self._Fetch, pid)
+            if info is not None:
+                self.Cache[info.GetKey()] = info
+                self.Pids[pid] = info.GetKey()
+            return info
+        finally:
+            del self.InFlight[pid]
+
+    async def LookupAsync(self, pid) -> Union[ProcessInfo, None]:
+        """
+        LookupAsync(pid) -> ProcessInfo\n
+        :param pid: The PID currently owning a socket
+        :return: The cached ProcessInfo of the running process with this PID, looked up if not cached, or None.
+        """
+        key = self.Pids.get(pid)
+        if key is not None:
+            return self.Cache[key]
+        future = self.InFlight.get(pid)
+        if future is None:
+            future = self.InFlight[pid] = asyncio.ensure_future(self._LookupAsync(pid))
+        return await asyncio.shield(future)
+
+    def Get(self, key: Tuple[int, float]) -> Union[ProcessInfo, None]:
+        """Cache only lookup by (PID, CreateTime), None if unknown or the process has exited."""
+        return self.Cache.get(key)
+
+    def IsAlive(self, key: Tuple[int, float]) -> bool:
+        """False once the sweep has seen the process exit."""
+        return key in self.Cache
+
+    def Invalidate(self, key: Tuple[int, float]):
+        self.Cache.pop(key, None)
+        if self.Pids.get(key[0]) == key:
+            del self.Pids[key[0]]
+
+    async def SweepLoopAsync(self):
+        """ ProcessCache Coroutine: Drops cached processes that have exited."""
+        while True:
+            await asyncio.sleep(self.SweepInterval)
+            if self.Cache:
+                exited = await self.Loop.run_in_executor(self.Executor, self._FindExited, list(self.Cache))
+                for key in exited:
+                    self.Invalidate(key)
+
+    def Start(self):
+        if self.SweepTask is None:
+            self.SweepTask = self.Loop.create_task(self.SweepLoopAsync())
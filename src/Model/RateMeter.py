@@ -0,0 +1,102 @@
+"""
+MIT License
+
+Copyright (c) 2022 0xKate
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import math
+import time
+from typing import List
+
+# Averaging windows in seconds, rates are exponentially weighted with these time constants
+RATE_WINDOWS = (1.0, 10.0, 60.0)
+RATE_NAMES = ('1s', '10s', '60s')
+
+# Rates are kept relative to this process' start so sort keys stay small enough to keep float precision
+_EPOCH = time.monotonic()
+
+
+def Now() -> float:
+    """The clock rates are measured on, seconds since this module was loaded."""
+    return time.monotonic() - _EPOCH
+
+
+def Decay(value: float, since: float, now: float, window: float) -> float:
+    """A rate last updated at since, as it stands at now with no traffic in between."""
+    if now <= since:
+        return value
+    return value * math.exp((since - now) / window)
+
+
+def SortKey(value: float, since: float, window: float) -> float:
+    """
+    A key that orders rates the same way their current values would, without depending on the current time.\n
+    Every rate decays by the same factor over the same time, so log(value) + since / window only changes when the
+    connection sees traffic, which lets SortIndex keep rates sorted incrementally.
+    """
+    if value <= 0.0:
+        return -math.inf
+    return math.log(value) + since / window
+
+
+class RateMeter:
+    """Bytes/sec and packets/sec of one connection over each of RATE_WINDOWS, as exponentially weighted moving
+    averages. Uses the same few floats however much traffic the connection sees."""
+    __slots__ = ['Time', 'Bytes', 'Packets']
+
+    def __init__(self):
+        self.Time = Now()
+        self.Bytes = [0.0] * len(RATE_WINDOWS)  # type: List[float]
+        self.Packets = [0.0] * len(RATE_WINDOWS)  # type: List[float]
+
+    def Add(self, packets: int, size: int, now: float = None):
+        if now is None:
+            now = Now()
+        elapsed = now - self.Time
+        for i, window in enumerate(RATE_WINDOWS):
+            decay = math.exp(-elapsed / window) if elapsed > 0.0 else 1.0
+            self.Bytes[i] = self.Bytes[i] * decay + size / window
+            self.Packets[i] = self.Packets[i] * decay + packets / window
+        if elapsed > 0.0:
+            self.Time = now
+
+    def GetByteRate(self, window: int, now: float = None) -> float:
+        """Current bytes/sec over RATE_WINDOWS[window]"""
+        return Decay(self.Bytes[window], self.Time, Now() if now is None else now, RATE_WINDOWS[window])
+
+    def GetPacketRate(self, window: int, now: float = None) -> float:
+        """Current packets/sec over RATE_WINDOWS[window]"""
+        return Decay(self.Packets[window], self.Time, Now() if now is None else now, RATE_WINDOWS[window])
+
+    def GetByteRateKey(self, window: int) -> float:
+        return SortKey(self.Bytes[window], self.Time, RATE_WINDOWS[window])
+
+    def GetPacketRateKey(self, window: int) -> float:
+        return SortKey(self.Packets[window], self.Time, RATE_WINDOWS[window])
+
+
+def FormatRate(value: float) -> str:
+    """Human readable bytes/sec, ie. 12.3 KB/s"""
+    for prefix in ('', 'K', 'M', 'G'):
+        if value < 1000.0:
+            return f'{value:.1f} {prefix}B/s'
+        value /= 1000.0
+    return f'{value:.1f} TB/s'
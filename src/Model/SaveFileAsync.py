@@ -22,14 +22,10 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
-import bz2
-import pickle
+import logging
 import threading
-import time
 from typing import Union, Dict, Tuple, List
 
-import wx
-
 from Model.HostData import HostData
 
 
@@ -39,7 +35,7 @@ class SaveFileAsync(threading.Thread):
         """Creating an instance of this class will execute the run function immediately in the background thread.
         :param data: Either the main Connections Dictionary or a View from .items()
         :param pathname: Path to the file to write data
-        :param filetype: A str of either txt or ntd (NetTools Data)
+        :param filetype: A str of txt, NTD snapshots are saved with NetworkSniffer.SaveSnapshotAsync()
         """
         threading.Thread.__init__(self)  # Must be invoked first when subclassing a Thread
         self.setName(f'SaveFileAsyncThread')
@@ -53,29 +49,18 @@ class SaveFileAsync(threading.Thread):
         try:
             with open(self.FilePath, 'w') as file:
                 for i in self.Data:  # type: HostData
+                    estimated = '\tESTIMATED' if i.Estimated else ''
                     file.writelines(
                         f'EndPoint: {i.GetRemoteEndPoint()}\t<-> {i.LocalIP}:{i.LocalPort} {i.ProtoType} -- '
                         f'PKT: {i.PacketCount}\tIN: {i.IncomingCount}\tOUT: {i.OutgoingCount}\t'
-                        f'BW: {i.BandwidthUsage}\tIN: {i.DownloadUsage}\tOUT: {i.DownloadUsage}\t'
-                        f'PID: {i.GetPID()}\tFIRST: {i.FirstSeen}\tLAST: {i.LastSeen}\n')
+                        f'BW: {i.BandwidthUsage}\tIN: {i.DownloadUsage}\tOUT: {i.UploadUsage}\t'
+                        f'PID: {i.GetPID()}\tFIRST: {i.FirstSeen}\tLAST: {i.LastSeen}{estimated}\n')
         except IOError:
-            wx.LogError(f"Cannot save current data as {self.FileType} in file {self.FilePath}.")
-
-    def _SaveAsNTD(self):
-        """Save file as bz2 compressed, python pickled, class data."""
-        try:
-            with bz2.BZ2File(self.FilePath, 'wb') as bz2file:
-                pickle.dump(self.Data, bz2file)
-        except IOError:
-            wx.LogError(f"Cannot save current data as {self.FileType} in file {self.FilePath}.")
+            logging.error(f"Cannot save current data as {self.FileType} in file {self.FilePath}.")
 
     def run(self) -> None:
         """Start background thread. (Is called automatically after class initialized)"""
-        if self.FileType.lower() == 'ntd':
-            self._SaveAsNTD()
-        elif self.FileType.lower() == 'txt':
+        if self.FileType.lower() == 'txt':
             self._SaveAsTXT()
-
-        time.sleep(2)
         print("Finished background file write to", self.FilePath)
         return None
\ No newline at end of file
@@ -0,0 +1,398 @@
+"""
+MIT License
+
+Copyright (c) 2022 0xKate
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# NTD snapshot file layout, all integers little endian:
+#   Header   HEADER
+#   Chunks   RECORDS_PER_CHUNK (or fewer in the last chunk) RECORD structs each, compressed with the header's codec
+#   Strings  compressed: u32 count, count u32 byte lengths, the utf-8 strings back to back
+#   Index    one INDEX_ENTRY per chunk, uncompressed
+#   Footer   FOOTER, at a fixed offset from the end so a reader can find the index without scanning
+# Strings in records are ids into the string table, NO_STRING for None.
+# Version 1 records (RECORD_V1) have no Flags, they are read as Flags 0.
+
+import importlib
+import mmap
+import struct
+import time
+import zlib
+from array import array
+from collections import OrderedDict
+from collections.abc import Sequence
+from datetime import datetime
+from functools import lru_cache
+from itertools import accumulate
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple, Union
+
+# Project Files
+from Model.ConnectionStore import NO_STRING, StringTable
+from Model.HostData import HostData
+
+MAGIC = b'NTD2'
+VERSION = 2
+RECORDS_PER_CHUNK = 8192
+
+HEADER = struct.Struct('<4sHBBdI')  # magic, version, codec, flags, created (unix time), records per chunk
+# RemoteIP, RemotePort, LocalIP, LocalPort, ProtoType, RemoteHostname, Interface, ProcessName, Status,
+# PacketCount, IncomingCount, OutgoingCount, BandwidthUsage, DownloadUsage, UploadUsage, PID, FirstSeen, LastSeen,
+# Flags
+RECORD = struct.Struct('<iHiHiiiiiqqqqqqiddB')
+RECORD_V1 = struct.Struct('<iHiHiiiiiqqqqqqidd')
+RECORD_FIELDS = ('RemoteIP', 'RemotePort', 'LocalIP', 'LocalPort', 'ProtoType', 'RemoteHostname', 'Interface',
+                 'ProcessName', 'Status', 'PacketCount', 'IncomingCount', 'OutgoingCount', 'BandwidthUsage',
+                 'DownloadUsage', 'UploadUsage', 'PID', 'FirstSeen', 'LastSeen', 'Flags')
+FLAG_ESTIMATED = 1  # Counted from sampled packets, see Model.LoadShedder
+STRING_FIELDS = frozenset(('RemoteIP', 'LocalIP', 'ProtoType', 'RemoteHostname', 'Interface', 'ProcessName',
+                           'Status'))
+INDEX_ENTRY = struct.Struct('<QIIdd')  # chunk offset, compressed size, records, min FirstSeen, max LastSeen
+FOOTER = struct.Struct('<QIQIQ4s')  # index offset, chunks, strings offset, strings size, records, magic
+
+CODEC_NONE, CODEC_ZLIB, CODEC_LZ4, CODEC_ZSTD = 0, 1, 2, 3
+CODEC_NAMES = {'none': CODEC_NONE, 'zlib': CODEC_ZLIB, 'lz4': CODEC_LZ4, 'zstd': CODEC_ZSTD}
+
+
+@lru_cache(maxsize=None)
+def _ImportCodec(module: str):
+    """An optional codec library (lz4.frame or zstandard), or None if it isn't installed. Only imported once a
+    snapshot is saved or opened with it."""
+    try:
+        return importlib.import_module(module)
+    except ImportError:
+        return None
+
+
+def GetCompressor(codec: int) -> Callable[[bytes], bytes]:
+    """:raises ValueError: If the codec is unknown or its library is not installed"""
+    if codec == CODEC_NONE:
+        return bytes
+    if codec == CODEC_ZLIB:
+        return lambda data: zlib.compress(data, 1)
+    if codec == CODEC_LZ4 and _ImportCodec('lz4.frame') is not None:
+        return _ImportCodec('lz4.frame').compress
+    if codec == CODEC_ZSTD and _ImportCodec('zstandard') is not None:
+        return _ImportCodec('zstandard').ZstdCompressor(level=1).compress
+    raise ValueError(f'Snapshot codec {codec} is not available')
+
+
+def GetDecompressor(codec: int) -> Callable[[bytes], bytes]:
+    """:raises ValueError: If the codec is unknown or its library is not installed"""
+    if codec == CODEC_NONE:
+        return bytes
+    if codec == CODEC_ZLIB:
+        return zlib.decompress
+    if codec == CODEC_LZ4 and _ImportCodec('lz4.frame') is not None:
+        return _ImportCodec('lz4.frame').decompress
+    if codec == CODEC_ZSTD and _ImportCodec('zstandard') is not None:
+        return _ImportCodec('zstandard').ZstdDecompressor().decompress
+    raise ValueError(f'Snapshot codec {codec} is not available')
+
+
+def GetAvailableCodecs() -> List[str]:
+    """Names of the codecs that can be used on this machine, fastest first."""
+    available = {'none': True, 'zlib': True, 'lz4': _ImportCodec('lz4.frame') is not None,
+                 'zstd': _ImportCodec('zstandard') is not None}
+    return [name for name in ('lz4', 'zstd', 'zlib', 'none') if available[name]]
+
+
+def HostRecord(host: HostData, strings: StringTable) -> tuple:
+    """Copy a connection into a RECORD tuple, interning its strings in strings."""
+    intern = strings.Intern
+    socket_data = host.SocketData
+    return (intern(host.RemoteIP), host.RemotePort, intern(host.LocalIP), host.LocalPort, intern(host.ProtoType),
+            intern(host.RemoteHostname), intern(host.Interface), intern(host.GetProcName()),
+            intern(socket_data[1]) if socket_data else NO_STRING,
+            host.PacketCount, host.IncomingCount, host.OutgoingCount, host.BandwidthUsage, host.DownloadUsage,
+            host.UploadUsage, host.GetPID(), host.FirstSeen.timestamp(), host.LastSeenTime,
+            FLAG_ESTIMATED if host.Estimated else 0)
+
+
+def StoreRecord(store, slot: int, strings: StringTable) -> tuple:
+    """HostRecord() for a ConnectionStore row, read straight from its columns."""
+    columns = store.Columns
+    get = store.Strings.Get
+    intern = strings.Intern
+    return (intern(get(columns['RemoteIP'][slot])), columns['RemotePort'][slot],
+            intern(get(columns['LocalIP'][slot])), columns['LocalPort'][slot],
+            intern(get(columns['ProtoType'][slot])), intern(get(columns['RemoteHostname'][slot])),
+            intern(get(columns['Interface'][slot])), intern(get(columns['ProcessName'][slot])),
+            intern(get(columns['Status'][slot])),
+            columns['PacketCount'][slot], columns['IncomingCount'][slot], columns['OutgoingCount'][slot],
+            columns['BandwidthUsage'][slot], columns['DownloadUsage'][slot], columns['UploadUsage'][slot],
+            max(columns['PID'][slot], 0), columns['FirstSeen'][slot], columns['LastSeen'][slot],
+            FLAG_ESTIMATED if columns['Estimated'][slot] else 0)
+
+
+def EncodeStrings(strings: List[str]) -> bytes:
+    encoded = [string.encode('utf-8', 'surrogateescape') for string in strings]
+    return struct.pack(f'<I{len(encoded)}I', len(encoded), *map(len, encoded)) + b''.join(encoded)
+
+
+def DecodeStrings(data: bytes) -> List[str]:
+    count, = struct.unpack_from('<I', data)
+    lengths = struct.unpack_from(f'<{count}I', data, 4)
+    strings = []
+    offset = 4 + 4 * count
+    for length in lengths:
+        strings.append(data[offset:offset + length].decode('utf-8', 'surrogateescape'))
+        offset += length
+    return strings
+
+
+def WriteSnapshot(pathname: str, records: Iterable[tuple], strings: List[str], codec=CODEC_ZLIB,
+                  records_per_chunk=RECORDS_PER_CHUNK) -> int:
+    """
+    Write RECORD tuples and the string table they refer to as an NTD snapshot. Safe to run on a worker thread,
+    it only touches its arguments.\n
+    :return: Number of records written
+    :raises ValueError: If the codec is not available
+    :raises OSError: If the file can't be written
+    """
+    compress = GetCompressor(codec)
+    pack = RECORD.pack
+    index = []  # type: List[Tuple[int, int, int, float, float]]
+    total = 0
+    with open(pathname, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, codec, 0, time.time(), records_per_chunk))
+        chunk = []
+        for record in records:
+            chunk.append(record)
+            if len(chunk) == records_per_chunk:
+                index.append(_WriteChunk(file, chunk, pack, compress))
+                total += len(chunk)
+                chunk = []
+        if chunk:
+            index.append(_WriteChunk(file, chunk, pack, compress))
+            total += len(chunk)
+        strings_offset = file.tell()
+        strings_data = compress(EncodeStrings(strings))
+        file.write(strings_data)
+        index_offset = file.tell()
+        file.write(b''.join(INDEX_ENTRY.pack(*entry) for entry in index))
+        file.write(FOOTER.pack(index_offset, len(index), strings_offset, len(strings_data), total, MAGIC))
+    return total
+
+
+def _WriteChunk(file, chunk: List[tuple], pack, compress) -> Tuple[int, int, int, float, float]:
+    offset = file.tell()
+    data = compress(b''.join([pack(*record) for record in chunk]))
+    file.write(data)
+    return offset, len(data), len(chunk), min(record[16] for record in chunk), max(record[17] for record in chunk)
+
+
+class SnapshotHost:
+    """One record of a saved session, read only, with the parts of the HostData interface the grid uses."""
+    __slots__ = ['RemoteIP', 'RemotePort', 'LocalIP', 'LocalPort', 'ProtoType', 'RemoteHostname', 'Interface',
+                 'ProcessName', 'Status', 'PacketCount', 'IncomingCount', 'OutgoingCount', 'BandwidthUsage',
+                 'DownloadUsage', 'UploadUsage', 'PID', 'FirstSeen', 'LastSeen', 'Flags']
+
+    def __init__(self, record: tuple, strings: 'SnapshotStrings'):
+        self.Flags = 0  # Not in RECORD_V1
+        for name, value in zip(RECORD_FIELDS, record):
+            setattr(self, name, strings.Get(value) if name in STRING_FIELDS else value)
+        self.FirstSeen = datetime.fromtimestamp(self.FirstSeen)
+        self.LastSeen = datetime.fromtimestamp(self.LastSeen)
+
+    def __str__(self):
+        return f'RemoteHost: {self.RemoteHostname}:{self.RemotePort} - ' \
+               f'PacketCount: {self.PacketCount} Incoming: {self.IncomingCount} Outgoing: {self.OutgoingCount}'
+
+    @property
+    def Estimated(self) -> bool:
+        return bool(self.Flags & FLAG_ESTIMATED)
+
+    def GetProcName(self):
+        return self.ProcessName
+
+    def GetRemoteEndPoint(self):
+        return f'{self.RemoteHostname}:{self.RemotePort}'
+
+    def GetPID(self):
+        return self.PID
+
+    @staticmethod
+    def GetByteRate(_window: int) -> float:
+        """Rates aren't saved, a saved session is idle"""
+        return 0.0
+
+    @staticmethod
+    def GetPacketRate(_window: int) -> float:
+        return 0.0
+
+
+class SnapshotStrings:
+    """The string table of a snapshot, strings are only decoded when asked for."""
+    __slots__ = ['Data', 'Offsets']
+
+    def __init__(self, data):
+        count, = struct.unpack_from('<I', data)
+        self.Data = data
+        self.Offsets = array('Q', accumulate(struct.unpack_from(f'<{count}I', data, 4), initial=4 + 4 * count))
+
+    def __len__(self):
+        return len(self.Offsets) - 1
+
+    def Get(self, string_id: int) -> Union[str, None]:
+        if string_id == NO_STRING:
+            return None
+        return bytes(self.Data[self.Offsets[string_id]:self.Offsets[string_id + 1]]).decode('utf-8',
+                                                                                            'surrogateescape')
+
+
+class SnapshotReader(Sequence):
+    """
+    Random access to an NTD snapshot without loading it. The file is memory mapped, a chunk is only decompressed
+    when one of its records is read, and only the last few chunks are kept, so sessions larger than RAM can be
+    browsed. Reads as a sequence of SnapshotHost.
+    """
+
+    def __init__(self, pathname: str, cached_chunks=16):
+        """
+        :raises ValueError: If the file is not an NTD snapshot, or was compressed with a codec not installed here
+        :raises OSError: If the file can't be read
+        """
+        self.FilePath = pathname
+        with open(pathname, 'rb') as file:
+            self.Map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._ReadLayout()
+        except (ValueError, struct.error):
+            self.Close()
+            raise
+        self.Chunks = OrderedDict()  # type: Dict[int, bytes]
+        self.CachedChunks = cached_chunks
+        self.LastRow = (-1, None)
+
+    def _ReadLayout(self):
+        if len(self.Map) < HEADER.size + FOOTER.size:
+            raise ValueError(f'{self.FilePath} is not an NTD snapshot')
+        magic, version, self.Codec, _flags, self.Created, self.RecordsPerChunk = HEADER.unpack_from(self.Map)
+        index_offset, chunks, strings_offset, strings_size, self.Records, end_magic = \
+            FOOTER.unpack_from(self.Map, len(self.Map) - FOOTER.size)
+        if magic != MAGIC or end_magic != MAGIC:
+            if self.Map[:3] == b'BZh':
+                raise ValueError(f'{self.FilePath} was saved by an older version (bz2 pickle) and cannot be opened')
+            raise ValueError(f'{self.FilePath} is not an NTD snapshot or is incomplete')
+        if version > VERSION:
+            raise ValueError(f'{self.FilePath} was saved by a newer version (format {version})')
+        self.Record = RECORD if version >= 2 else RECORD_V1
+        self.Decompress = GetDecompressor(self.Codec)
+        self.Index = [INDEX_ENTRY.unpack_from(self.Map, index_offset + i * INDEX_ENTRY.size) for i in range(chunks)]
+        strings = memoryview(self.Map)[strings_offset:strings_offset + strings_size]
+        self.Strings = SnapshotStrings(strings if self.Codec == CODEC_NONE else self.Decompress(strings))
+
+    def Close(self):
+        self.Chunks = OrderedDict()
+        self.Strings = None
+        try:
+            self.Map.close()
+        except BufferError:
+            pass  # Still referenced by an uncompressed string table, freed with it
+
+    def _GetChunk(self, chunk: int):
+        data = self.Chunks.get(chunk)
+        if data is None:
+            offset, size = self.Index[chunk][:2]
+            if self.Codec == CODEC_NONE:
+                data = memoryview(self.Map)[offset:offset + size]
+            else:
+                data = self.Decompress(self.Map[offset:offset + size])
+            self.Chunks[chunk] = data
+            if len(self.Chunks) > self.CachedChunks:
+                self.Chunks.popitem(last=False)
+        else:
+            self.Chunks.move_to_end(chunk)
+        return data
+
+    def GetRecord(self, row: int) -> tuple:
+        """The raw RECORD tuple of a row, strings still as ids into Strings."""
+        chunk, position = divmod(row, self.RecordsPerChunk)
+        return self.Record.unpack_from(self._GetChunk(chunk), position * self.Record.size)
+
+    def IterRecords(self, first_seen_after: float = None, last_seen_before: float = None) -> Iterator[Tuple[int, tuple]]:
+        """(row, RECORD tuple) of every record, skipping whole chunks outside the given time range unread."""
+        for chunk, (offset, size, _count, min_first, max_last) in enumerate(self.Index):
+            if first_seen_after is not None and max_last < first_seen_after:
+                continue
+            if last_seen_before is not None and min_first > last_seen_before:
+                continue
+            data = self.Decompress(self.Map[offset:offset + size])
+            row = chunk * self.RecordsPerChunk
+            for record in self.Record.iter_unpack(data):
+                yield row, record
+                row += 1
+
+    def Filter(self, text: str = '', first_seen_after: float = None, last_seen_before: float = None) -> 'SnapshotRows':
+        """
+        The rows whose addresses, hostname, process or interface contain text, seen within the given time range.\n
+        Strings are matched once each in the string table, then records are compared by id, so filtering never
+        builds a SnapshotHost.
+        """
+        text = text.lower()
+        matching = None
+        if text:
+            matching = {string_id for string_id in range(len(self.Strings))
+                        if text in self.Strings.Get(string_id).lower()}
+        rows = array('Q')
+        for row, record in self.IterRecords(first_seen_after, last_seen_before):
+            if first_seen_after is not None and record[17] < first_seen_after:
+                continue
+            if last_seen_before is not None and record[16] > last_seen_before:
+                continue
+            if matching is not None and not (record[0] in matching or record[2] in matching or
+                                             record[5] in matching or record[6] in matching or
+                                             record[7] in matching):
+                continue
+            rows.append(row)
+        return SnapshotRows(self, rows)
+
+    def __len__(self):
+        return self.Records
+
+    def __getitem__(self, row) -> SnapshotHost:
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(len(self)))]
+        if row < 0:
+            row += self.Records
+        if not 0 <= row < self.Records:
+            raise IndexError(row)
+        # The grid reads a row once per column, keep the last one decoded
+        if self.LastRow[0] != row:
+            self.LastRow = (row, SnapshotHost(self.GetRecord(row), self.Strings))
+        return self.LastRow[1]
+
+
+class SnapshotRows(Sequence):
+    """A filtered view of a SnapshotReader, only the row numbers are held in memory."""
+    __slots__ = ['Reader', 'Rows']
+
+    def __init__(self, reader: SnapshotReader, rows: array):
+        self.Reader = reader
+        self.Rows = rows
+
+    def __len__(self):
+        return len(self.Rows)
+
+    def __getitem__(self, row) -> SnapshotHost:
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(len(self)))]
+        return self.Reader[self.Rows[row]]
@@ -0,0 +1,150 @@
+"""
+MIT License
+
+Copyright (c) 2022 0xKate
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import time
+from socket import AF_INET6, AF_INET, SOCK_DGRAM, SOCK_STREAM
+from typing import Dict, Tuple, Union, Callable
+
+# 3rd Party Libraries
+import psutil
+
+# Project Files
+from Enums import PROTO
+from Model.Metrics import Histogram
+
+PROTO_MAP = {
+    (AF_INET, SOCK_STREAM): PROTO.TCP.value,
+    (AF_INET, SOCK_DGRAM): PROTO.UDP.value,
+}
+PROTO_MAP6 = {
+    (AF_INET6, SOCK_STREAM): 'TCP6',
+    (AF_INET6, SOCK_DGRAM): 'UDP6',
+}
+
+
+class SocketTable:
+    """Index of every inet4 socket on the system keyed by connection signature (str(IP), int(port), int(PROTO)).
+    The system socket list is only scanned off the event loop, either on a schedule or when a lookup misses,
+    and any number of misses waiting at the same time share a single scan."""
+    __slots__ = ['Index', 'Misses', 'Loop', 'Executor', 'Provider', 'RefreshInterval', 'MinRefreshInterval',
+                 'NegativeTTL', 'LastRefresh', 'PendingRefresh', 'RefreshTask', 'ScanTime', 'Refreshes']
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, executor: concurrent.futures.Executor,
+                 refresh_interval=5.0, min_refresh_interval=0.5, negative_ttl=5.0, provider: Callable = None):
+        """
+        :param loop: The event loop lookups are made from
+        :param executor: Where the blocking socket scans are run
+        :param refresh_interval: Seconds between scheduled scans
+        :param min_refresh_interval: Misses wait at least this long after the last scan before starting another
+        :param negative_ttl: Seconds a signature that was not found is remembered as missing
+        :param provider: Returns the system socket list, defaults to psutil.net_connections(kind='inet4')
+        """
+        self.Index = {}  # type: Dict[Tuple[str, int, int], Tuple[int, str, int]]
+        self.Misses = {}  # type: Dict[Tuple[str, int, int], float]
+        self.Loop = loop
+        self.Executor = executor
+        self.Provider = provider or (lambda: psutil.net_connections(kind='inet4'))
+        self.RefreshInterval = refresh_interval
+        self.MinRefreshInterval = min_refresh_interval
+        self.NegativeTTL = negative_ttl
+        self.LastRefresh = 0.0
+        self.PendingRefresh = None  # type: Union[asyncio.Future, None]
+        self.RefreshTask = None  # type: Union[asyncio.Task, None]
+        self.ScanTime = Histogram('nettools_socket_scan_seconds', 'Duration of system socket scans')
+        self.Refreshes = 0  # Completed scans, a signature missing from the index stays missing until this changes
+
+    @staticmethod
+    def _Scan(provider: Callable) -> Dict[Tuple[str, int, int], Tuple[int, str, int]]:
+        """Build a fresh index from the system socket list. (Runs in the executor)"""
+        return {(x.raddr[0], x.raddr[1], PROTO_MAP[(x.family, x.type)]): (x.pid, x.status, x.fd)
+                for x in provider() if len(x.raddr) == 2 and (x.family, x.type) in PROTO_MAP}
+
+    async def _RefreshAsync(self):
+        start = time.perf_counter()
+        try:
+            self.Index = await self.Loop.run_in_executor(self.Executor, self._Scan, self.Provider)
+            self.Refreshes += 1
+            self.ScanTime.Observe(time.perf_counter() - start)
+        except Exception as e:
+            # ie. psutil.AccessDenied on macOS, keep the last index and try again on the next refresh
+            logging.error(f'SocketTable - Socket scan failed: {e!r}')
+        finally:
+            self.LastRefresh = time.monotonic()
+            self.PendingRefresh = None
+        now = self.LastRefresh
+        self.Misses = {k: v for k, v in self.Misses.items() if v > now}
+
+    def RefreshAsync(self) -> asyncio.Future:
+        """Rescan the system sockets in the background. Returns the scan already in flight if there is one."""
+        if self.PendingRefresh is None:
+            self.PendingRefresh = asyncio.ensure_future(self._RefreshAsync())
+        return self.PendingRefresh
+
+    async def RefreshLoopAsync(self):
+        """ SocketTable Coroutine: Rescans the system sockets every RefreshInterval seconds."""
+        while True:
+            await asyncio.shield(self.RefreshAsync())
+            await asyncio.sleep(self.RefreshInterval)
+
+    def Start(self):
+        """Start the scheduled refresh, the first scan happens right away."""
+        if self.RefreshTask is None:
+            self.RefreshTask = self.Loop.create_task(self.RefreshLoopAsync())
+
+    def Get(self, signature: Tuple[str, int, int]) -> Union[Tuple[int, str, int], None]:
+        """
+        Get(signature) -> ()\n
+        Cache only lookup, never scans.\n
+        :param signature: The connection signature of (str(IP), int(port), int(ENUM(PROTO)))
+        :return: A tuple of (PID, CONN_STATUS, FILE_DESCRIPTOR) or None
+        """
+        return self.Index.get(signature)
+
+    async def LookupAsync(self, signature: Tuple[str, int, int]) -> Union[Tuple[int, str, int], None]:
+        """
+        LookupAsync(signature) -> ()\n
+        Like Get() but on a miss waits for a rescan, unless the signature was recently looked up and not found.\n
+        :param signature: The connection signature of (str(IP), int(port), int(ENUM(PROTO)))
+        :return: A tuple of (PID, CONN_STATUS, FILE_DESCRIPTOR) or None
+        """
+        if signature in self.Index:
+            return self.Index[signature]
+        now = time.monotonic()
+        if self.Misses.get(signature, 0.0) > now:
+            return None
+        last_refresh = self.LastRefresh
+        if self.PendingRefresh is None:
+            wait = self.MinRefreshInterval - (now - last_refresh)
+            if wait > 0:
+                # Don't scan back to back, everything that misses in the meantime joins the next scan
+                await asyncio.sleep(wait)
+        if self.PendingRefresh is not None or self.LastRefresh == last_refresh:
+            await asyncio.shield(self.RefreshAsync())
+        result = self.Index.get(signature)
+        if result is None:
+            self.Misses[signature] = time.monotonic() + self.NegativeTTL
+        return result
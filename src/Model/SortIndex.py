@@ -0,0 +1,101 @@
+"""
+MIT License
+
+Copyright (c) 2022 0xKate
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from bisect import bisect_left, insort
+from collections.abc import Sequence
+from operator import attrgetter, methodcaller
+from typing import Dict, Iterable, List, Tuple, Union
+
+from Model.HostData import HostData
+
+
+class SortIndex:
+    """Connection signatures kept sorted by one HostData attribute or getter.
+    Rather than re-sorting every connection on every redraw, only the connections that changed since the last
+    Update() are moved, each with a binary search. Both sort directions are read from the same index."""
+    __slots__ = ['Attr', 'Key', 'Entries', 'Positions', 'RebuildRatio']
+
+    def __init__(self, attr: str, rebuild_ratio=8):
+        """
+        :param attr: A HostData attribute or getter to sort by (ie. 'PacketCount' or 'GetPID')
+        :param rebuild_ratio: Fall back to one full sort when more than 1/rebuild_ratio of the rows changed
+        """
+        self.Attr = attr
+        self.Key = methodcaller(attr) if attr.startswith('Get') else attrgetter(attr)
+        self.Entries = []  # type: List[Tuple[object, Tuple[str, int, int]]]
+        self.Positions = {}  # type: Dict[Tuple[str, int, int], Tuple[object, Tuple[str, int, int]]]
+        self.RebuildRatio = rebuild_ratio
+
+    def Rebuild(self, connections: Dict[Tuple[str, int, int], HostData]):
+        """Sort every connection from scratch."""
+        key = self.Key
+        self.Positions = {signature: (key(host), signature) for signature, host in connections.items()}
+        self.Entries = sorted(self.Positions.values())
+
+    def Update(self, signatures: Iterable[Tuple[str, int, int]], connections: Dict[Tuple[str, int, int], HostData]):
+        """Move the given connections to their new place in the order, dropping any no longer in connections."""
+        if not isinstance(signatures, (set, list, tuple, dict)):
+            signatures = list(signatures)
+        if len(signatures) > len(self.Entries) // self.RebuildRatio:
+            self.Rebuild(connections)
+            return
+        entries = self.Entries
+        positions = self.Positions
+        key = self.Key
+        for signature in signatures:
+            old_entry = positions.pop(signature, None)
+            if old_entry is not None:
+                del entries[bisect_left(entries, old_entry)]
+            host = connections.get(signature)
+            if host is not None:
+                entry = positions[signature] = (key(host), signature)
+                insort(entries, entry)
+
+    def __len__(self):
+        return len(self.Entries)
+
+    def GetSignature(self, row: int, descending=True) -> Tuple[str, int, int]:
+        return self.Entries[-1 - row][1] if descending else self.Entries[row][1]
+
+    def GetView(self, connections: Dict[Tuple[str, int, int], HostData], descending=True) -> 'SortedView':
+        return SortedView(self, connections, descending)
+
+
+class SortedView(Sequence):
+    """Read only sequence of HostData in SortIndex order. Rows are looked up when they are read, so showing the
+    top of a large table never touches the rest of it."""
+    __slots__ = ['Index', 'Connections', 'Descending']
+
+    def __init__(self, index: SortIndex, connections: Dict[Tuple[str, int, int], HostData], descending=True):
+        self.Index = index
+        self.Connections = connections
+        self.Descending = descending
+
+    def __len__(self):
+        return len(self.Index)
+
+    def __getitem__(self, row) -> Union[HostData, None]:
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(len(self)))]
+        return self.Connections.get(self.Index.GetSignature(row, self.Descending))
@@ -24,12 +24,15 @@ SOFTWARE.
 
 import asyncio
 import ctypes
+import logging
 import sys
+from argparse import Namespace
 
 import pubsub.pub
 import wx
 from wxasync import WxAsyncApp
 from Enums import EventMsg
+from Model.Autosave import DEFAULT_AUTOSAVE_DIR, SessionAutosave
 from Model.NetworkSniffer import NetworkSniffer
 from UI.MainWindow import MainWindow
 
@@ -38,13 +41,18 @@ class WxAsyncEngine(WxAsyncApp):
     """ Main WxAsync Application """
     Version = 0.02
 
-    def __init__(self):
+    def __init__(self, args: Namespace = None):
+        """:param args: The parsed command line, see main.py"""
         WxAsyncApp.__init__(self, 0)
+        self.Args = args
         pubsub.pub.subscribe(self._Exit, EventMsg.Exit.value)
         self.App = None
+        self.Autosave = None
 
     def OnInit(self):
         """ Windows 10 Icon Fix """
+        if sys.platform != 'win32':
+            return True
         app_id = f'0xStudios.NullSec.NetTools.{self.Version}'  # arbitrary string
         ctypes.windll.shell32.SetCurrentProcessExplicitAppUserModelID(app_id)
         try:
@@ -55,19 +63,56 @@ class WxAsyncEngine(WxAsyncApp):
 
     async def _StartAsync(self):
         """ Blends the wxPython and asyncio event loops. """
-        self.NetToolsData = NetworkSniffer()
+        self.NetToolsData = self._CreateSniffer()
         self.MainWindow = MainWindow(self.NetToolsData, None, wx.ID_ANY, "")
         self.MainWindow.Show()
+        asyncio.get_running_loop().create_task(self._StartAutosaveAsync())
+        if self.Args is not None and self.Args.replay:
+            self.NetToolsData.ReplayStart(self.Args.replay, realtime=self.Args.realtime, local_ip=self.Args.local_ip)
         await self.MainLoop()
 
+    def _CreateSniffer(self) -> NetworkSniffer:
+        """The NetworkSniffer set up the way the command line asked for, before the window reads its settings."""
+        args = self.Args
+        if args is None:
+            return NetworkSniffer()
+        sniffer = NetworkSniffer(columnar=args.columnar, interfaces=args.interface or None, workers=args.workers)
+        sniffer.ReverseResolver = not args.no_resolve
+        sniffer.SetMetricsPort(args.metrics_port)
+        sniffer.SetLoadShedding(not args.no_shedding)
+        if args.idle_timeout or args.max_flows or args.archive:
+            sniffer.SetFlowLimits(args.idle_timeout, args.max_flows, args.archive)
+        return sniffer
+
+    async def _StartAutosaveAsync(self):
+        """Bring back the previous session once the window is up, then keep checkpointing this one."""
+        if self.Args is not None:
+            autosave = SessionAutosave(self.NetToolsData, self.Args.autosave or DEFAULT_AUTOSAVE_DIR,
+                                       self.Args.autosave_interval)
+        else:
+            autosave = SessionAutosave(self.NetToolsData)
+        try:
+            await autosave.RestoreAsync()
+        except OSError as e:
+            logging.error(f'Autosave - Disabled, cannot use {autosave.Directory}: {e}')
+            return
+        self.Autosave = autosave
+        self.Autosave.Start()
+
     def Start(self):
         """Use the main thread to run our main event loop (ie. GoldenThread)"""
         try:
             asyncio.run(self._StartAsync())
         except BaseException as ex:
             print(f"Caught exception in main event loop, shutting down. : {ex}")
+            if self.Autosave is not None:
+                self.Autosave.Close()
             sys.exit(-1)
 
     def _Exit(self):
         """ Save & Quit the application """
+        self.NetToolsData.Shutdown()
+        if self.Autosave is not None:
+            self.Autosave.Close()
+            self.Autosave = None
         self.ExitMainLoop()
@@ -0,0 +1,85 @@
+"""
+MIT License
+
+Copyright (c) 2022 0xKate
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# Run from src: python -m unittest discover -s Tests -p 'Test*.py' -t .
+
+import asyncio
+import shutil
+import tempfile
+import unittest
+
+# Project Files
+from Enums import DIRECTION
+from Model.Autosave import LoadSession, SessionAutosave
+from Model.NetworkSniffer import NetworkSniffer
+
+SIGNATURE = ('203.0.113.7', 443, 0)
+PACKET = (SIGNATURE, '10.0.0.1', 50000, DIRECTION.INCOMING, 100, 'test0', 1)
+
+
+class TestAutosave(unittest.TestCase):
+    def setUp(self):
+        self.Directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.Directory, ignore_errors=True)
+
+    def _Run(self, columnar: bool, steps):
+        async def RunAsync():
+            sniffer = NetworkSniffer(columnar=columnar, interfaces=['test0'])
+            sniffer.ReverseResolver = False
+            autosave = SessionAutosave(sniffer, self.Directory)
+            try:
+                await autosave.RestoreAsync()
+                await steps(sniffer, autosave)
+            finally:
+                autosave.Close()
+                sniffer.Shutdown()
+        asyncio.run(RunAsync())
+        return LoadSession(self.Directory)[0]
+
+    def test_Readded_Flow_Survives_Checkpoint(self):
+        async def Steps(sniffer, autosave):
+            sniffer._AccountBatch([PACKET])
+            await autosave.CheckpointAsync()
+            sniffer.EvictFlows([SIGNATURE])
+            sniffer._AccountBatch([PACKET])
+            await autosave.CheckpointAsync()
+        for columnar in (False, True):
+            with self.subTest(columnar=columnar):
+                hosts = self._Run(columnar, Steps)
+                self.assertEqual([(host.RemoteIP, host.RemotePort) for host in hosts], [SIGNATURE[:2]])
+                self.assertEqual(hosts[0].PacketCount, 1)
+
+    def test_Evicted_Flow_Stays_Removed(self):
+        async def Steps(sniffer, autosave):
+            sniffer._AccountBatch([PACKET])
+            await autosave.CheckpointAsync()
+            sniffer.EvictFlows([SIGNATURE])
+            await autosave.CheckpointAsync()
+        self.assertEqual(self._Run(False, Steps), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+"""
+MIT License
+
+Copyright (c) 2022 0xKate
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# Run from src: python -m unittest discover -s Tests -p 'Test*.py' -t .
+
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+
+# Project Files
+from Enums import DIRECTION
+from Model.NetworkSniffer import NetworkSniffer
+from Model.SnapshotFile import SnapshotHost, SnapshotReader
+
+SIGNATURE = ('203.0.113.7', 443, 0)
+PACKET = (SIGNATURE, '10.0.0.1', 50000, DIRECTION.INCOMING, 100, 'test0', 1)
+
+
+class ReaddingSniffer(NetworkSniffer):
+    """Evicts and re-adds SIGNATURE while the first snapshot slice is copied."""
+    __slots__ = ['Readded']
+
+    def SnapshotRecord(self, conn_signature, strings):
+        if not getattr(self, 'Readded', False):
+            self.Readded = True
+            self.EvictFlows([SIGNATURE])
+            self._AccountBatch([PACKET])
+        return super().SnapshotRecord(conn_signature, strings)
+
+
+class StoppedWorkerPool:
+    """Stands in for a CaptureWorkerPool that has captured and decoded some packets."""
+    def GetStats(self):
+        return {0: {'Captured': 7, 'Decoded': 5}, 1: {'Captured': 3, 'Decoded': 2}}
+
+    def Stop(self):
+        pass
+
+
+class TestNetworkSniffer(unittest.TestCase):
+    def setUp(self):
+        self.Directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.Directory, ignore_errors=True)
+
+    def test_Snapshot_Keeps_Flow_Readded_While_Copying(self):
+        pathname = os.path.join(self.Directory, 'session.ntd')
+
+        async def SaveAsync(columnar: bool):
+            sniffer = ReaddingSniffer(columnar=columnar, interfaces=['test0'])
+            sniffer.ReverseResolver = False
+            try:
+                sniffer._AccountBatch([PACKET])
+                return await sniffer.SaveSnapshotAsync(pathname)
+            finally:
+                sniffer.Shutdown()
+
+        for columnar in (False, True):
+            with self.subTest(columnar=columnar):
+                self.assertEqual(asyncio.run(SaveAsync(columnar)), 1)
+                reader = SnapshotReader(pathname)
+                hosts = [SnapshotHost(record, reader.Strings) for _row, record in reader.IterRecords()]
+                reader.Close()
+                self.assertEqual([(host.RemoteIP, host.RemotePort) for host in hosts], [SIGNATURE[:2]])
+
+    def test_Pipeline_Counts_Survive_Stopping_Workers(self):
+        async def CountAsync():
+            sniffer = NetworkSniffer(interfaces=['test0'])
+            try:
+                sniffer.WorkerPool = StoppedWorkerPool()
+                sniffer.Sniffing = True
+                running = sniffer.GetPipelineStats()
+                sniffer.SniffStop()
+                return running, sniffer.GetPipelineStats()
+            finally:
+                sniffer.Shutdown()
+
+        running, stopped = asyncio.run(CountAsync())
+        self.assertEqual((running['Received'], running['Parsed']), (10, 7))
+        self.assertEqual(stopped, running)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -25,6 +25,7 @@ SOFTWARE.
 # Traffic[process][connection_dict_key]
 
 import asyncio
+import os
 import time
 
 import wx
@@ -32,6 +33,7 @@ from pubsub import pub
 from wxasync import StartCoroutine
 
 from Enums import EventMsg
+from Model.CaptureInterface import GetAvailableInterfaces
 from Model.SaveFileAsync import SaveFileAsync
 from Model.NetworkSniffer import NetworkSniffer
 from UI.TrayIcon import TrayIcon
@@ -59,6 +61,9 @@ class MainWindow(wx.Frame):
         self._FileMenu = wx.Menu()
         self.Quit_Button = self._FileMenu.Append(wx.NewId(), "Quit", "Exits the application.") # type: wx.MenuItem
         self.Bind(wx.EVT_MENU, lambda x: pub.sendMessage(EventMsg.Exit.value), self.Quit_Button)
+        self.OpenSession_Button = self._FileMenu.Append(
+            wx.NewId(), "Open Session", "Browse connections saved in an NTD file") # type: wx.MenuItem
+        self.Bind(wx.EVT_MENU, self.OpenSessionCB, self.OpenSession_Button)
         self.SaveAsNTD_Button = self._FileMenu.Append(
             wx.NewId(), "Save as NTD", "Save the current table of connections "
                                        "to a loadable file format") # type: wx.MenuItem
@@ -67,6 +72,13 @@ class MainWindow(wx.Frame):
             wx.NewId(), "Save as Text", "Save the current table of connections "
                                         "in a human readable format. (CANNOT BE LOADED)") # type: wx.MenuItem
         self.Bind(wx.EVT_MENU, lambda x: self.SaveFileCB(x, 'txt'), self.SaveAsText_Button)
+        self.ExportCSV_Button = self._FileMenu.Append(
+            wx.NewId(), "Export CSV", "Export the current table of connections as CSV") # type: wx.MenuItem
+        self.Bind(wx.EVT_MENU, lambda x: self.SaveFileCB(x, 'csv'), self.ExportCSV_Button)
+        self.ExportJSONL_Button = self._FileMenu.Append(
+            wx.NewId(), "Export JSON Lines", "Export the current table of connections "
+                                             "as newline delimited JSON") # type: wx.MenuItem
+        self.Bind(wx.EVT_MENU, lambda x: self.SaveFileCB(x, 'jsonl'), self.ExportJSONL_Button)
         self._MenuBar.Append(self._FileMenu, "File")
         # End File Menu
 
@@ -81,6 +93,14 @@ class MainWindow(wx.Frame):
             wx.NewId(), "Stop Sniffer", "Stop the background sniffer task.") # type: wx.MenuItem
         self.StopSniff_Button.Enable(False)
         self.Bind(wx.EVT_MENU, self.StopSniffingCB, self.StopSniff_Button)
+        # Sniffer Menu - Replay PCAP Button
+        self.ReplayPcap_Button = self._SnifferMenu.Append(
+            wx.NewId(), "Replay PCAP", "Feed the packets of a pcap/pcapng file through the sniffer.") # type: wx.MenuItem
+        self.Bind(wx.EVT_MENU, self.ReplayPcapCB, self.ReplayPcap_Button)
+        # Sniffer Menu - Stop Replay Button
+        self.StopReplay_Button = self._SnifferMenu.Append(
+            wx.NewId(), "Stop Replay", "Stop the running pcap replay.") # type: wx.MenuItem
+        self.Bind(wx.EVT_MENU, self.StopReplayCB, self.StopReplay_Button)
         # Sniffer Menu - Add to MenuBar
         self._MenuBar.Append(self._SnifferMenu, "Sniffer")
 
@@ -90,6 +110,25 @@ class MainWindow(wx.Frame):
             wx.NewId(), "Auto Refresh", "Toggle Auto Refresh") # type: wx.MenuItem
         self.AutoRefreshToggle_Button.Check()
         self.Bind(wx.EVT_MENU, self.AutoRefreshToggleCB, self.AutoRefreshToggle_Button)
+        self.RealtimeReplayToggle_Button = self._OptionsSubMenu.AppendCheckItem(
+            wx.NewId(), "Realtime Replay", "Pace replayed packets to their original timestamps") # type: wx.MenuItem
+        self.Interfaces_Button = self._OptionsSubMenu.Append(
+            wx.NewId(), "Interfaces", "Choose the interfaces to capture on") # type: wx.MenuItem
+        self.Bind(wx.EVT_MENU, self.InterfacesCB, self.Interfaces_Button)
+        self.Workers_Button = self._OptionsSubMenu.Append(
+            wx.NewId(), "Capture Workers", "Capture and decode in several processes") # type: wx.MenuItem
+        self.Bind(wx.EVT_MENU, self.WorkersCB, self.Workers_Button)
+        self.FlowLimits_Button = self._OptionsSubMenu.Append(
+            wx.NewId(), "Flow Limits", "Evict idle connections to an archive") # type: wx.MenuItem
+        self.Bind(wx.EVT_MENU, self.FlowLimitsCB, self.FlowLimits_Button)
+        self.LoadShedding_Button = self._OptionsSubMenu.AppendCheckItem(
+            wx.NewId(), "Load Shedding", "Sample 1 in N flows instead of dropping packets "
+                                         "when traffic outruns accounting") # type: wx.MenuItem
+        self.LoadShedding_Button.Check(self.Data.GetLoadShedding())
+        self.Bind(wx.EVT_MENU, self.LoadSheddingToggleCB, self.LoadShedding_Button)
+        self.MetricsPort_Button = self._OptionsSubMenu.Append(
+            wx.NewId(), "Metrics Endpoint", "Serve internal metrics to Prometheus on localhost") # type: wx.MenuItem
+        self.Bind(wx.EVT_MENU, self.MetricsPortCB, self.MetricsPort_Button)
         self._SnifferMenu.Append(wx.ID_ANY, 'Options', self._OptionsSubMenu)
         # End Sniffer Menu
 
@@ -132,6 +171,7 @@ class MainWindow(wx.Frame):
         #self.Bind(wx.EVT_BUTTON, self.TestButtonCB, source=self.TestButton_4, id=4)
         self.Bind(wx.EVT_CLOSE, self.OnClose)
         StartCoroutine(self.UpdateClockLoopAsync, self)
+        StartCoroutine(self.UpdateMetricsLoopAsync, self)
 
     def __set_properties(self):
         self.SetSize((1280, 1024))
@@ -165,6 +205,30 @@ class MainWindow(wx.Frame):
                 self.GetStatusBar().SetStatusText(time.strftime('%I:%M:%S %p'), 1)
             await asyncio.sleep(0.5)
 
+    async def UpdateMetricsLoopAsync(self):
+        """ StatusBar Coroutine: Summarizes how the engine is keeping up, once a second."""
+        last_received, last_time = 0, time.monotonic()
+        while True:
+            await asyncio.sleep(1)
+            if not self.IsShown():
+                continue
+            values = self.Data.Metrics.Collect()
+            now = time.monotonic()
+            received = values['nettools_packets_received_total']
+            rate = max(received - last_received, 0) / (now - last_time)
+            last_received, last_time = received, now
+            dns = self.Data.HostnameCache.Latency
+            scans = self.Data.SocketTable.ScanTime
+            grid = self.ConnectionsDataGridContainer.RefreshTime
+            sampling = self.Data.GetSamplingRate()
+            self.GetStatusBar().SetStatusText(
+                (f"SAMPLING 1 in {sampling} flows, ~ counts are estimates   " if sampling > 1 else "") +
+                f"{rate:,.0f} pkt/s   Queue: {values['nettools_queue_depth']:,}   "
+                f"Dropped: {values['nettools_packets_dropped_total']:,}   "
+                f"Tasks: {values['nettools_pending_tasks']:,}   Threads: {values['nettools_background_threads']}   "
+                f"DNS: {values['nettools_dns_cache_hit_ratio']:.0%} hits, {dns.GetMean() * 1000:.0f} ms   "
+                f"Socket scan: {scans.Last * 1000:.0f} ms   Grid: {grid.Last * 1000:.0f} ms", 0)
+
     def OnClose(self, _event):
         """ On Window close event handler"""
         self.SystemTray.Destroy()
@@ -185,6 +249,75 @@ class MainWindow(wx.Frame):
             self.StartSniff_Button.Enable(False)
             self.Data.SniffStart()
 
+    def ReplayPcapCB(self, _event: wx.CommandEvent):
+        """MenuBar -> Sniffer -> Replay PCAP: Callback to replay a capture file through the sniffer"""
+        if self.Data.GetReplayStatus():
+            return
+        with wx.FileDialog(self, "Replay PCAP file",
+                           wildcard="Capture files (*.pcap;*.pcapng)|*.pcap;*.pcapng",
+                           style=wx.FD_OPEN | wx.FD_FILE_MUST_EXIST) as fileDialog:
+
+            if fileDialog.ShowModal() == wx.ID_CANCEL:
+                return     # the user changed their mind
+
+            pathname = fileDialog.GetPath()
+        self.Data.ReplayStart(pathname, realtime=self.RealtimeReplayToggle_Button.IsChecked())
+
+    def StopReplayCB(self, _event: wx.CommandEvent):
+        """MenuBar -> Sniffer -> Stop Replay: Callback to stop a running pcap replay"""
+        self.Data.ReplayStop()
+
+    def InterfacesCB(self, _event: wx.CommandEvent):
+        """MenuBar -> Sniffer -> Options -> Interfaces: Callback to choose the interfaces to capture on"""
+        available = GetAvailableInterfaces()
+        names = sorted(available)
+        choices = [f'{name} ({", ".join(available[name])})' for name in names]
+        with wx.MultiChoiceDialog(self, "Capture on these interfaces:", "Interfaces", choices) as choiceDialog:
+            choiceDialog.SetSelections([i for i, name in enumerate(names) if name in self.Data.GetInterfaces()])
+            if choiceDialog.ShowModal() == wx.ID_CANCEL:
+                return
+            selected = [names[i] for i in choiceDialog.GetSelections()]
+        if selected:
+            self.Data.SetInterfaces(selected)
+
+    def WorkersCB(self, _event: wx.CommandEvent):
+        """MenuBar -> Sniffer -> Options -> Capture Workers: Callback to set the number of capture processes"""
+        workers = wx.GetNumberFromUser("Capture processes, flows are split between them by hash.\n"
+                                       "0 captures in this process. Applies from the next Start Sniffing.",
+                                       "Workers:", "Capture Workers", self.Data.Workers, 0, os.cpu_count() or 1, self)
+        if workers >= 0:
+            self.Data.SetWorkers(workers)
+
+    def FlowLimitsCB(self, _event: wx.CommandEvent):
+        """MenuBar -> Sniffer -> Options -> Flow Limits: Callback to bound the connection table"""
+        idle_timeout, max_flows, archive_path = self.Data.GetFlowLimits()
+        minutes = wx.GetNumberFromUser("Evict connections not seen for this many minutes.\n0 keeps idle connections.",
+                                       "Minutes:", "Flow Limits", int((idle_timeout or 0) // 60), 0, 10080, self)
+        if minutes < 0:
+            return
+        max_flows = wx.GetNumberFromUser("Evict the least recently seen connections beyond this many.\n0 for no limit.",
+                                         "Connections:", "Flow Limits", max_flows or 0, 0, 10000000, self)
+        if max_flows < 0:
+            return
+        with wx.FileDialog(self, "Archive evicted connections to (Cancel to discard them)",
+                           defaultFile=archive_path or "flows.jsonl.gz",
+                           wildcard="Flow archive (*.jsonl.gz)|*.jsonl.gz",
+                           style=wx.FD_SAVE) as fileDialog:
+            archive_path = fileDialog.GetPath() if fileDialog.ShowModal() != wx.ID_CANCEL else None
+        self.Data.SetFlowLimits(minutes * 60, max_flows, archive_path)
+
+    def LoadSheddingToggleCB(self, _event):
+        """MenuBar -> Sniffer -> Options -> Load Shedding callback"""
+        self.Data.SetLoadShedding(self.LoadShedding_Button.IsChecked())
+
+    def MetricsPortCB(self, _event: wx.CommandEvent):
+        """MenuBar -> Sniffer -> Options -> Metrics Endpoint: Callback to serve metrics on a localhost port"""
+        port = wx.GetNumberFromUser("Serve metrics in Prometheus format on http://127.0.0.1:<port>/metrics\n"
+                                    "0 turns the endpoint off.",
+                                    "Port:", "Metrics Endpoint", self.Data.GetMetricsPort() or 0, 0, 65535, self)
+        if port >= 0:
+            self.Data.SetMetricsPort(port)
+
     @staticmethod
     def TestButtonCB(event: wx.CommandEvent):
         """Placeholder Button Callback"""
@@ -206,5 +339,43 @@ class MainWindow(wx.Frame):
 
             # save the current contents in the file
             pathname = fileDialog.GetPath()
-        data = self.Data.GetConnectionsDict()
-        SaveFileAsync(data, pathname, filetype)
\ No newline at end of file
+        if filetype.lower() == 'ntd':
+            StartCoroutine(self.SaveSnapshotAsync(pathname), self)
+            return
+        if filetype.lower() in ('csv', 'jsonl'):
+            StartCoroutine(self.ExportFileAsync(pathname, filetype.lower()), self)
+            return
+        data = list(self.Data.GetAllConnections())
+        SaveFileAsync(data, pathname, filetype)
+
+    async def ExportFileAsync(self, pathname, fmt):
+        """Export every connection as CSV or JSON lines, without blocking the UI or the sniffer"""
+        from Model.FlowExport import ExportFileAsync
+        try:
+            await ExportFileAsync(self.Data, pathname, fmt)
+        except (OSError, ValueError) as e:
+            wx.LogError(f"Cannot export current data as {fmt.upper()} to {pathname}: {e}")
+
+    def OpenSessionCB(self, _event: wx.CommandEvent):
+        """MenuBar -> File -> Open Session: Callback to browse a saved NTD file in its own window"""
+        with wx.FileDialog(self, "Open NTD file", wildcard="NTD files (*.ntd)|*.ntd",
+                           style=wx.FD_OPEN | wx.FD_FILE_MUST_EXIST) as fileDialog:
+            if fileDialog.ShowModal() == wx.ID_CANCEL:
+                return
+            pathname = fileDialog.GetPath()
+        from Model.SnapshotFile import SnapshotReader
+        from UI.SessionWindow import SessionWindow
+        try:
+            reader = SnapshotReader(pathname)
+        except (OSError, ValueError) as e:
+            wx.LogError(f"Cannot open session {pathname}: {e}")
+            return
+        SessionWindow(reader, self, wx.ID_ANY, "").Show()
+
+    async def SaveSnapshotAsync(self, pathname):
+        """Save an NTD snapshot with the fastest codec installed, without blocking the UI or the sniffer"""
+        from Model.SnapshotFile import GetAvailableCodecs
+        try:
+            await self.Data.SaveSnapshotAsync(pathname, GetAvailableCodecs()[0])
+        except (OSError, ValueError) as e:
+            wx.LogError(f"Cannot save current data as NTD in file {pathname}: {e}")
\ No newline at end of file
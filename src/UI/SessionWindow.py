@@ -0,0 +1,99 @@
+"""
+MIT License
+
+Copyright (c) 2022 0xKate
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+
+import wx
+from wx.grid import Grid
+
+from Model.SnapshotFile import SnapshotReader
+from UI.Widgets.ConnectionColumns import COLUMNS
+from UI.Widgets.ConnectionsGridTable import ConnectionsGridTable
+
+
+class SessionWindow(wx.Frame):
+    """Browses a saved NTD session. Rows are read from the memory mapped file as they scroll into view."""
+    def __init__(self, reader: SnapshotReader, *args, **kwds):
+        # Model
+        self.Reader = reader
+
+        # Initialize Frame
+        kwds["style"] = kwds.get("style", 0) | wx.DEFAULT_FRAME_STYLE
+        wx.Frame.__init__(self, *args, **kwds)
+        self.SetIcon(wx.Icon('assets/icon.png'))
+
+        self.MainPanel = wx.Panel(self, wx.ID_ANY)
+        self.FilterText = wx.SearchCtrl(self.MainPanel, wx.ID_ANY, style=wx.TE_PROCESS_ENTER)
+        self.FilterText.SetDescriptiveText("Filter by address, hostname, process or interface")
+        self.FilterText.ShowCancelButton(True)
+        self.Bind(wx.EVT_SEARCHCTRL_SEARCH_BTN, self.FilterCB, self.FilterText)
+        self.Bind(wx.EVT_TEXT_ENTER, self.FilterCB, self.FilterText)
+        self.Bind(wx.EVT_SEARCHCTRL_CANCEL_BTN, self.ClearFilterCB, self.FilterText)
+
+        self.Table = ConnectionsGridTable()
+        self.DataGrid = Grid(self.MainPanel, wx.ID_ANY, size=(1, 1))
+        self.DataGrid.SetTable(self.Table, takeOwnership=True)
+        self.DataGrid.DisableDragRowSize()
+        self.DataGrid.EnableEditing(False)
+        for col, column in enumerate(COLUMNS):
+            self.DataGrid.SetColSize(col, column.Width)
+        self.Table.SetRows(self.Reader)
+
+        self.__set_properties()
+        self.__do_layout()
+        self.Bind(wx.EVT_CLOSE, self.OnClose)
+
+    def __set_properties(self):
+        self.SetSize((1280, 768))
+        self.SetTitle(f"Session - {os.path.basename(self.Reader.FilePath)}")
+        self.CreateStatusBar()
+        self.SetStatusText(f"{len(self.Reader)} connections")
+
+    def __do_layout(self):
+        self.MainSizer = wx.BoxSizer(wx.VERTICAL)
+        self.MainSizer.Add(self.FilterText, 0, wx.EXPAND | wx.ALL, 4)
+        self.MainSizer.Add(self.DataGrid, 1, wx.EXPAND, 0)
+        self.MainPanel.SetSizer(self.MainSizer)
+        self.Layout()
+
+    def FilterCB(self, _event):
+        """Show only the connections matching the filter text"""
+        text = self.FilterText.GetValue().strip()
+        if not text:
+            self.ClearFilterCB(_event)
+            return
+        with wx.BusyCursor():
+            rows = self.Reader.Filter(text)
+        self.Table.SetRows(rows)
+        self.SetStatusText(f"{len(rows)} of {len(self.Reader)} connections")
+
+    def ClearFilterCB(self, _event):
+        self.FilterText.ChangeValue('')
+        self.Table.SetRows(self.Reader)
+        self.SetStatusText(f"{len(self.Reader)} connections")
+
+    def OnClose(self, _event):
+        self.Table.SetRows([])
+        self.Reader.Close()
+        self.Destroy()
@@ -0,0 +1,69 @@
+"""
+MIT License
+
+Copyright (c) 2022 0xKate
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from typing import Callable, List
+
+from Model.HostData import HostData
+from Model.RateMeter import FormatRate
+
+
+class GridColumn:
+    """One column of the connections grid, how to label it and how to turn a HostData into its cell text."""
+    __slots__ = ['Label', 'Width', 'Format']
+
+    def __init__(self, label: str, width: int, fmt: Callable[[HostData], str]):
+        self.Label = label
+        self.Width = width
+        self.Format = fmt
+
+
+def _Count(host: HostData, value) -> str:
+    """Counts of connections accounted from sampled packets are estimates, marked with a ~"""
+    return f'~{value}' if host.Estimated else str(value)
+
+
+# Kept free of wx so cell formatting can be used and measured without a display
+COLUMNS = [
+    GridColumn("Connection", 300, lambda host: str(host.GetRemoteEndPoint())),
+    GridColumn("IP", 125, lambda host: str(host.RemoteIP)),
+    GridColumn("Proto", 75, lambda host: str(host.ProtoType)),
+    GridColumn("Packets", 75, lambda host: _Count(host, host.PacketCount)),
+    GridColumn("In", 50, lambda host: _Count(host, host.IncomingCount)),
+    GridColumn("Out", 50, lambda host: _Count(host, host.OutgoingCount)),
+    GridColumn("Bandwidth", 75, lambda host: _Count(host, host.BandwidthUsage)),
+    GridColumn("Rate 1s", 85, lambda host: _Count(host, FormatRate(host.GetByteRate(0)))),
+    GridColumn("Rate 10s", 85, lambda host: _Count(host, FormatRate(host.GetByteRate(1)))),
+    GridColumn("Rate 60s", 85, lambda host: _Count(host, FormatRate(host.GetByteRate(2)))),
+    GridColumn("Pkt Rate", 65, lambda host: _Count(host, f'{host.GetPacketRate(1):.1f}')),
+    GridColumn("PID", 50, lambda host: str(host.GetPID())),
+    GridColumn("Last Seen", 150, lambda host: str(host.LastSeen.replace(microsecond=0))),
+    GridColumn("First Seen", 159, lambda host: str(host.FirstSeen.replace(microsecond=0))),
+    GridColumn("Process", 150, lambda host: str(host.GetProcName() or '')),
+    GridColumn("Interface", 100, lambda host: str(host.Interface or '')),
+]  # type: List[GridColumn]
+
+
+def FormatRow(host: HostData) -> List[str]:
+    """Format every cell of one row."""
+    return [column.Format(host) for column in COLUMNS]
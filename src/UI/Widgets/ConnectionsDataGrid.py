@@ -24,23 +24,28 @@ SOFTWARE.
 
 import asyncio
 import logging
-import webbrowser
+import time
 from enum import Enum
 
 import wx
-from wx.grid import Grid, GridTableBase, GridStringTable
-import pyperclip as pc
+from wx.grid import Grid
 from wxasync import StartCoroutine
 
 from Model.NetworkSniffer import NetworkSniffer
+from Model.SortIndex import SortIndex
+from UI.Widgets.ConnectionsGridTable import ConnectionsGridTable
 
 class SortBy(Enum):
     Packets = 'PacketCount'
     In = 'IncomingCount'
     Out = 'OutgoingCount'
     Bandwidth = 'BandwidthUsage'
+    Rate1s = 'ByteRateKey1s'
+    Rate10s = 'ByteRateKey10s'
+    Rate60s = 'ByteRateKey60s'
+    PktRate = 'PacketRateKey10s'
     PID = 'GetPID'
-    LastSeen = 'LastSeen'
+    LastSeen = 'LastSeenTime'
     FirstSeen = 'FirstSeen'
 
 class ConnectionsDataGridContainer(wx.ScrolledWindow):
@@ -49,11 +54,15 @@ class ConnectionsDataGridContainer(wx.ScrolledWindow):
     def __init__(self, parentPanel, dataSource: NetworkSniffer, *args, **kwargs):
         self.SortDescending = True
         self.SortBy = SortBy.Packets
+        self.SortIndex = SortIndex(self.SortBy.value)
+        self.Generation = 0
         self.ParentPanel = parentPanel
         self.DataSource = dataSource
         self.AutoRefresh = True
         self.RefreshRate = 1
         self.Refreshing = False
+        self.RefreshTime = dataSource.Metrics.Histogram('nettools_grid_refresh_seconds',
+                                                        'Duration of connection grid refreshes')
         wx.ScrolledWindow.__init__(self, parentPanel, *args, **kwargs)
         self.SetScrollRate(10, 10)
         self.DataGrid = Grid(self, wx.ID_ANY, size=(1, 1))
@@ -83,12 +92,14 @@ class ConnectionsDataGridContainer(wx.ScrolledWindow):
     def OnDataGridCopyCell(self, event: wx.CommandEvent, cell_context):
         """Copy cell data to clipboard"""
         cell_value = self.DataGrid.GetCellValue(*cell_context)
+        import pyperclip as pc
         pc.copy(cell_value)
         event.Skip()
 
     def OnDataGridOpenIPInfo(self, event: wx.CommandEvent, cell_context):
         """Open web browser to https://ipinfo.io/<ip_address>"""
         cell_value = self.DataGrid.GetCellValue(*cell_context)
+        import webbrowser
         webbrowser.open(f'https://ipinfo.io/{cell_value}')
         event.Skip()
 
@@ -97,7 +108,8 @@ class ConnectionsDataGridContainer(wx.ScrolledWindow):
         col = event.GetCol()
         if col > -1:
             label = self.DataGrid.GetColLabelValue(col)
-            if label in ['Packets', 'In', 'Out', 'Bandwidth', 'PID', 'Last Seen', 'First Seen']: # type: str
+            if label in ['Packets', 'In', 'Out', 'Bandwidth', 'Rate 1s', 'Rate 10s', 'Rate 60s', 'Pkt Rate', 'PID',
+                         'Last Seen', 'First Seen']: # type: str
                 print('label:', label)
                 if self.SortBy is SortBy[label.replace(' ', '')]:
                     if self.SortDescending:
@@ -106,6 +118,8 @@ class ConnectionsDataGridContainer(wx.ScrolledWindow):
                         self.SortDescending = True
                 else:
                     self.SortBy = SortBy[label.replace(' ', '')]
+                    self.SortIndex = SortIndex(self.SortBy.value)
+                    self.SortIndex.Rebuild(self.DataSource.GetConnectionsDict())
                 self.DataGridRefresh()
                 print(f"Sorting by: {self.SortBy} Descending: {self.SortDescending}")
         event.Skip()
@@ -151,38 +165,23 @@ class ConnectionsDataGridContainer(wx.ScrolledWindow):
         """Update a cell on the DataGrid"""
         self.DataGrid.SetCellValue(row, col, value)
 
-    @staticmethod
-    def __GetSortingValue(x, sortBy):
-        attr = getattr(x, sortBy.value)
-        if callable(attr):
-            return attr()
-        else:
-            return attr
-
     def DataGridRefresh(self):
-        """Update the entire DataGrid"""
+        """Re-sort the DataGrid rows and redraw the cells that are on screen"""
         if self.Refreshing:
             logging.warning('Attempted to redraw grid while still drawing!')
             return
 
         self.Refreshing = True
-        all_conn = sorted(self.DataSource.GetAllConnections(), key=lambda x: self.__GetSortingValue(x, self.SortBy), reverse=self.SortDescending)
-        tbl = self.DataGrid.GetTable() # type: GridStringTable
-        for row in range (0, len(all_conn)):
-            host = all_conn[row]
-            if not row < tbl.GetNumberRows():
-                tbl.AppendRows()
-            tbl.SetValue(row, 0, str(host.GetRemoteEndPoint()))
-            tbl.SetValue(row, 1, str(host.RemoteIP))
-            tbl.SetValue(row, 2, str(host.ProtoType))
-            tbl.SetValue(row, 3, str(host.PacketCount))
-            tbl.SetValue(row, 4, str(host.IncomingCount))
-            tbl.SetValue(row, 5, str(host.OutgoingCount))
-            tbl.SetValue(row, 6, str(host.BandwidthUsage))
-            tbl.SetValue(row, 7, str(host.GetPID()))
-            tbl.SetValue(row, 8, str(host.LastSeen.replace(microsecond=0)))
-            tbl.SetValue(row, 9, str(host.FirstSeen.replace(microsecond=0)))
-        self.DataGrid.ForceRefresh()
+        start = time.perf_counter()
+        connections = self.DataSource.GetConnectionsDict()
+        changes = self.DataSource.ChangesSince(self.Generation)
+        self.Generation = changes.Generation
+        if changes.Complete:
+            self.SortIndex.Update(changes.GetChanged(), connections)
+        else:
+            self.SortIndex.Rebuild(connections)
+        self.Table.SetRows(self.SortIndex.GetView(connections, self.SortDescending))
+        self.RefreshTime.Observe(time.perf_counter() - start)
         self.Refreshing = False
 
     def __do_layout(self):
@@ -191,26 +190,8 @@ class ConnectionsDataGridContainer(wx.ScrolledWindow):
         self.SetSizer(self.DataGridSizer)
 
     def __set_properties(self):
-        r = len(self.DataSource.GetAllConnections())
-        self.DataGrid.CreateGrid(r, 10)
-        self.DataGrid.SetColLabelValue(0, "Connection")
-        self.DataGrid.SetColSize(0, 300)
-        self.DataGrid.SetColLabelValue(1, "IP")
-        self.DataGrid.SetColSize(1, 125)
-        self.DataGrid.SetColLabelValue(2, "Proto")
-        self.DataGrid.SetColSize(2, 75)
-        self.DataGrid.SetColLabelValue(3, "Packets")
-        self.DataGrid.SetColSize(3, 75)
-        self.DataGrid.SetColLabelValue(4, "In")
-        self.DataGrid.SetColSize(4, 50)
-        self.DataGrid.SetColLabelValue(5, "Out")
-        self.DataGrid.SetColSize(5, 50)
-        self.DataGrid.SetColLabelValue(6, "Bandwidth")
-        self.DataGrid.SetColSize(6, 75)
-        self.DataGrid.SetColLabelValue(7, "PID")
-        self.DataGrid.SetColSize(7, 50)
-        self.DataGrid.SetColLabelValue(8, "Last Seen")
-        self.DataGrid.SetColSize(8, 150)
-        self.DataGrid.SetColLabelValue(9, "First Seen")
-        self.DataGrid.SetColSize(9, 159)
-        self.DataGridRefresh()
\ No newline at end of file
+        self.Table = ConnectionsGridTable()
+        self.DataGrid.SetTable(self.Table, takeOwnership=True)
+        for col, column in enumerate(self.Table.Columns):
+            self.DataGrid.SetColSize(col, column.Width)
+        self.DataGridRefresh()
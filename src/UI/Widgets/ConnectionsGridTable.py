@@ -0,0 +1,85 @@
+"""
+MIT License
+
+Copyright (c) 2022 0xKate
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from typing import List, Sequence
+
+import wx.grid
+from wx.grid import GridTableBase, GridTableMessage
+
+from Model.HostData import HostData
+from UI.Widgets.ConnectionColumns import COLUMNS, GridColumn
+
+
+class ConnectionsGridTable(GridTableBase):
+    """Virtual table for the connections grid. Holds the connections in display order and only formats a cell
+    when the grid asks for it, which it only does for the cells that are on screen."""
+    def __init__(self, columns: List[GridColumn] = None):
+        GridTableBase.__init__(self)
+        self.Columns = columns or COLUMNS
+        self.Rows = []  # type: Sequence[HostData]
+
+    def GetNumberRows(self):
+        return len(self.Rows)
+
+    def GetNumberCols(self):
+        return len(self.Columns)
+
+    def IsEmptyCell(self, row, col):
+        return False
+
+    def GetValue(self, row, col):
+        if row < len(self.Rows):
+            host = self.Rows[row]
+            if host is not None:
+                return self.Columns[col].Format(host)
+        return ''
+
+    def SetValue(self, row, col, value):
+        """Read only, the model is the source of truth."""
+        pass
+
+    def GetColLabelValue(self, col):
+        return self.Columns[col].Label
+
+    def GetRow(self, row) -> HostData:
+        return self.Rows[row]
+
+    def SetRows(self, rows: Sequence[HostData]):
+        """Replace the displayed connections, telling the grid how many rows were added or removed
+        instead of repopulating it. Only the visible cells are redrawn."""
+        old_count = len(self.Rows)
+        self.Rows = rows
+        new_count = len(rows)
+        view = self.GetView()  # type: wx.grid.Grid
+        if view is None:
+            return
+        view.BeginBatch()
+        if new_count > old_count:
+            view.ProcessTableMessage(
+                GridTableMessage(self, wx.grid.GRIDTABLE_NOTIFY_ROWS_APPENDED, new_count - old_count))
+        elif new_count < old_count:
+            view.ProcessTableMessage(
+                GridTableMessage(self, wx.grid.GRIDTABLE_NOTIFY_ROWS_DELETED, new_count, old_count - new_count))
+        view.EndBatch()
+        view.ForceRefresh()
@@ -22,6 +22,7 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 import logging
+from argparse import ArgumentParser, Namespace
 
 # create logger with 'spam_application'
 import sys
@@ -33,15 +34,71 @@ fh = logging.FileHandler('spam.log')
 fh.setLevel(logging.DEBUG)
 logger.addHandler(fh)
 
-from NetToolsApp import WxAsyncEngine
-from os.path import dirname
+from os.path import abspath, dirname
 from os import chdir
 
+# Options that only make sense without a window
+HEADLESS_ONLY = ('export', 'changed_only')
+# Options naming files, resolved before main changes to the source directory
+PATH_OPTIONS = ('archive', 'autosave', 'replay', 'export')
+
+
+def ParseArgs(argv=None) -> Namespace:
+    parser = ArgumentParser(description="Monitor which processes open connections to which remote hosts.")
+    parser.add_argument('--headless', action='store_true',
+                        help="Run without a window (wx is never imported), until SIGINT/SIGTERM")
+    parser.add_argument('-i', '--interface', action='append',
+                        help="Interface to capture on, repeat for several (default: scapy's default interface)")
+    parser.add_argument('--workers', type=int, default=0,
+                        help="Capture in this many processes sharded by flow (default: capture in-process)")
+    parser.add_argument('--columnar', action='store_true',
+                        help="Keep connections in the compact array backed store")
+    parser.add_argument('--no-resolve', action='store_true', help="Don't reverse resolve remote hostnames")
+    parser.add_argument('--no-shedding', action='store_true',
+                        help="Drop packets instead of sampling flows when traffic outruns accounting")
+    parser.add_argument('--idle-timeout', type=float, help="Evict connections idle for this many seconds")
+    parser.add_argument('--max-flows', type=int, help="Evict the least recently seen connections beyond this many")
+    parser.add_argument('--archive', help="Append evicted connections to this .jsonl.gz file")
+    parser.add_argument('--autosave', metavar='DIR', help="Checkpoint the session to this directory and restore it "
+                                                          "from there on the next start (window default: "
+                                                          "~/.nettools/autosave)")
+    parser.add_argument('--autosave-interval', type=float, default=5.0,
+                        help="Seconds between autosave checkpoints (default: 5)")
+    parser.add_argument('--metrics-port', type=int, help="Serve internal metrics in Prometheus format on "
+                                                         "http://127.0.0.1:PORT/metrics")
+    parser.add_argument('--replay', metavar='PCAP', help="Process a pcap/pcapng file instead of capturing, "
+                                                         "headless mode exits when it is done")
+    parser.add_argument('--realtime', action='store_true', help="Replay at the capture's original pace")
+    parser.add_argument('--local-ip', help="Address of the host a replayed capture was taken on")
+    parser.add_argument('--export', metavar='PATH', help="Headless: export connections to a file, a FIFO or - for "
+                                                        "stdout")
+    parser.add_argument('--format', choices=('csv', 'jsonl'), default='jsonl', help="Export format")
+    parser.add_argument('--export-interval', type=float, default=60.0,
+                        help="Seconds between exports, SIGHUP exports immediately (default: 60)")
+    parser.add_argument('--changed-only', action='store_true',
+                        help="Only export connections changed since the previous export, appending to the file")
+    args = parser.parse_args(argv)
+    if not args.headless:
+        for option in HEADLESS_ONLY:
+            if getattr(args, option):
+                parser.error(f"--{option.replace('_', '-')} requires --headless")
+    for option in PATH_OPTIONS:
+        path = getattr(args, option)
+        if path and path != '-':
+            setattr(args, option, abspath(path))
+    return args
+
 
 if __name__ == "__main__":
+    Args = ParseArgs()
     pwd = dirname(__file__)
     chdir(pwd)
-    UIEngine = WxAsyncEngine()
+    if Args.headless:
+        from Headless import HeadlessEngine
+        sys.exit(HeadlessEngine(Args).Start())
+
+    from NetToolsApp import WxAsyncEngine
+    UIEngine = WxAsyncEngine(Args)
     UIEngine.Start()
 
     sys.exit(0)